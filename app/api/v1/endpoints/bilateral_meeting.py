@@ -11,11 +11,13 @@ TODO: 完善请求异常处理机制
 """
 
 from fastapi import Body, APIRouter
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+from app.services.llm.replica_pool import get_llm_pool
+from app.services.llm.response_cache import cached_llm
 
 from app.api.v1.endpoints.table_fill_api import client
 from app.services.llm.prompts import prompts
@@ -46,8 +48,8 @@ router = APIRouter()
 
 embed_model = get_xinference_client()
 
-mini1 = ChatOpenAI(model="qwen2-mini1",openai_api_key='empty',openai_api_base="http://192.168.100.111:8011/v1",temperature=0)
-mini2 = ChatOpenAI(model="qwen2-mini2",openai_api_key='empty',openai_api_base="http://192.168.100.111:8012/v1",temperature=0)
+# qwen2-mini1 / qwen2-mini2 作为同一逻辑模型的副本，按负载分配请求
+mini = get_llm_pool("qwen2-mini", temperature=0)
 
 
 def qdrant_search(query: str, collection: str) -> dict:
@@ -112,7 +114,7 @@ def job_in_bilateral_list(description: str):
 
     return [publish_id.payload['publish_id'] for publish_id in reordered_results]
 
-bilateral_chain = (ChatPromptTemplate.from_template(prompts.job_match)| mini1 | StrOutputParser() | job_in_bilateral_list )
+bilateral_chain = (cached_llm("job_match", ChatPromptTemplate.from_template(prompts.job_match), mini, "qwen2-mini", parser=StrOutputParser()) | job_in_bilateral_list )
 
 
 
@@ -129,7 +131,7 @@ async def list_bilateral_recom(desire: JobRequestModel = Body(...)) -> List[int]
     响应是未分页的，限制为 10 个结果。
     """
 
-    jobs_list = bilateral_chain.invoke({
+    jobs_list = await run_in_threadpool(bilateral_chain.invoke, {
         "desire_industry": desire.desire_industry,
         "attribute": desire.attribute,
         "second_category": desire.second_category,
@@ -9,11 +9,10 @@
 from fastapi import APIRouter, Body, status
 from typing import List, AsyncGenerator
 from pydantic import BaseModel, ConfigDict, Field
-from app.services.llm import
+from app.services.llm.inference_pipeline import WEYON_LLM
 from fastapi.responses import StreamingResponse
+from app.services.rag.deadline import Deadline
 import json
-import asyncio
-import time
 
 
 class Query(BaseModel):
@@ -40,39 +39,22 @@ class Query(BaseModel):
 
 
 
-async def create_chat_chunks(content: str) -> AsyncGenerator[str, None]:
+async def create_chat_chunks(messages: "Query", deadline: Deadline) -> AsyncGenerator[str, None]:
     """
-    将内容切分成小块并按照 OpenAI 格式进行流式输出
+    将模型的流式增量按照 OpenAI 格式转为 SSE 输出
     """
-    # 模拟分词处理
-    words = content.split()
-
-    for i, word in enumerate(words):
-        # 构造符合 OpenAI 格式的响应块
-        chunk = {
-            "id": i,
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),  # 使用实际时间戳
-            "model": "qwen-pro",
-            "choices": [{
-                "index": i,
-                "delta": {
-                    "content": word + " "
-                },
-                "finish_reason": None if i < len(words) - 1 else "stop"
-            }]
-        }
-
-        # 第一个块需要包含role
-        if i == 0:
-            chunk["choices"][0]["delta"]["role"] = "assistant"
-
-        # 转换为 SSE 格式
-        yield f"data: {json.dumps(chunk)}\n\n"
-
-        # 模拟输出延迟
-        await asyncio.sleep(0.1)
+    async for chunk in llm.astream(
+        query=messages.query,
+        collections=messages.collections,
+        enable_rag=messages.enable_rag,
+        enable_monitoring=messages.enable_monitoring,
+        deadline=deadline,
+    ):
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
 
+    # 响应头在检索前已发出，因时间预算被跳过的阶段以 SSE 注释行放在结束标记之前，
+    # 逐行把 data 当作增量解析的客户端不受影响
+    yield f": progress {json.dumps(deadline.metadata(), ensure_ascii=False)}\n\n"
     # 发送结束标记
     yield "data: [DONE]\n\n"
 
@@ -94,18 +76,10 @@ async def predict(messages: Query = Body(...)):
 
     根据选定的集合进行向量库检索。
     """
-    answer = llm.generate(
-        query=messages.query,
-        collections=messages.collections,
-        enable_rag=messages.enable_rag,
-        enable_evaluation=messages.enable_evaluation,
-        enable_monitoring=messages.enable_monitoring,
-    )
-
-
+    deadline = Deadline()
     return StreamingResponse(
-        create_chat_chunks(answer),
-        media_type="text/event-stream"
+        create_chat_chunks(messages, deadline),
+        media_type="text/event-stream",
     )
 
 
@@ -11,15 +11,18 @@ from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
-from openai import OpenAI
+import asyncio
 import json
 from app.config import settings
-from app.services.llm import InferenceOpenAI
+from app.services.llm.inference_pipeline import InferenceOpenAI
+from app.services.llm.clients import get_llm_registry
+from app.services.rag.deadline import Deadline
 
 
 router = APIRouter()
 
-client = OpenAI(api_key=settings.Silicon_api_key2, base_url=settings.Silicon_base_url)
+# 进程内共享的异步客户端，复用连接池并受模型并发上限约束
+client = get_llm_registry().async_openai_client("Qwen/Qwen2.5-72B-Instruct", api_key=settings.Silicon_api_key2)
 
 
 class Message(BaseModel):
@@ -52,16 +55,32 @@ class ChatRequest(BaseModel):
         })
 
 
-async def generate_stream(messages: List[Message], model: str, temperature: float):
-    response = client.chat.completions.create(
+def _sse(data: dict) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_comment(data: dict) -> str:
+    """
+    以 SSE 注释行推送进度
+
+    OpenAI SDK 会把带 event 名称的消息也解析成没有 choices 的 chunk，
+    注释行（以冒号开头）则会被 SDK 和 EventSource 直接忽略，不影响只读取 token 的客户端
+    """
+    return f": progress {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def generate_stream(messages: List[Message], model: str, temperature: float, timeout: Optional[float] = None):
+    """异步读取模型流式输出，逐个转发 token，不阻塞事件循环"""
+    response = await client.chat.completions.create(
         messages=[{"role": message.role, "content": message.content} for message in messages],
         model="Qwen/Qwen2.5-72B-Instruct",
         temperature=temperature,
-        stream=True
+        stream=True,
+        timeout=timeout,
     )
 
-    for chunk in response:
-        if chunk.choices[0].delta.content is not None:
+    async for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content is not None:
             # 构造与OpenAI格式一致的响应
             response_data = {
                 "id": "chatcmpl-" + chunk.id,
@@ -70,7 +89,7 @@ async def generate_stream(messages: List[Message], model: str, temperature: floa
                 "model": model,
                 "choices": [
                     {
-                        "index": chunk.id,
+                        "index": chunk.choices[0].index,
                         "delta": {
                             "content": chunk.choices[0].delta.content
                         },
@@ -78,24 +97,38 @@ async def generate_stream(messages: List[Message], model: str, temperature: floa
                     }
                 ]
             }
-            yield f"data: {json.dumps(response_data)}\n\n"
+            yield _sse(response_data)
 
     yield "data: [DONE]\n\n"
 
 
-@router.post("/chat/completions/stream")
-async def chat_stream(request: ChatRequest):
+async def rag_stream(request: ChatRequest):
+    """
+    先推送检索进度，再转发模型 token
+
+    检索（查询扩展、向量检索、重排）是同步调用，放到线程中执行，首字节在请求到达后立即发出。
+    """
+    deadline = Deadline()
+    yield _sse_comment({"stage": "retrieval", "status": "started"})
+
     llm = InferenceOpenAI()
-    request.messages[-1].content = llm.generate(
+    request.messages[-1].content = await asyncio.to_thread(
+        llm.generate,
         query=request.messages[-1].content,
-        collections=request.collections
+        collections=request.collections,
+        deadline=deadline,
     )
+    yield _sse_comment({"stage": "retrieval", "status": "completed", **deadline.metadata()})
 
-    return StreamingResponse(
-        generate_stream(
-            messages=request.messages,
-            model=request.model,
-            temperature=request.temperature
-        ),
-        media_type="text/event-stream"
-    )
+    async for event in generate_stream(
+        messages=request.messages,
+        model=request.model,
+        temperature=request.temperature,
+        timeout=max(deadline.remaining(), 1.0),
+    ):
+        yield event
+
+
+@router.post("/chat/completions/stream")
+async def chat_stream(request: ChatRequest):
+    return StreamingResponse(rag_stream(request), media_type="text/event-stream")
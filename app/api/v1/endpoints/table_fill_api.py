@@ -11,6 +11,7 @@ TODO: 完善请求异常处理机制
 """
 
 from fastapi import Body, HTTPException, status, APIRouter
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 import logging
 # 配置日志
@@ -22,7 +23,11 @@ import concurrent.futures
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableParallel
-from langchain_openai import ChatOpenAI
+from app.services.llm.replica_pool import get_llm_pool
+from app.services.llm.response_cache import cached_llm
+from app.config import settings
+from app.utils.embeddings import embed_texts, aembed_texts
+from app.services.normalization import get_vocab_qdrant_client, get_vocab_service, normalize_batch
 
 from app.services.llm.prompts import prompts
 from app.db.models.models import JobInModel, JobOutModel, Job2StudentModel, Major2StudentModel, QueryRequest
@@ -30,48 +35,80 @@ from app.db.models.models import JobInModel, JobOutModel, Job2StudentModel, Majo
 
 router = APIRouter()
 
-from qdrant_client import QdrantClient
+from qdrant_client import models as qmodels
 from qdrant_client.http.models import Filter, FieldCondition, MatchValue
 from app.db.qdrant import QdrantClientManager
+from app.db.hybrid_search import hybrid_query_points, ahybrid_query_points
 
-client = QdrantClient(url="192.168.100.111:6333")
+# 与词表内存索引共用 VOCAB_QDRANT_URL 上的客户端
+client = get_vocab_qdrant_client()
 
-from xinference.client import Client
-client2 = Client("http://192.168.100.111:9997")
-embed_model = client2.get_model("bge-small-zh-v1.5")
-embed_model_pro = client2.get_model("bge-m3")
 
+# qwen2-mini1 / qwen2-mini2 作为同一逻辑模型的副本，按负载分配请求
+mini = get_llm_pool("qwen2-mini", temperature=0)
 
-mini1 = ChatOpenAI(model="qwen2-mini1",openai_api_key='empty',openai_api_base="http://192.168.100.111:8011/v1",temperature=0)
-mini2 = ChatOpenAI(model="qwen2-mini2",openai_api_key='empty',openai_api_base="http://192.168.100.111:8012/v1",temperature=0)
+
+def batch_search(lookups: list[tuple[str, str]]) -> list[dict]:
+    """
+    批量字典匹配：所有查询文本一次嵌入，每个集合一次内存索引检索（未加载时为一次 query_batch_points 请求），各集合并发执行
+
+    Args:
+        lookups: (查询文本, 集合名) 列表
+    Returns:
+        与 lookups 顺序一致的最相近条目 payload
+    """
+    vectors = embed_texts([query for query, _ in lookups], model=settings.EMBEDDING_MODEL_ID)
+
+    by_collection: dict[str, list[int]] = {}
+    for index, (_, collection) in enumerate(lookups):
+        by_collection.setdefault(collection, []).append(index)
+
+    def search_collection(collection: str, indexes: list[int]) -> list[dict]:
+        # 字典已加载到内存索引时直接矩阵检索，否则回退到 Qdrant
+        index = get_vocab_service().get(collection) if settings.VOCAB_INDEX_ENABLED else None
+        if index is not None:
+            return [hits[0].payload for hits in index.search_batch([vectors[i] for i in indexes], k=1)]
+        responses = client.query_batch_points(
+            collection_name=collection,
+            requests=[qmodels.QueryRequest(query=vectors[i], limit=1, with_payload=True) for i in indexes],
+        )
+        return [response.points[0].payload for response in responses]
+
+    payloads: list[dict | None] = [None] * len(lookups)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(by_collection) or 1) as executor:
+        tasks = {
+            executor.submit(search_collection, collection, indexes): indexes
+            for collection, indexes in by_collection.items()
+        }
+        for task, indexes in tasks.items():
+            for index, payload in zip(indexes, task.result()):
+                payloads[index] = payload
+    return payloads
 
 
 def match_item(dic: dict):
     collections = ['job_name', 'cities_name', 'education_levels', 'attribute', 'welfare']
     queries = [dic['职位名称'], dic['工作城市'], dic['学历要求'], dic['工作性质'], dic['薪酬福利']]
+    majors = dic["需求专业"].split('#')
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        search_tasks = [
-            executor.submit(qdrant_search, query, collection)
-            for query, collection in zip(queries, collections)
-        ]
-        hits = [
-            # task.result() for task in concurrent.futures.as_completed(search_tasks)
-            task.result() for task in search_tasks
-        ]  # 等待所有线程
-    dic['需求专业'] = "#".join(
-        [qdrant_search(major, 'majors_name')['专业名称'] for major in dic["需求专业"].split('#')])
+    # 先查字典快速路径，未命中的字段和专业一起嵌入、按集合批量检索
+    payloads = normalize_batch(
+        list(zip(queries, collections)) + [(major, 'majors_name') for major in majors],
+        batch_search,
+    )
+    hits = payloads[:len(collections)]
+    dic['需求专业'] = "#".join(payload['专业名称'] for payload in payloads[len(collections):])
 
     return [dic] + hits
 
-table_chain = (ChatPromptTemplate.from_template(prompts.job_item_fill)| mini1 | JsonOutputParser() | match_item )
-text_chain = (ChatPromptTemplate.from_template(prompts.job_item_write) | mini2 | JsonOutputParser())
+table_chain = (cached_llm("job_item_fill", ChatPromptTemplate.from_template(prompts.job_item_fill), mini, "qwen2-mini", parser=JsonOutputParser()) | match_item )
+text_chain = (cached_llm("job_item_write", ChatPromptTemplate.from_template(prompts.job_item_write), mini, "qwen2-mini", parser=JsonOutputParser()))
 map_chain = RunnableParallel(table=table_chain, text=text_chain)
 
 def qdrant_search(query: str, collection: str) -> dict:
     result = client.query_points(
     collection_name=collection,
-    query=embed_model.create_embedding(query)['data'][0]['embedding'],  # <--- Dense vector
+    query=embed_texts([query], model=settings.EMBEDDING_MODEL_ID)[0],  # <--- Dense vector
     ).points[0].payload
     return result
 
@@ -111,7 +148,8 @@ async def create_job(job: JobInModel = Body(...)):
         requirements: 岗位要求,
     """
     #将创建一个唯一的 `id` 并在响应中提供。
-    all_tables = map_chain.invoke({
+    # 链中的模型调用和向量检索都是同步的，且可能在模型并发上限处排队，放到线程池中执行，不阻塞事件循环
+    all_tables = await run_in_threadpool(map_chain.invoke, {
         "company": job.company_name,
         #"position": job.position_name,
         "companyIntro": job.companyIntro,
@@ -143,9 +181,11 @@ async def create_job(job: JobInModel = Body(...)):
 def job_fromlist(description: str):
     with QdrantClientManager.get_client_context() as qdrant_client:
         try:
-            _jobs = qdrant_client.query_points(
+            _jobs = hybrid_query_points(
+                qdrant_client,
                 collection_name='job_2024_1119',
-                query=embed_model_pro.create_embedding(description)['data'][0]['embedding'],  # <--- Dense vector
+                dense_vector=embed_texts([description], model=settings.EMBEDDING_MODEL_ID_PRO)[0],  # <--- Dense vector
+                text=description,  # <--- Sparse vector
                 query_filter=Filter(
                     must=[
                         FieldCondition(
@@ -161,14 +201,14 @@ def job_fromlist(description: str):
                 with_payload=True,
                 limit=50,
                 using='job_name',
-            ).points
+            )
             job_list = [publish_id.payload['publish_id'] for publish_id in _jobs]
             return random.sample(job_list, len(job_list))
         except Exception as e:
             logger.error(f"岗位推送时出错: {str(e)}")
             raise
 
-jobs_chain = (ChatPromptTemplate.from_template(prompts.job_match)| mini1 | StrOutputParser() | job_fromlist )
+jobs_chain = (cached_llm("job_match", ChatPromptTemplate.from_template(prompts.job_match), mini, "qwen2-mini", parser=StrOutputParser()) | job_fromlist )
 
 
 @router.post(
@@ -184,7 +224,7 @@ async def list_students_byinterest(desire: Job2StudentModel = Body(...)) -> List
     响应是未分页的，限制为 10 个结果。
     """
 
-    jobs_list = jobs_chain.invoke({
+    jobs_list = await run_in_threadpool(jobs_chain.invoke, {
         "desire_industry": desire.desire_industry,
         "attribute": desire.attribute,
         "second_category": desire.second_category,
@@ -210,7 +250,7 @@ async def list_students_bymajor(Major: Major2StudentModel) -> List[int]:
         try:
             _jobs = qdrant_client.query_points(
                 collection_name='job_2024_1119',
-                query=embed_model_pro.create_embedding(Major.major)['data'][0]['embedding'],  # <--- Dense vector
+                query=(await aembed_texts([Major.major], model=settings.EMBEDDING_MODEL_ID_PRO))[0],  # <--- Dense vector
                 using='job_name',
             ).points
 
@@ -228,15 +268,26 @@ async def list_students_bymajor(Major: Major2StudentModel) -> List[int]:
 )
 
 async def search_qdrant(query: QueryRequest):
-    if query.is_vector:
-        query.content = embed_model.create_embedding(query.content)['data'][0]['embedding']
     try:
-        search_result = client.query_points(
-            collection_name=query.collection_name,
-            query=query.content,
-            with_payload=True,
-            limit=query.top_k,
-        ).points
+        if query.is_vector:
+            # 原文同时用于稀疏向量，集合支持时走混合检索
+            search_result = await ahybrid_query_points(
+                client,
+                collection_name=query.collection_name,
+                dense_vector=(await aembed_texts([query.content], model=settings.EMBEDDING_MODEL_ID))[0],
+                text=query.content,
+                using=query.using,
+                with_payload=True,
+                limit=query.top_k,
+            )
+        else:
+            search_result = client.query_points(
+                collection_name=query.collection_name,
+                query=query.content,
+                using=query.using,
+                with_payload=True,
+                limit=query.top_k,
+            ).points
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -14,12 +14,14 @@ import datetime
 from qdrant_client import models
 import logging
 from app.db.qdrant import QdrantClientManager
+from app.db.hybrid_search import ahybrid_query_points
 from app.config import settings
 
 from app.db.models.jobs import (
     Bilateral_delete_record,
 )
 from app.utils.embeddings import vectorize
+from app.services.normalization import get_vocab_service
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -71,7 +73,7 @@ async def category_to_jobs(category_id: int) -> List[int]:
 
         - 通过职业类别的描述向量，在职位库中查找相似的职位
         - 仅返回未过期、已发布且状态正常的职位
-        - 相似度阈值设置为0.5
+        - 相似度阈值设置为0.5（开启混合检索时作用于稠密候选）
     """
     if not QdrantClientManager.check_health():
         raise HTTPException(status_code=503, detail="Qdrant服务不可用")
@@ -82,15 +84,17 @@ async def category_to_jobs(category_id: int) -> List[int]:
             point = qdrant_client.retrieve(
                 collection_name="job_category",
                 ids=[category_id],
-                with_payload=False,
-                with_vectors=True,
+                with_payload=["description"],
+                with_vectors=["description"],
             )
 
             description_vector = point[0].vector['description']
 
-            _jobs = qdrant_client.query_points(
+            _jobs = await ahybrid_query_points(
+                qdrant_client,
                 collection_name=COLLECTION_NAME,
-                query=description_vector,  # <--- Dense vector
+                dense_vector=description_vector,  # <--- Dense vector
+                text=point[0].payload.get('description', ''),  # <--- Sparse vector
                 query_filter=models.Filter(
                     must=[
                         models.FieldCondition(key="end_time",
@@ -103,7 +107,7 @@ async def category_to_jobs(category_id: int) -> List[int]:
                 score_threshold=0.5,
                 with_payload=["publish_id"],
                 limit=5  # 限制返回结果的数量
-            ).points
+            )
             job_ids = [publish_id.payload['publish_id'] for publish_id in _jobs]
 
             return job_ids
@@ -166,13 +170,17 @@ async def jobs_to_category(job: job_info) -> job_category:
             else:
                 job_name_vector = point[0].vector['job_name']
 
-            _category = qdrant_client.query_points(
-                collection_name="job_category",
-                query=job_name_vector,
-                using='position_name',
-                # with_payload=["position_id"],
-                limit=1
-            ).points
+            index = get_vocab_service().get("job_category") if settings.VOCAB_INDEX_ENABLED else None
+            if index is not None:
+                _category = index.search(job_name_vector, k=1)
+            else:
+                _category = qdrant_client.query_points(
+                    collection_name="job_category",
+                    query=job_name_vector,
+                    using='position_name',
+                    # with_payload=["position_id"],
+                    limit=1
+                ).points
 
             # category_ids = [category_id.payload['position_id'] for category_id in _category]
             return job_category(
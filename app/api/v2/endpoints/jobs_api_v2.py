@@ -13,10 +13,12 @@ from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional, Union
 from tenacity import retry, stop_after_attempt, wait_exponential
 from qdrant_client import models
+import asyncio
 import logging
 from datetime import datetime
 import time
 from app.db.qdrant import QdrantClientManager
+from app.db.hybrid_search import JOB_VECTOR_FIELDS, sparse_vectors_for
 from app.db.models.jobs import JobUpdateItem, Jobs
 from app.utils.embeddings import vectorize
 from app.config import settings
@@ -109,13 +111,20 @@ async def batch_update_jobs(updates: List[JobUpdateItem]) -> tuple[int, List[Dic
                     )
 
                     # 检查并更新向量
-                    vector_updates = {}
-                    if 'job_name' in update_payload:
-                        vector_updates['job_name'] = await vectorize(update_payload['job_name'])
-                    if 'job_descript' in update_payload:
-                        vector_updates['job_descript'] = await vectorize(update_payload['job_descript'])
-                    if 'job_require' in update_payload:
-                        vector_updates['job_require'] = await vectorize(update_payload['job_require'])
+                    vector_fields = [
+                        field for field in JOB_VECTOR_FIELDS
+                        if field in update_payload
+                    ]
+                    # 并发提交，由 embedding_batcher 合并为一次嵌入请求
+                    vector_updates = dict(zip(
+                        vector_fields,
+                        await asyncio.gather(*(vectorize(update_payload[field]) for field in vector_fields))
+                    ))
+                    # 同步更新混合检索用的稀疏向量
+                    vector_updates.update(await asyncio.to_thread(
+                        sparse_vectors_for, qdrant_client, COLLECTION_NAME,
+                        {field: update_payload[field] for field in vector_fields},
+                    ))
 
                     # 如果有需要更新的向量，添加向量更新操作
                     if vector_updates:
@@ -285,11 +294,20 @@ async def batch_create_jobs(jobs: List[Jobs]) -> tuple[int, List[Dict[str, Any]]
                     })
 
                     # 生成向量
+                    job_name_vec, job_descript_vec, job_require_vec = await asyncio.gather(
+                        vectorize(job.job_name),
+                        vectorize(job.job_descript),
+                        vectorize(job.job_require),
+                    )
                     vectors = {
-                        'job_name': await vectorize(job.job_name),
-                        'job_descript': await vectorize(job.job_descript),
-                        'job_require': await vectorize(job.job_require)
+                        'job_name': job_name_vec,
+                        'job_descript': job_descript_vec,
+                        'job_require': job_require_vec
                     }
+                    vectors.update(await asyncio.to_thread(
+                        sparse_vectors_for, qdrant_client, COLLECTION_NAME,
+                        {field: getattr(job, field) for field in JOB_VECTOR_FIELDS},
+                    ))
 
                     # 创建点
                     points.append(
@@ -74,11 +74,13 @@ async def career_talk(
         value = "无专业"
         print("学生不存在")
 
+    # 专业向量与宣讲会无关，只需嵌入一次
+    vector = await vectorize(value)
+
     result = []
     for item in quest.career_talk:
         career_talk_id = item.career_talk_id
         # 执行查询，应用过滤器来缩小搜索范围
-        vector = await vectorize(value)
         _jobs = qdrant_client.query_points(
             collection_name='job_test3',
             query=vector,  # <--- Dense vector
@@ -36,6 +36,39 @@ class Settings(BaseSettings):
     EMBEDDING_SIZE: int = 512
     EMBEDDING_MODEL_DEVICE: str = "gpu"
 
+    # Xinference 嵌入节点（按在途请求数负载均衡，失败节点自动熔断）
+    XINFERENCE_ENDPOINTS: list[str] = ["http://192.168.100.111:9997", "http://192.168.100.146:9997"]
+    EMBEDDING_BREAKER_FAILURE_THRESHOLD: int = 3
+    EMBEDDING_BREAKER_RECOVERY_TIMEOUT: float = 30.0
+    EMBEDDING_HTTP_TIMEOUT: float = 10.0
+    EMBEDDING_HTTP_MAX_CONNECTIONS: int = 20
+    EMBEDDING_MAX_CONCURRENCY: int = 8
+
+    # 嵌入后端: xinference（远程节点）/ local（进程内CPU）/ auto（短文本走本地，其余走远程）
+    EMBEDDING_BACKEND: str = "xinference"
+    EMBEDDING_LOCAL_MODEL_NAME: str = "BAAI/bge-m3"
+    EMBEDDING_LOCAL_QUANTIZE: bool = False
+    EMBEDDING_LOCAL_MAX_WORKERS: int = 2
+    EMBEDDING_LOCAL_MAX_CHARS: int = 32
+
+    # 嵌入请求微批处理
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # 嵌入缓存（进程内 LRU + 磁盘缓存）
+    EMBEDDING_MODEL_ID_PRO: str = "bge-m3"
+    EMBEDDING_CACHE_MEMORY_SIZE: int = 10000
+    EMBEDDING_CACHE_DISK_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: str = "./.cache/embeddings"
+    EMBEDDING_CACHE_DISK_SIZE_LIMIT: int = 2 * 1024 ** 3
+
+    # 混合检索（稠密 + 稀疏向量融合），集合需配置 <向量名>_sparse 稀疏向量
+    HYBRID_SEARCH_ENABLED: bool = False
+    HYBRID_FUSION: str = "rrf"  # rrf / dbsf
+    HYBRID_PREFETCH_LIMIT: int = 50
+    # bm25 / bge-m3；bge-m3 会在 API 进程内加载本地 BGE-M3 模型（数 GB），需显式开启
+    SPARSE_ENCODER: str = "bm25"
+
     # 预设（待修改）
     OPENAI_MODEL_ID: str = "qwen2-pro"
     OPENAI_API_KEY: str | None = None
@@ -57,6 +90,13 @@ class Settings(BaseSettings):
     COLLECTION_TEST: str = "job_test3"
     COLLECTION_NAME: str = "job_2024_1129"
 
+    # 知识库多租户模式：所有知识库写入同一集合，按 knowledge_id 分区（旧模式为每个知识库一个 zsk_{id} 集合）
+    KB_TENANT_MODE: bool = False
+    KB_SHARED_COLLECTION: str = "zsk_shared"
+    KB_TENANT_KEY: str = "knowledge_id"
+    # 知识库版本标记集合，知识库写入后更新，语义缓存据此失效
+    KB_VERSION_COLLECTION: str = "kb_versions"
+
     # LLM Model config
     TOKENIZERS_PARALLELISM: str = "false"
     HUGGINGFACE_ACCESS_TOKEN: str | None = None
@@ -66,6 +106,93 @@ class Settings(BaseSettings):
     TOP_K: int = 5
     KEEP_TOP_K: int = 5
     EXPAND_N_QUERY: int = 5
+    RAG_FUSION_K: int = 60  # RRF 平滑常数
+    RERANK_CANDIDATES: int = 20  # 融合去重后送去重排的文本块数量
+    QUERY_EXPANSION_CACHE_SIZE: int = 2048
+    QUERY_EXPANSION_CACHE_TTL: float = 6 * 3600
+    # 流水线检索：原始查询先检索，查询扩展在截止时间内返回才参与融合
+    RAG_PIPELINED_RETRIEVAL: bool = True
+    RAG_EXPANSION_DEADLINE: float = 1.5
+    RAG_EXPANSION_WORKERS: int = 8
+    # RAG 请求时间预算（秒）及各阶段所占比例，阶段顺序即执行顺序
+    RAG_DEADLINE: float = 20.0
+    RAG_STAGE_BUDGETS: dict[str, float] = {"expansion": 0.1, "retrieval": 0.15, "rerank": 0.15, "llm": 0.6}
+    RAG_MIN_RERANK_SECONDS: float = 0.3
+    # 上下文 token 预算，按目标模型的分词器计数
+    RAG_TOKENIZER: str = "Qwen/Qwen2.5-72B-Instruct"
+    RAG_CONTEXT_TOKEN_BUDGET: int = 3000
+    RAG_CONTEXT_MIN_PASSAGE_TOKENS: int = 64
+
+    # 重排序：remote（SiliconFlow）/ local（进程内交叉编码器）/ auto（远程失败时切换本地）
+    # 本地模型数 GB 且在 CPU 上推理，需显式配置 local/auto，启用时在应用启动阶段加载
+    RERANK_BACKEND: str = "remote"
+    RERANK_LOCAL_MODEL_NAME: str = "BAAI/bge-reranker-v2-m3"
+    RERANK_HTTP_TIMEOUT: float = 5.0
+    RERANK_MAX_CONCURRENCY: int = 8
+    RERANK_CACHE_SIZE: int = 50000
+    RERANK_CACHE_TTL: float = 24 * 3600
+
+    # 知识库问答语义缓存（相似问题直接返回历史结果，知识库版本变化后失效），默认关闭。
+    # bge 系列向量上只差一个实体或数字的问题（如"2023年"和"2024年"）余弦相似度常在 0.95 以上，
+    # 阈值过低会返回错误答案；0.98 只合并标点、语气词级别的差异，开启前应在业务问题上验证
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.98
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000
+    SEMANTIC_CACHE_MAX_BUCKETS: int = 256
+    SEMANTIC_CACHE_TTL: float = 24 * 3600
+
+    # LLM 客户端：按模型名登记 OpenAI 兼容接口，未登记的模型走 SiliconFlow
+    LLM_ENDPOINTS: dict[str, dict] = {
+        "qwen2-mini1": {"base_url": "http://192.168.100.111:8011/v1", "api_key": "empty", "max_concurrency": 8},
+        "qwen2-mini2": {"base_url": "http://192.168.100.111:8012/v1", "api_key": "empty", "max_concurrency": 8},
+    }
+    LLM_DEFAULT_MAX_CONCURRENCY: int = 32
+    # 逻辑模型 -> 副本（LLM_ENDPOINTS 中的模型名），请求按负载分配到副本
+    LLM_REPLICA_POOLS: dict[str, list[str]] = {"qwen2-mini": ["qwen2-mini1", "qwen2-mini2"]}
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 3
+    LLM_BREAKER_RECOVERY_TIMEOUT: float = 30.0
+    LLM_MAX_CONNECTIONS: int = 50
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+    # temperature=0 链的 LLM 响应磁盘缓存
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_DIR: str = "./.cache/llm_responses"
+    LLM_CACHE_SIZE_LIMIT: int = 512 * 1024 ** 2
+    LLM_CACHE_TTL: float = 7 * 24 * 3600
+    # 提示词监控：事件进入有界队列，由后台线程批量导出到 comet/jsonl/prometheus
+    COMET_API_KEY: str | None = None
+    COMET_WORKSPACE: str | None = None
+    COMET_PROJECT: str = "job-reco"
+    MONITORING_EXPORTER: str = "jsonl"
+    MONITORING_QUEUE_SIZE: int = 1000
+    MONITORING_BATCH_SIZE: int = 50
+    MONITORING_FLUSH_INTERVAL: float = 2.0
+    MONITORING_JSONL_DIR: str = "./.cache/monitoring"
+    # 字典集合内存索引：填表字典所在的 Qdrant 实例、需加载的集合和增量刷新间隔（秒，0 为不刷新）
+    VOCAB_INDEX_ENABLED: bool = True
+    VOCAB_QDRANT_URL: str = "http://192.168.100.111:6333"
+    VOCAB_DICTIONARY_COLLECTIONS: list[str] = [
+        "job_name", "cities_name", "education_levels", "attribute", "welfare", "majors_name"
+    ]
+    VOCAB_INDEX_REFRESH_INTERVAL: float = 300.0
+    # 字典归一化快速路径：标准名字段、生成别名时去掉的后缀、显式别名、补充词表文件，均按集合配置
+    NORMALIZATION_FAST_PATH_ENABLED: bool = True
+    VOCAB_NAME_FIELDS: dict[str, str] = {
+        "job_name": "三级",
+        "cities_name": "市区",
+        "education_levels": "学历要求",
+        "attribute": "工作属性",
+        "majors_name": "专业名称",
+    }
+    VOCAB_ALIAS_SUFFIXES: dict[str, list[str]] = {
+        "cities_name": ["特别行政区", "自治州", "地区", "市", "盟"],
+        "education_levels": ["及以上", "以上"],
+        "majors_name": ["专业"],
+    }
+    VOCAB_ALIASES: dict[str, dict[str, str]] = {}
+    VOCAB_EXTRA_SOURCES: dict[str, list[str]] = {}
+    # 前缀匹配只对行政区划这类"标准名 + 下级名称"的集合安全，岗位名等集合会把"销售经理"误归为"销售"
+    VOCAB_PREFIX_COLLECTIONS: list[str] = ["cities_name"]
+    VOCAB_PREFIX_MIN_CHARS: int = 2
 
 
     MONGO_MAX_POOL_SIZE: int = 100
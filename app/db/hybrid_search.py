@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/16 10:05
+# @Author  : Galleons
+# @File    : hybrid_search.py
+
+"""
+岗位集合的稠密 + 稀疏混合检索
+
+每个稠密命名向量（job_name / job_descript / job_require）旁边存一个同名加 _sparse 后缀的稀疏向量。
+查询时在一次 query_points 调用里分别预取稠密、稀疏候选，再由 Qdrant 做 RRF 或 DBSF 融合，
+精确技能词（Java、CAD）由稀疏向量召回，语义相近的描述由稠密向量召回，不再需要大量过取后重排。
+集合未配置对应稀疏向量（旧集合）或未开启混合检索时，自动退回单一稠密检索。
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from qdrant_client import QdrantClient, models
+
+from app.config import settings
+from app.utils.sparse_embeddings import get_sparse_encoder
+
+logger = logging.getLogger(__name__)
+
+JOB_VECTOR_FIELDS = ('job_name', 'job_descript', 'job_require')
+
+_FUSIONS = {
+    "rrf": models.Fusion.RRF,
+    "dbsf": models.Fusion.DBSF,
+}
+
+# (集合名, 稀疏向量名) -> 集合中是否存在该稀疏向量
+_sparse_support: Dict[Tuple[str, str], bool] = {}
+_sparse_support_lock = threading.Lock()
+
+
+def sparse_vector_name(dense_name: Optional[str]) -> str:
+    """稠密命名向量对应的稀疏向量名；未命名的默认向量对应 sparse"""
+    return f"{dense_name}_sparse" if dense_name else "sparse"
+
+
+def job_collection_config(dense_size: int = 1024) -> dict:
+    """岗位集合的向量配置，可直接展开传给 create_collection"""
+    modifier = get_sparse_encoder().modifier
+    return {
+        "vectors_config": {
+            field: models.VectorParams(size=dense_size, distance=models.Distance.COSINE)
+            for field in JOB_VECTOR_FIELDS
+        },
+        "sparse_vectors_config": {
+            sparse_vector_name(field): models.SparseVectorParams(modifier=modifier)
+            for field in JOB_VECTOR_FIELDS
+        },
+    }
+
+
+def ensure_job_collection(client: QdrantClient, collection_name: str, dense_size: int = 1024) -> None:
+    """集合不存在时按混合检索配置创建"""
+    if client.collection_exists(collection_name):
+        return
+    client.create_collection(collection_name=collection_name, **job_collection_config(dense_size))
+    logger.info(f"已创建混合检索岗位集合: {collection_name}")
+
+
+def supports_sparse(client: QdrantClient, collection_name: str, dense_name: Optional[str]) -> bool:
+    """集合是否配置了与稠密向量对应的稀疏向量（结果按进程缓存）"""
+    key = (collection_name, sparse_vector_name(dense_name))
+    if key not in _sparse_support:
+        sparse_config = client.get_collection(collection_name).config.params.sparse_vectors or {}
+        with _sparse_support_lock:
+            _sparse_support[key] = key[1] in sparse_config
+    return _sparse_support[key]
+
+
+def hybrid_enabled(client: QdrantClient, collection_name: str, dense_name: Optional[str]) -> bool:
+    if not settings.HYBRID_SEARCH_ENABLED:
+        return False
+    try:
+        return supports_sparse(client, collection_name, dense_name)
+    except Exception as e:
+        logger.warning(f"读取集合 {collection_name} 配置失败，使用稠密检索: {str(e)}")
+        return False
+
+
+def sparse_vectors_for(
+        client: QdrantClient,
+        collection_name: str,
+        fields: Dict[str, str],
+) -> Dict[str, models.SparseVector]:
+    """
+    为写入/更新准备稀疏向量
+
+    Args:
+        fields: {稠密向量名: 原文}
+
+    Returns:
+        {稀疏向量名: 稀疏向量}；未开启混合检索或集合不支持时返回空字典
+    """
+    names = [name for name in fields if hybrid_enabled(client, collection_name, name)]
+    if not names:
+        return {}
+    vectors = get_sparse_encoder().encode_documents([fields[name] for name in names])
+    return {sparse_vector_name(name): vector for name, vector in zip(names, vectors)}
+
+
+def _build_request(
+        dense_vector: Sequence[float],
+        sparse_vector: models.SparseVector,
+        using: Optional[str],
+        query_filter: Optional[models.Filter],
+        limit: int,
+        score_threshold: Optional[float],
+        fusion: Optional[str],
+) -> dict:
+    prefetch_limit = max(limit, settings.HYBRID_PREFETCH_LIMIT)
+    return {
+        "prefetch": [
+            # 稠密分数才有阈值语义，融合分数只反映排名，阈值放在稠密预取上
+            models.Prefetch(
+                query=list(dense_vector),
+                using=using,
+                filter=query_filter,
+                score_threshold=score_threshold,
+                limit=prefetch_limit,
+            ),
+            models.Prefetch(
+                query=sparse_vector,
+                using=sparse_vector_name(using),
+                filter=query_filter,
+                limit=prefetch_limit,
+            ),
+        ],
+        "query": models.FusionQuery(fusion=_FUSIONS[(fusion or settings.HYBRID_FUSION).lower()]),
+        "query_filter": query_filter,
+        "limit": limit,
+    }
+
+
+def hybrid_query_points(
+        client: QdrantClient,
+        collection_name: str,
+        dense_vector: Sequence[float],
+        text: str,
+        using: Optional[str] = None,
+        query_filter: Optional[models.Filter] = None,
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        with_payload=True,
+        fusion: Optional[str] = None,
+) -> List[models.ScoredPoint]:
+    """
+    稠密 + 稀疏融合检索，不满足条件时退回稠密检索
+
+    Args:
+        dense_vector: 查询文本的稠密向量
+        text: 查询原文，用于生成稀疏向量
+        using: 稠密命名向量
+        score_threshold: 稠密相似度阈值
+        fusion: rrf / dbsf，默认取配置 HYBRID_FUSION
+    """
+    if not text or not hybrid_enabled(client, collection_name, using):
+        return client.query_points(
+            collection_name=collection_name,
+            query=list(dense_vector),
+            using=using,
+            query_filter=query_filter,
+            score_threshold=score_threshold,
+            with_payload=with_payload,
+            limit=limit,
+        ).points
+
+    sparse_vector = get_sparse_encoder().encode_query(text)
+    return client.query_points(
+        collection_name=collection_name,
+        with_payload=with_payload,
+        **_build_request(dense_vector, sparse_vector, using, query_filter, limit, score_threshold, fusion),
+    ).points
+
+
+async def ahybrid_query_points(
+        client: QdrantClient,
+        collection_name: str,
+        dense_vector: Sequence[float],
+        text: str,
+        using: Optional[str] = None,
+        query_filter: Optional[models.Filter] = None,
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        with_payload=True,
+        fusion: Optional[str] = None,
+) -> List[models.ScoredPoint]:
+    """hybrid_query_points 的 async 版本，稀疏编码在线程中执行"""
+    if not text or not hybrid_enabled(client, collection_name, using):
+        return hybrid_query_points(
+            client, collection_name, dense_vector, "", using, query_filter, limit, score_threshold, with_payload
+        )
+
+    sparse_vector = await get_sparse_encoder().aencode_query(text)
+    return client.query_points(
+        collection_name=collection_name,
+        with_payload=with_payload,
+        **_build_request(dense_vector, sparse_vector, using, query_filter, limit, score_threshold, fusion),
+    ).points
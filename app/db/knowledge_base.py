@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/22 10:30
+# @Author  : Galleons
+# @File    : knowledge_base.py
+
+"""
+知识库集合的多租户模式
+
+旧模式下每个知识库一个 zsk_{knowledge_id} 集合，每个集合各有一套 HNSW 图、段文件和优化线程，
+内存和启动时间随知识库数量线性增长。
+开启 KB_TENANT_MODE 后，所有知识库文档写入同一个共享集合，按 knowledge_id 分区：
+- knowledge_id 建立 is_tenant 关键字索引，同一租户的数据在存储上相邻
+- 关闭全局 HNSW 图（m=0），只按租户构建（payload_m），查询总是带租户过滤
+
+对外接口仍使用 zsk_{knowledge_id} 作为集合名，由 resolve_kb_targets 转换为共享集合 + 租户过滤。
+"""
+
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from qdrant_client import models
+
+from app.config import settings
+
+KB_COLLECTION_PREFIX = "zsk_"
+
+
+def kb_collection_name(knowledge_id: str) -> str:
+    """旧模式下知识库对应的集合名"""
+    return f"{KB_COLLECTION_PREFIX}{knowledge_id}"
+
+
+def parse_knowledge_id(collection_name: str) -> Optional[str]:
+    """从 zsk_{knowledge_id} 集合名中解析知识库ID，不是知识库集合时返回 None"""
+    if collection_name.startswith(KB_COLLECTION_PREFIX) and collection_name != settings.KB_SHARED_COLLECTION:
+        return collection_name[len(KB_COLLECTION_PREFIX):]
+    return None
+
+
+def tenant_point_id(knowledge_id: str, point_id) -> str:
+    """
+    共享集合中的点ID
+
+    文本块ID是内容的 md5，同一文本出现在两个知识库时ID相同，合并到一个集合后会互相覆盖，
+    因此按 (knowledge_id, 原ID) 生成确定性的 UUID。
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{knowledge_id}:{point_id}"))
+
+
+def kb_version_point_id(kb_collection: str) -> str:
+    """知识库版本标记在 KB_VERSION_COLLECTION 中的点ID"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"kb-version:{kb_collection}"))
+
+
+def tenant_filter(knowledge_ids: List[str], base: Optional[models.Filter] = None) -> models.Filter:
+    """在已有过滤条件上追加租户条件"""
+    condition = models.FieldCondition(
+        key=settings.KB_TENANT_KEY,
+        match=models.MatchValue(value=knowledge_ids[0]) if len(knowledge_ids) == 1 else models.MatchAny(any=knowledge_ids),
+    )
+    if base is None:
+        return models.Filter(must=[condition])
+    return models.Filter(must=[condition, *(base.must or [])], should=base.should, must_not=base.must_not)
+
+
+def resolve_kb_targets(
+        collections: List[str], query_filter: Optional[models.Filter] = None
+) -> List[Tuple[str, Optional[models.Filter], int]]:
+    """
+    把请求中的集合名转换为实际检索目标
+
+    Returns:
+        [(集合名, 过滤条件, 合并的原集合数量)]；
+        租户模式下所有知识库集合合并为一次共享集合检索，数量用于按比例分配 limit
+    """
+    if not settings.KB_TENANT_MODE:
+        return [(collection, query_filter, 1) for collection in collections]
+
+    targets = []
+    knowledge_ids = []
+    for collection in collections:
+        knowledge_id = parse_knowledge_id(collection)
+        if knowledge_id is None:
+            targets.append((collection, query_filter, 1))
+        else:
+            knowledge_ids.append(knowledge_id)
+    if knowledge_ids:
+        targets.append((settings.KB_SHARED_COLLECTION, tenant_filter(knowledge_ids, query_filter), len(knowledge_ids)))
+    return targets
+
+
+def tenant_collection_config(vector_size: int) -> Dict:
+    """共享集合配置，可直接展开传给 create_collection"""
+    return {
+        "vectors_config": models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+        # 查询总是带租户过滤，不需要全局图，只为每个租户构建局部图
+        "hnsw_config": models.HnswConfigDiff(payload_m=16, m=0),
+    }
+
+
+def tenant_index_schema() -> models.KeywordIndexParams:
+    return models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True)
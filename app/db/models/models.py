@@ -182,3 +182,4 @@ class QueryRequest(BaseModel):
     is_vector : bool = True
     top_k : int = 10
     filtered : dict = None
+    using : Optional[str] = None  # 命名向量，如 job_name / job_descript
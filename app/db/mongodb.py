@@ -7,6 +7,7 @@
 MongoDB 连接模块
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator, Optional, Any, Dict, List
@@ -26,6 +27,11 @@ from app.utils.monitoring import (
     MONGO_ERRORS
 )
 from app.db.models.resume_update import ResumeUpdate, BatchResumesUpdate, UpdateOperation
+from app.services.monitoring.batch_exporter import shutdown_batch_exporter
+from app.services.normalization import get_vocab_service
+from app.services.rag.context_packer import get_token_counter
+from app.services.rag.reranking import get_reranker
+from app.utils.sparse_embeddings import get_sparse_encoder
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -196,9 +202,24 @@ async def lifespan(app: "FastAPI"):  # type: ignore
         # 启动 Prometheus 指标服务器
         start_http_server(settings.METRICS_PORT)
         await MongoDBManager.connect_to_database()
+        if settings.HYBRID_SEARCH_ENABLED:
+            # 稀疏编码模型在启动时加载，避免第一次混合检索承担加载耗时
+            await asyncio.to_thread(get_sparse_encoder().warmup)
+        # RAG 上下文拼装使用的分词器同样在启动时加载
+        await asyncio.to_thread(get_token_counter)
+        if settings.RERANK_BACKEND != "remote":
+            # 本地重排序模型同样在启动时加载，远程超时切换到本地时不在请求内加载
+            await asyncio.to_thread(get_reranker().warmup)
+        if settings.VOCAB_INDEX_ENABLED:
+            # 字典集合加载到内存索引，失败时查询回退到 Qdrant
+            await asyncio.to_thread(get_vocab_service().start)
         yield
     finally:
         await MongoDBManager.close_database_connection()
+        if settings.VOCAB_INDEX_ENABLED:
+            get_vocab_service().stop()
+        # 导出监控队列中剩余的事件
+        await asyncio.to_thread(shutdown_batch_exporter)
 
 
 # 用于依赖注入的异步函数
@@ -1,9 +1,13 @@
+import time
+import uuid
+
 from qdrant_client import QdrantClient, models
 from qdrant_client.http.exceptions import UnexpectedResponse
 from qdrant_client.http.models import Batch, Distance, VectorParams
 
 from app.utils.logging import get_logger
 from app.config import settings
+from app.db.knowledge_base import kb_version_point_id, tenant_collection_config, tenant_index_schema
 
 logger = get_logger(__name__)
 
@@ -50,6 +54,23 @@ class QdrantDatabaseConnector:
             ),
         )
 
+    def create_tenant_collection(self, collection_name: str):
+        """创建按 knowledge_id 分区的共享知识库集合"""
+        self._instance.create_collection(
+            collection_name=collection_name,
+            **tenant_collection_config(settings.EMBEDDING_SIZE),
+        )
+        self._instance.create_payload_index(
+            collection_name=collection_name,
+            field_name=settings.KB_TENANT_KEY,
+            field_schema=tenant_index_schema(),
+        )
+
+    def count(self, collection_name: str, query_filter: models.Filter | None = None) -> int:
+        return self._instance.count(
+            collection_name=collection_name, count_filter=query_filter, exact=True
+        ).count
+
     def write_data(self, collection_name: str, points: Batch):
         try:
             self._instance.upsert(collection_name=collection_name, points=points)
@@ -58,6 +79,37 @@ class QdrantDatabaseConnector:
 
             raise
 
+    def bump_kb_version(self, kb_collection: str) -> None:
+        """
+        知识库内容写入后更新其版本标记，语义缓存据此判断旧答案失效
+
+        标记保存在独立的无向量集合中（每个知识库一个点），多进程、多实例共享；
+        原地更新或删除后插入同样数量的文本块时点数不变，只靠点数无法感知。
+        """
+        point = models.PointStruct(
+            id=kb_version_point_id(kb_collection),
+            vector={},
+            payload={"collection": kb_collection, "version": uuid.uuid4().hex, "updated_at": time.time()},
+        )
+        try:
+            self._instance.upsert(collection_name=settings.KB_VERSION_COLLECTION, points=[point])
+        except (UnexpectedResponse, ValueError):
+            # 首次写入时版本集合尚不存在
+            self.create_non_vector_collection(settings.KB_VERSION_COLLECTION)
+            self._instance.upsert(collection_name=settings.KB_VERSION_COLLECTION, points=[point])
+
+    def kb_version(self, kb_collection: str) -> str | None:
+        """知识库当前的版本标记，从未通过 bump_kb_version 写入过时返回 None"""
+        try:
+            points = self._instance.retrieve(
+                collection_name=settings.KB_VERSION_COLLECTION,
+                ids=[kb_version_point_id(kb_collection)],
+                with_payload=["version"],
+            )
+        except (UnexpectedResponse, ValueError):
+            return None
+        return points[0].payload["version"] if points else None
+
     def search(
         self,
         collection_name: str,
@@ -72,6 +124,30 @@ class QdrantDatabaseConnector:
             limit=limit,
         )
 
+    def search_batch(
+        self,
+        collection_name: str,
+        query_vectors: list[list],
+        query_filter: models.Filter | None = None,
+        limit: int = 3,
+        timeout: int | None = None,
+    ) -> list[list]:
+        """同一集合的多条查询合并为一次 query_batch_points 请求，按查询顺序返回结果，timeout 为服务端超时（秒）"""
+        responses = self._instance.query_batch_points(
+            collection_name=collection_name,
+            requests=[
+                models.QueryRequest(
+                    query=query_vector,
+                    filter=query_filter,
+                    limit=limit,
+                    with_payload=True,
+                )
+                for query_vector in query_vectors
+            ],
+            timeout=timeout,
+        )
+        return [response.points for response in responses]
+
     def scroll(self, collection_name: str, limit: int):
         return self._instance.scroll(collection_name=collection_name, limit=limit)
 
@@ -2,6 +2,8 @@ from bytewax.outputs import DynamicSink, StatelessSinkPartition
 from qdrant_client.http.api_client import UnexpectedResponse
 from qdrant_client.models import Batch
 from app.utils.logging import get_logger
+from app.config import settings
+from app.db.knowledge_base import kb_collection_name, tenant_point_id
 from app.db.qdran import QdrantDatabaseConnector
 from app.feature_pipeline.models.base import VectorDBDataModel
 
@@ -135,22 +137,37 @@ class QdrantVectorDataSink(StatelessSinkPartition):
 
     def __init__(self, connection: QdrantDatabaseConnector):
         self._client = connection
+        self._known_collections: set[str] = set()
+
+    def _ensure_kb_collection(self, collection_name: str) -> None:
+        if collection_name in self._known_collections:
+            return
+        try:
+            self._client.get_collection(collection_name=collection_name)
+        except UnexpectedResponse:
+            logger.info(
+                "未检测到知识库。正在创建一个新的知识库...",
+                collection_name=collection_name,
+            )
+            if settings.KB_TENANT_MODE:
+                self._client.create_tenant_collection(collection_name=collection_name)
+            else:
+                self._client.create_vector_collection(collection_name=collection_name)
+        self._known_collections.add(collection_name)
 
     def write_batch(self, items: list[VectorDBDataModel]) -> None:
         payloads = [item.to_payload() for item in items]
         ids, vectors, meta_data = zip(*payloads)
         if meta_data[0]["type"] == "documents":
-            collection_name = f"zsk_{str(meta_data[0]['knowledge_id'])}"
-            try:
-                self._client.get_collection(collection_name=collection_name)
-            except UnexpectedResponse:
-                logger.info(
-                    "未检测到知识库。正在创建一个新的知识库...",
-                    collection_name=collection_name,
-                )
-                self._client.create_vector_collection(
-                    collection_name=collection_name
+            if settings.KB_TENANT_MODE:
+                # 所有知识库共用一个集合，knowledge_id 已在 payload 中，由租户索引分区
+                collection_name = settings.KB_SHARED_COLLECTION
+                ids = tuple(
+                    tenant_point_id(data[settings.KB_TENANT_KEY], point_id) for point_id, data in zip(ids, meta_data)
                 )
+            else:
+                collection_name = kb_collection_name(str(meta_data[0]['knowledge_id']))
+            self._ensure_kb_collection(collection_name)
             logger.debug(
                 "数据类型：",
                 datamodels=meta_data,
@@ -161,6 +178,10 @@ class QdrantVectorDataSink(StatelessSinkPartition):
             collection_name=collection_name,
             points=Batch(ids=ids, vectors=vectors, payloads=meta_data),
         )
+        if meta_data[0]["type"] == "documents":
+            # 更新涉及的知识库版本，使基于旧内容的语义缓存失效
+            for knowledge_id in {str(data["knowledge_id"]) for data in meta_data}:
+                self._client.bump_kb_version(kb_collection_name(knowledge_id))
 
         logger.info(
             "成功插入请求的向量点",
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/22 15:10
+# @Author  : Galleons
+# @File    : kb_tenant_migration.py
+
+"""
+知识库集合迁移：zsk_{knowledge_id} -> 多租户共享集合
+
+逐个滚动读取旧的知识库集合（含向量），写入 KB_SHARED_COLLECTION，
+payload 中补全 knowledge_id，点ID按 (knowledge_id, 原ID) 重新生成，避免不同知识库的相同文本块互相覆盖。
+每个集合迁移后核对点数，指定 --delete-source 时才删除旧集合。
+
+用法：
+    python -m app.services.data_process.kb_tenant_migration [--dry-run] [--delete-source] [--batch-size 256]
+"""
+
+import argparse
+import logging
+from typing import List
+
+from qdrant_client import QdrantClient, models
+from tqdm import tqdm
+
+from app.config import settings
+from app.db.knowledge_base import (
+    parse_knowledge_id,
+    tenant_collection_config,
+    tenant_filter,
+    tenant_index_schema,
+    tenant_point_id,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def list_kb_collections(client: QdrantClient) -> List[str]:
+    return sorted(
+        collection.name for collection in client.get_collections().collections
+        if parse_knowledge_id(collection.name) is not None
+    )
+
+
+def ensure_shared_collection(client: QdrantClient, vector_size: int) -> None:
+    if client.collection_exists(settings.KB_SHARED_COLLECTION):
+        return
+    client.create_collection(
+        collection_name=settings.KB_SHARED_COLLECTION,
+        **tenant_collection_config(vector_size),
+    )
+    client.create_payload_index(
+        collection_name=settings.KB_SHARED_COLLECTION,
+        field_name=settings.KB_TENANT_KEY,
+        field_schema=tenant_index_schema(),
+    )
+    logger.info(f"已创建共享知识库集合: {settings.KB_SHARED_COLLECTION}")
+
+
+def migrate_collection(client: QdrantClient, collection_name: str, batch_size: int = 256) -> int:
+    """把一个知识库集合的全部点写入共享集合，返回迁移的点数"""
+    knowledge_id = parse_knowledge_id(collection_name)
+    total = client.count(collection_name, exact=True).count
+    migrated = 0
+    offset = None
+    with tqdm(total=total, desc=collection_name) as progress:
+        while True:
+            records, offset = client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if records:
+                client.upsert(
+                    collection_name=settings.KB_SHARED_COLLECTION,
+                    points=[
+                        models.PointStruct(
+                            id=tenant_point_id(knowledge_id, record.id),
+                            vector=record.vector,
+                            payload={**(record.payload or {}), settings.KB_TENANT_KEY: knowledge_id},
+                        )
+                        for record in records
+                    ],
+                    wait=True,
+                )
+                migrated += len(records)
+                progress.update(len(records))
+            if offset is None:
+                break
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="迁移 zsk_* 知识库集合到多租户共享集合")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--dry-run", action="store_true", help="只列出待迁移的集合")
+    parser.add_argument("--delete-source", action="store_true", help="核对点数一致后删除旧集合")
+    args = parser.parse_args()
+
+    client = QdrantClient(host=settings.QDRANT_DATABASE_HOST, port=settings.QDRANT_DATABASE_PORT)
+    collections = list_kb_collections(client)
+    logger.info(f"待迁移的知识库集合: {collections}")
+    if args.dry_run or not collections:
+        return
+
+    vector_size = client.get_collection(collections[0]).config.params.vectors.size
+    ensure_shared_collection(client, vector_size)
+
+    for collection_name in collections:
+        source_size = client.get_collection(collection_name).config.params.vectors.size
+        if source_size != vector_size:
+            logger.error(f"{collection_name} 向量维度 {source_size} 与共享集合 {vector_size} 不一致，跳过")
+            continue
+
+        migrated = migrate_collection(client, collection_name, args.batch_size)
+        knowledge_id = parse_knowledge_id(collection_name)
+        in_shared = client.count(
+            settings.KB_SHARED_COLLECTION, count_filter=tenant_filter([knowledge_id]), exact=True
+        ).count
+        logger.info(f"{collection_name}: 迁移 {migrated} 个点，共享集合中该租户共 {in_shared} 个点")
+
+        if args.delete_source:
+            if in_shared >= migrated:
+                client.delete_collection(collection_name)
+                logger.info(f"已删除旧集合: {collection_name}")
+            else:
+                logger.error(f"{collection_name} 点数核对不一致，保留旧集合")
+
+
+if __name__ == "__main__":
+    main()
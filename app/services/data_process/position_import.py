@@ -12,8 +12,6 @@ from qdrant_client import QdrantClient, models
 from typing import List, Dict, Any
 import logging
 from time import sleep
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
 # 设置日志
 logging.basicConfig(
@@ -27,41 +25,24 @@ logging.basicConfig(
 
 # 初始化连接
 qdrant_connection = QdrantClient(url="192.168.15.93:6333")
-from xinference.client import Client
-
-xinference_connection_1 = Client("http://192.168.100.111:9997")
-xinference_connection_2 = Client("http://192.168.100.146:9997")
-embed_model_1 = xinference_connection_1.get_model("bge-m3")
-embed_model_2 = xinference_connection_2.get_model("bge-m3")
-
-def get_embedding(text: str, model_num: int = 1):
-    """获取embedding，支持故障转移"""
-    try:
-        model = embed_model_1 if model_num == 1 else embed_model_2
-        return model.create_embedding(text)['data'][0]['embedding']
-    except Exception as e:
-        logging.warning(f"Error using model {model_num}: {str(e)}, trying alternate model")
-        model = embed_model_2 if model_num == 1 else embed_model_1
-        return model.create_embedding(text)['data'][0]['embedding']
+from app.utils.embeddings import embed_texts
 
 def create_point(publish_id: int, doc: Dict[str, Any]) -> models.PointStruct:
-    """创建单个数据点，并行处理embedding"""
+    """创建单个数据点，三个字段合并为一次嵌入请求，由嵌入路由分配到负载最低的节点"""
     try:
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            # 并行执行三个embedding任务，随机分配到两个服务器
-            future_name = executor.submit(get_embedding, doc['digital_desc'], 1)
-            future_desc = executor.submit(get_embedding, doc['position_name'], 2)
-            future_req = executor.submit(get_embedding, doc['description'], 1)
+        digital_embed, name_embed, desc_embed = embed_texts(
+            [doc['digital_desc'], doc['position_name'], doc['description']]
+        )
 
-            return models.PointStruct(
-                id=publish_id,
-                vector={
-                    'digital_desc': future_name.result(),
-                    'position_name': future_desc.result(),
-                    'description': future_req.result(),
-                },
-                payload=doc
-            )
+        return models.PointStruct(
+            id=publish_id,
+            vector={
+                'digital_desc': digital_embed,
+                'position_name': name_embed,
+                'description': desc_embed,
+            },
+            payload=doc
+        )
     except Exception as e:
         logging.error(f"Error creating point {publish_id}: {str(e)}")
         raise
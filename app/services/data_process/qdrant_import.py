@@ -4,8 +4,6 @@ from qdrant_client import QdrantClient, models
 from typing import List, Dict, Any
 import logging
 from time import sleep
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
 # 设置日志
 logging.basicConfig(
@@ -19,41 +17,33 @@ logging.basicConfig(
 
 # 初始化连接
 qdrant_connection = QdrantClient(url="192.168.100.146:6333")
-from xinference.client import Client
+from app.utils.embeddings import embed_texts
+from app.db.hybrid_search import JOB_VECTOR_FIELDS, ensure_job_collection, sparse_vectors_for
 
-xinference_connection_1 = Client("http://192.168.100.111:9997")
-xinference_connection_2 = Client("http://192.168.100.146:9997")
-embed_model_1 = xinference_connection_1.get_model("bge-m3")
-embed_model_2 = xinference_connection_2.get_model("bge-m3")
-
-def get_embedding(text: str, model_num: int = 1):
-    """获取embedding，支持故障转移"""
-    try:
-        model = embed_model_1 if model_num == 1 else embed_model_2
-        return model.create_embedding(text)['data'][0]['embedding']
-    except Exception as e:
-        logging.warning(f"Error using model {model_num}: {str(e)}, trying alternate model")
-        model = embed_model_2 if model_num == 1 else embed_model_1
-        return model.create_embedding(text)['data'][0]['embedding']
+COLLECTION_NAME = "job_test3"
 
 def create_point(publish_id: int, doc: Dict[str, Any]) -> models.PointStruct:
-    """创建单个数据点，并行处理embedding"""
+    """创建单个数据点，三个字段合并为一次嵌入请求，由嵌入路由分配到负载最低的节点"""
     try:
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            # 并行执行三个embedding任务，随机分配到两个服务器
-            future_name = executor.submit(get_embedding, doc['job_name'], 1)
-            future_desc = executor.submit(get_embedding, doc['job_descript'], 2)
-            future_req = executor.submit(get_embedding, doc['job_require'], 1)
-
-            return models.PointStruct(
-                id=publish_id,
-                vector={
-                    'job_name': future_name.result(),
-                    'job_descript': future_desc.result(),
-                    'job_require': future_req.result(),
-                },
-                payload=doc
-            )
+        name_embed, desc_embed, req_embed = embed_texts(
+            [doc['job_name'], doc['job_descript'], doc['job_require']]
+        )
+
+        # 集合配置了稀疏向量时一并写入，供混合检索使用
+        sparse_vectors = sparse_vectors_for(
+            qdrant_connection, COLLECTION_NAME, {field: doc[field] for field in JOB_VECTOR_FIELDS}
+        )
+
+        return models.PointStruct(
+            id=publish_id,
+            vector={
+                'job_name': name_embed,
+                'job_descript': desc_embed,
+                'job_require': req_embed,
+                **sparse_vectors,
+            },
+            payload=doc
+        )
     except Exception as e:
         logging.error(f"Error creating point {publish_id}: {str(e)}")
         raise
@@ -94,6 +84,9 @@ def main():
         json_job = job_names.to_dict(orient='records')
         # json_job = json_job[:100]
 
+        # 新集合按混合检索配置创建（稠密 + 稀疏命名向量），需在生成数据点之前，以便写入稀疏向量
+        ensure_job_collection(qdrant_connection, COLLECTION_NAME)
+
         # 创建所有点的列表
         points = []
         for doc in tqdm(json_job, total=len(json_job), desc="Creating points"):
@@ -108,7 +101,7 @@ def main():
         batch_upload_points(
             points=points,
             # collection_name="job_2024_1119",
-            collection_name="job_test3",
+            collection_name=COLLECTION_NAME,
             batch_size=100,  # 可以根据需要调整批次大小
             max_retries=3
         )
@@ -13,7 +13,6 @@ from typing import List, Dict, Any, Optional
 import logging
 from time import sleep
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from asyncio import Semaphore
 
 # 设置日志
@@ -28,50 +27,35 @@ logging.basicConfig(
 
 # 初始化连接
 qdrant_connection = QdrantClient(url="192.168.15.93:6333")
-from xinference.client import Client
+from app.utils.embeddings import aembed_texts
+from app.db.hybrid_search import JOB_VECTOR_FIELDS, ensure_job_collection, sparse_vectors_for
 
-xinference_connection_1 = Client("http://192.168.100.111:9997")
-xinference_connection_2 = Client("http://192.168.100.146:9997")
-embed_model_1 = xinference_connection_1.get_model("bge-m3")
-embed_model_2 = xinference_connection_2.get_model("bge-m3")
-
-
-def get_embedding(text: str, model_num: int = 1):
-    """获取embedding，支持故障转移"""
-    try:
-        model = embed_model_1 if model_num == 1 else embed_model_2
-        return model.create_embedding(text)['data'][0]['embedding']
-    except Exception as e:
-        logging.warning(f"Error using model {model_num}: {str(e)}, trying alternate model")
-        model = embed_model_2 if model_num == 1 else embed_model_1
-        return model.create_embedding(text)['data'][0]['embedding']
+COLLECTION_NAME = "job_2024_1129"
 
 
 async def create_point_async(publish_id: int, doc: Dict[str, Any], sem: Semaphore) -> Optional[models.PointStruct]:
     """异步创建单个数据点"""
     async with sem:  # 使用信号量控制并发
         try:
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                loop = asyncio.get_event_loop()
-                # 并行执行三个embedding任务
-                future_name = loop.run_in_executor(executor, get_embedding, doc['job_name'], 2)
-                future_desc = loop.run_in_executor(executor, get_embedding, doc['job_descript'], 1)
-                future_req = loop.run_in_executor(executor, get_embedding, doc['job_require'], 1)
-
-                # 等待所有embedding完成
-                name_embed, desc_embed, req_embed = await asyncio.gather(
-                    future_name, future_desc, future_req
-                )
-
-                return models.PointStruct(
-                    id=publish_id,
-                    vector={
-                        'job_name': name_embed,
-                        'job_descript': desc_embed,
-                        'job_require': req_embed,
-                    },
-                    payload=doc
-                )
+            # 三个字段合并为一次嵌入请求，由嵌入路由分配到负载最低的节点
+            name_embed, desc_embed, req_embed = await aembed_texts(
+                [doc['job_name'], doc['job_descript'], doc['job_require']]
+            )
+
+            sparse_vectors = await asyncio.to_thread(
+                sparse_vectors_for, qdrant_connection, COLLECTION_NAME, {field: doc[field] for field in JOB_VECTOR_FIELDS}
+            )
+
+            return models.PointStruct(
+                id=publish_id,
+                vector={
+                    'job_name': name_embed,
+                    'job_descript': desc_embed,
+                    'job_require': req_embed,
+                    **sparse_vectors,
+                },
+                payload=doc
+            )
         except Exception as e:
             logging.error(f"Error creating point {publish_id}: {str(e)}")
             return None
@@ -136,13 +120,16 @@ def main():
         json_job = job_names.to_dict(orient='records')
         json_job = json_job
 
+        # 新集合按混合检索配置创建（稠密 + 稀疏命名向量），需在生成数据点之前，以便写入稀疏向量
+        ensure_job_collection(qdrant_connection, COLLECTION_NAME)
+
         # 异步创建所有点
         points = asyncio.run(create_points_parallel(json_job))
 
         # 分批上传
         batch_upload_points(
             points=points,
-            collection_name="job_2024_1129",
+            collection_name=COLLECTION_NAME,
             # collection_name="job_test2",
             batch_size=100,
             max_retries=3
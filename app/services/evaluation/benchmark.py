@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/24 17:00
+# @Author  : Galleons
+# @File    : benchmark.py
+
+"""
+离线 RAG 延迟与质量基准测试
+
+用内存 Qdrant（QdrantClient(":memory:")）和 fakes.py 中的本地替身跑完整的 VectorRetriever + WEYON_LLM 链路，
+不访问网络，结果可重复。对黄金查询集输出：
+- 各阶段延迟分位数：expansion / embedding / search / retrieval / rerank / llm / total（毫秒）
+- 检索质量：融合后与重排后的 recall@k、MRR
+- 下游调用次数：嵌入、查询扩展、Qdrant 批量检索、重排（含打分文本块数）、LLM
+
+与基线报告对比时，延迟或质量退化超过阈值即返回非零退出码，可在检索相关改动合入前运行。
+
+用法：
+    python -m app.services.evaluation.benchmark [--iterations 3] [--mode pipelined|standard]
+        [--output report.json] [--baseline baseline.json] [--max-regression 0.2]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+import numpy as np
+from pydantic import BaseModel
+from qdrant_client import QdrantClient, models
+
+from app.config import settings
+from app.db.qdran import QdrantDatabaseConnector
+from app.services.evaluation.fakes import (
+    FakeChatModel,
+    FakeEmbedder,
+    FakeQueryExpander,
+    FakeRerankBackend,
+)
+from app.services.llm import inference_pipeline
+from app.services.llm.inference_pipeline import WEYON_LLM
+from app.services.rag import context_packer, retriever as retriever_module
+from app.services.rag.context_packer import EstimateTokenCounter
+from app.services.rag.deadline import Deadline
+from app.services.rag.reranking import Reranker
+from app.services.rag.retriever import VectorRetriever
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GOLDEN_SET = Path(__file__).parent / "data" / "rag_golden.json"
+STAGES = ["expansion", "embedding", "search", "retrieval", "rerank", "llm", "total"]
+
+
+class GoldenDocument(BaseModel):
+    id: int
+    collection: str
+    content: str
+
+
+class GoldenQuery(BaseModel):
+    query: str
+    collections: List[str]
+    relevant: List[int]
+
+
+class GoldenSet(BaseModel):
+    documents: List[GoldenDocument]
+    queries: List[GoldenQuery]
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_GOLDEN_SET) -> "GoldenSet":
+        with open(path, encoding="utf-8") as f:
+            return cls.model_validate(json.load(f))
+
+
+class StageTimer:
+    """按阶段记录耗时（秒），查询扩展在后台线程中执行，记录需线程安全"""
+
+    def __init__(self):
+        self.records: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, elapsed: float) -> None:
+        with self._lock:
+            self.records[stage].append(elapsed)
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            with self.stage(stage):
+                return fn(*args, **kwargs)
+
+        return timed
+
+
+def percentiles(values: List[float]) -> dict:
+    """耗时分位数（毫秒）"""
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0}
+    values_ms = np.asarray(values) * 1000
+    return {
+        "count": len(values),
+        "mean": round(float(values_ms.mean()), 3),
+        "p50": round(float(np.percentile(values_ms, 50)), 3),
+        "p90": round(float(np.percentile(values_ms, 90)), 3),
+        "p99": round(float(np.percentile(values_ms, 99)), 3),
+    }
+
+
+def recall_at_k(ranked_ids: List[int], relevant: List[int], k: int) -> float:
+    if not relevant:
+        return 0.0
+    return len(set(ranked_ids[:k]) & set(relevant)) / len(relevant)
+
+
+def reciprocal_rank(ranked_ids: List[int], relevant: List[int]) -> float:
+    for rank, doc_id in enumerate(ranked_ids, start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+class RAGBenchmark:
+    def __init__(
+            self,
+            golden: Optional[GoldenSet] = None,
+            pipelined: Optional[bool] = None,
+            embed_latency: float = 0.0,
+            expansion_latency: float = 0.0,
+            rerank_latency: float = 0.0,
+            llm_latency: float = 0.0,
+            deadline: Optional[float] = None,
+    ):
+        """
+        Args:
+            golden: 黄金查询集，默认读取 data/rag_golden.json
+            pipelined: 是否使用流水线检索，默认取 RAG_PIPELINED_RETRIEVAL
+            embed_latency / expansion_latency / rerank_latency / llm_latency: 替身模拟的下游延迟（秒）
+            deadline: 每个请求的时间预算（秒），默认取 RAG_DEADLINE
+        """
+        self.golden = golden or GoldenSet.load()
+        self.pipelined = settings.RAG_PIPELINED_RETRIEVAL if pipelined is None else pipelined
+        self.deadline = deadline
+        self.embedder = FakeEmbedder(latency=embed_latency)
+        self.expander = FakeQueryExpander(latency=expansion_latency)
+        self.rerank_backend = FakeRerankBackend(latency=rerank_latency)
+        self.llm = FakeChatModel(latency=llm_latency)
+        self.timer = StageTimer()
+        self.expander.generate_response = self.timer.wrap("expansion", self.expander.generate_response)
+        self.llm.invoke = self.timer.wrap("llm", self.llm.invoke)
+        self.search_calls = 0
+        self._content_ids = {document.content: document.id for document in self.golden.documents}
+        self._client = self._build_client()
+
+    def _build_client(self) -> QdrantClient:
+        client = QdrantClient(":memory:")
+        by_collection: Dict[str, List[GoldenDocument]] = defaultdict(list)
+        for document in self.golden.documents:
+            by_collection[document.collection].append(document)
+        for collection, documents in by_collection.items():
+            client.create_collection(
+                collection_name=collection,
+                vectors_config=models.VectorParams(size=self.embedder.dim, distance=models.Distance.COSINE),
+            )
+            vectors = self.embedder([document.content for document in documents])
+            client.upsert(
+                collection_name=collection,
+                points=[
+                    models.PointStruct(
+                        id=document.id,
+                        vector=vector,
+                        payload={"content": document.content, "doc_id": document.id},
+                    )
+                    for document, vector in zip(documents, vectors)
+                ],
+            )
+        self.embedder.calls = self.embedder.texts = 0
+        return client
+
+    @contextmanager
+    def _patched(self):
+        """把检索链路的外部依赖替换为内存 Qdrant 和本地替身，并在各阶段插入计时"""
+        captured: Dict[str, list] = {}
+        reranker = Reranker(
+            remote=self.rerank_backend,
+            backend="remote",
+            cache=TTLCache(maxsize=10000, ttl=3600, name="benchmark_rerank"),
+        )
+        original_search = QdrantDatabaseConnector.search_batch
+        original_retrieve = (
+            VectorRetriever.retrieve_top_k_pipelined if self.pipelined else VectorRetriever.retrieve_top_k
+        )
+        original_rerank = VectorRetriever.rerank
+
+        def search_batch(connector, *args, **kwargs):
+            self.search_calls += 1
+            with self.timer.stage("search"):
+                return original_search(connector, *args, **kwargs)
+
+        def retrieve(retriever, *args, **kwargs):
+            with self.timer.stage("retrieval"):
+                hits = original_retrieve(retriever, *args, **kwargs)
+            captured["retrieved"] = [hit.payload["doc_id"] for hit in hits]
+            return hits
+
+        def rerank(retriever, *args, **kwargs):
+            with self.timer.stage("rerank"):
+                passages = original_rerank(retriever, *args, **kwargs)
+            captured["reranked"] = [self._content_ids.get(passage) for passage in passages]
+            return passages
+
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(QdrantDatabaseConnector, "_instance", self._client))
+            stack.enter_context(mock.patch.object(QdrantDatabaseConnector, "search_batch", search_batch))
+            stack.enter_context(
+                mock.patch.object(VectorRetriever, "retrieve_top_k_pipelined" if self.pipelined else "retrieve_top_k", retrieve)
+            )
+            stack.enter_context(mock.patch.object(VectorRetriever, "rerank", rerank))
+            stack.enter_context(
+                mock.patch.object(retriever_module, "embed_texts", self.timer.wrap("embedding", self.embedder))
+            )
+            stack.enter_context(mock.patch.object(retriever_module, "QueryExpansion", lambda: self.expander))
+            stack.enter_context(mock.patch.object(retriever_module, "get_reranker", lambda: reranker))
+            stack.enter_context(mock.patch.object(inference_pipeline, "get_chat_model", lambda *args, **kwargs: self.llm))
+            stack.enter_context(mock.patch.object(context_packer, "get_token_counter", EstimateTokenCounter))
+            stack.enter_context(mock.patch.object(settings, "SEMANTIC_CACHE_ENABLED", False))
+            stack.enter_context(mock.patch.object(settings, "RAG_PIPELINED_RETRIEVAL", self.pipelined))
+            yield captured
+
+    def run(self, iterations: int = 1) -> dict:
+        """对黄金查询集跑 iterations 轮，返回报告"""
+        quality = defaultdict(list)
+        skipped = Counter()
+        with self._patched() as captured:
+            llm = WEYON_LLM()
+            for _ in range(iterations):
+                for item in self.golden.queries:
+                    captured.clear()
+                    deadline = Deadline(budget=self.deadline)
+                    with self.timer.stage("total"):
+                        llm.generate(query=item.query, collections=item.collections, enable_rag=True, deadline=deadline)
+                    skipped.update(deadline.skipped)
+
+                    retrieved = captured.get("retrieved", [])
+                    reranked = captured.get("reranked", [])
+                    quality["retrieval_recall"].append(recall_at_k(retrieved, item.relevant, settings.RERANK_CANDIDATES))
+                    quality["retrieval_mrr"].append(reciprocal_rank(retrieved, item.relevant))
+                    quality["rerank_recall"].append(recall_at_k(reranked, item.relevant, settings.KEEP_TOP_K))
+                    quality["rerank_mrr"].append(reciprocal_rank(reranked, item.relevant))
+
+        def mean(values: List[float]) -> float:
+            return round(float(np.mean(values)), 4) if values else 0.0
+
+        return {
+            "queries": len(self.golden.queries),
+            "iterations": iterations,
+            "pipelined": self.pipelined,
+            "latency_ms": {stage: percentiles(self.timer.records.get(stage, [])) for stage in STAGES},
+            "quality": {
+                "retrieval": {
+                    f"recall@{settings.RERANK_CANDIDATES}": mean(quality["retrieval_recall"]),
+                    "mrr": mean(quality["retrieval_mrr"]),
+                },
+                "rerank": {
+                    f"recall@{settings.KEEP_TOP_K}": mean(quality["rerank_recall"]),
+                    "mrr": mean(quality["rerank_mrr"]),
+                },
+            },
+            "calls": {
+                "embedding": self.embedder.calls,
+                "embedded_texts": self.embedder.texts,
+                "expansion": self.expander.calls,
+                "search_batch": self.search_calls,
+                "rerank": self.rerank_backend.calls,
+                "reranked_passages": self.rerank_backend.passages,
+                "llm": self.llm.calls,
+            },
+            "skipped_stages": dict(skipped),
+        }
+
+
+def compare_reports(
+        baseline: dict,
+        current: dict,
+        max_latency_regression: float = 0.2,
+        max_quality_drop: float = 0.02,
+        min_latency_ms: float = 2.0,
+) -> List[str]:
+    """
+    与基线报告对比，返回退化项说明，为空表示没有退化
+
+    Args:
+        max_latency_regression: p50/p90 允许增加的比例
+        max_quality_drop: recall/MRR 允许下降的绝对值
+        min_latency_ms: 基线低于该值的阶段只受计时噪声影响，不参与比较
+    """
+    regressions = []
+    for stage, stats in current["latency_ms"].items():
+        base = baseline.get("latency_ms", {}).get(stage)
+        if not base:
+            continue
+        for key in ("p50", "p90"):
+            if base[key] >= min_latency_ms and stats[key] > base[key] * (1 + max_latency_regression):
+                regressions.append(f"{stage} {key}: {base[key]}ms -> {stats[key]}ms")
+
+    for part, metrics in current["quality"].items():
+        for name, value in metrics.items():
+            base = baseline.get("quality", {}).get(part, {}).get(name)
+            if base is not None and value < base - max_quality_drop:
+                regressions.append(f"{part} {name}: {base} -> {value}")
+
+    for name, value in current["calls"].items():
+        base = baseline.get("calls", {}).get(name)
+        if base is not None and value > base:
+            regressions.append(f"{name} calls: {base} -> {value}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线 RAG 延迟与质量基准测试")
+    parser.add_argument("--golden", type=Path, default=DEFAULT_GOLDEN_SET, help="黄金查询集 JSON")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--mode", choices=["pipelined", "standard"], default=None, help="检索模式，默认按配置")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="模拟的嵌入延迟（秒）")
+    parser.add_argument("--expansion-latency", type=float, default=0.0, help="模拟的查询扩展延迟（秒）")
+    parser.add_argument("--rerank-latency", type=float, default=0.0, help="模拟的重排延迟（秒）")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="模拟的 LLM 延迟（秒）")
+    parser.add_argument("--output", type=Path, default=None, help="报告输出路径")
+    parser.add_argument("--baseline", type=Path, default=None, help="基线报告，退化超过阈值时返回非零退出码")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的延迟增加比例")
+    args = parser.parse_args()
+
+    benchmark = RAGBenchmark(
+        golden=GoldenSet.load(args.golden),
+        pipelined=None if args.mode is None else args.mode == "pipelined",
+        embed_latency=args.embed_latency,
+        expansion_latency=args.expansion_latency,
+        rerank_latency=args.rerank_latency,
+        llm_latency=args.llm_latency,
+    )
+    report = benchmark.run(iterations=args.iterations)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare_reports(baseline, report, max_latency_regression=args.max_regression)
+        for regression in regressions:
+            logger.error(f"性能退化: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/24 16:20
+# @Author  : Galleons
+# @File    : fakes.py
+
+"""
+离线基准测试使用的本地替身
+
+不访问网络、结果确定，可选地模拟固定延迟，用于衡量检索链路本身的开销和检索质量：
+- hash_embedding / FakeEmbedder：字符 1-gram + 2-gram 哈希到固定维度后归一化，字面相近的文本向量相近
+- FakeQueryExpander：把查询按字符轮转生成若干变体
+- FakeRerankBackend：按哈希向量的余弦相似度打分，统计调用次数
+- FakeChatModel：返回固定长度的答案，支持 invoke 和 astream
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from app.config import settings
+from app.utils.embedding_cache import normalize_text
+
+
+def hash_embedding(text: str, dim: int = settings.EMBEDDING_SIZE) -> np.ndarray:
+    text = normalize_text(text).lower()
+    vector = np.zeros(dim, dtype=np.float32)
+    grams = list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+    for gram in grams:
+        if gram.isspace():
+            continue
+        index = int.from_bytes(hashlib.md5(gram.encode("utf-8")).digest()[:4], "little") % dim
+        vector[index] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class _Counter:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self, n: int = 1) -> None:
+        with self._lock:
+            self.calls += n
+
+
+class FakeEmbedder(_Counter):
+    def __init__(self, dim: int = settings.EMBEDDING_SIZE, latency: float = 0.0):
+        """
+        Args:
+            dim: 向量维度
+            latency: 每次调用模拟的延迟（秒）
+        """
+        super().__init__()
+        self.dim = dim
+        self.latency = latency
+        self.texts = 0
+
+    def __call__(self, texts: List[str], model: Optional[str] = None, timeout: Optional[float] = None) -> List[List[float]]:
+        self._count()
+        self.texts += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return [hash_embedding(text, self.dim).tolist() for text in texts]
+
+
+class FakeQueryExpander(_Counter):
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+
+    def generate_response(self, query: str, to_expand_to_n: int = 3) -> List[str]:
+        self._count()
+        if self.latency:
+            time.sleep(self.latency)
+        step = max(1, len(query) // max(1, to_expand_to_n))
+        variants = [query[i * step:] + query[:i * step] for i in range(to_expand_to_n)]
+        return list(dict.fromkeys(variants))
+
+
+class FakeRerankBackend(_Counter):
+    model_id = "fake-reranker"
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.passages = 0
+
+    def score_sync(self, query: str, passages: List[str], timeout: Optional[float] = None) -> List[float]:
+        self._count()
+        self.passages += len(passages)
+        if self.latency:
+            time.sleep(self.latency)
+        query_vector = hash_embedding(query)
+        return [float(np.dot(query_vector, hash_embedding(passage))) for passage in passages]
+
+    async def score(self, query: str, passages: List[str], timeout: Optional[float] = None) -> List[float]:
+        return await asyncio.to_thread(self.score_sync, query, passages, timeout)
+
+
+class FakeChatModel(_Counter):
+    def __init__(self, latency: float = 0.0, answer: str = "根据提供的上下文，"):
+        """
+        Args:
+            latency: 每次生成模拟的延迟（秒）
+            answer: 答案前缀，后接 prompt 的字符数，便于核对上下文是否变化
+        """
+        super().__init__()
+        self.latency = latency
+        self.answer = answer
+        self.prompt_chars = 0
+
+    def _respond(self, prompt) -> str:
+        self._count()
+        prompt = str(prompt)
+        self.prompt_chars += len(prompt)
+        return f"{self.answer}{len(prompt)}"
+
+    def invoke(self, prompt, timeout: Optional[float] = None, **kwargs) -> AIMessage:
+        if self.latency:
+            time.sleep(self.latency)
+        return AIMessage(content=self._respond(prompt))
+
+    async def astream(self, prompt, timeout: Optional[float] = None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for char in self._respond(prompt):
+            yield AIMessageChunk(content=char)
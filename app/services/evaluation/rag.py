@@ -1,8 +1,8 @@
-from langchain_openai import ChatOpenAI
 
 import app.services.llm.prompt_templates as templates
-from app.services.llm import GeneralChain
+from app.services.llm.chain import GeneralChain
 from app.config import settings
+from app.services.llm.clients import get_chat_model
 
 
 def evaluate(query: str, context: list[str], output: str) -> str:
@@ -10,7 +10,7 @@ def evaluate(query: str, context: list[str], output: str) -> str:
     prompt_template = evaluation_template.create_template()
 
 
-    model = ChatOpenAI(model=settings.Silicon_model_v1,openai_api_key=settings.Silicon_api_key1,openai_api_base=settings.Silicon_base_url,temperature=0)
+    model = get_chat_model(settings.Silicon_model_v1, temperature=0)
     chain = GeneralChain.get_chain(
         llm=model, output_key="rag_eval", template=prompt_template
     )
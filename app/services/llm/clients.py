@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/23 11:00
+# @Author  : Galleons
+# @File    : clients.py
+
+"""
+进程内共享的 LLM 客户端
+
+按模型名登记 OpenAI 兼容接口的地址、密钥和并发上限（LLM_ENDPOINTS，未登记的模型走 SiliconFlow）。
+同一模型的 ChatOpenAI / OpenAI / AsyncOpenAI 客户端共用一组 keep-alive 连接池和一个并发限制器：
+- 连接复用，避免每个请求重新建立 TLS 连接
+- 超过并发上限的请求在进程内排队，突发流量不会压垮本地 vLLM 服务
+- 限制在 HTTP 传输层生效，流式响应在读取完毕（或关闭）后才归还额度
+"""
+
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+import httpx
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from app.config import settings
+from app.utils.concurrency import ConcurrencyLimiter
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self):
+        async for part in self._stream:
+            yield part
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class LimitedTransport(httpx.BaseTransport):
+    """占用并发额度后再发送请求，响应体关闭时归还"""
+
+    def __init__(self, limiter: ConcurrencyLimiter, transport: httpx.BaseTransport):
+        self.limiter = limiter
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.limiter.acquire()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self.limiter.release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self.limiter.release),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, limiter: ConcurrencyLimiter, transport: httpx.AsyncBaseTransport):
+        self.limiter = limiter
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.limiter.aacquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.limiter.release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_AsyncReleasingStream(response.stream, self.limiter.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class LLMClientRegistry:
+    def __init__(
+            self,
+            endpoints: Dict[str, dict],
+            default_base_url: str,
+            default_api_key: Optional[str],
+            default_max_concurrency: int = 32,
+            max_connections: int = 50,
+            keepalive_expiry: float = 30.0,
+    ):
+        """
+        Args:
+            endpoints: {模型名: {"base_url", "api_key", "max_concurrency"}}
+            default_base_url: 未登记模型使用的接口地址
+            default_api_key: 未登记模型使用的密钥
+            default_max_concurrency: 未单独配置时每个模型的并发上限
+            max_connections: 每个模型连接池的最大连接数
+            keepalive_expiry: 空闲连接保留时间（秒）
+        """
+        self.endpoints = endpoints
+        self.default_base_url = default_base_url
+        self.default_api_key = default_api_key
+        self.default_max_concurrency = default_max_concurrency
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        # 工厂函数中会再取连接池，需可重入
+        self._lock = threading.RLock()
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+        self._http_clients: Dict[str, httpx.Client] = {}
+        self._async_http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._clients: Dict[tuple, object] = {}
+
+    def endpoint(self, model: str) -> dict:
+        config = self.endpoints.get(model, {})
+        return {
+            "base_url": config.get("base_url", self.default_base_url),
+            "api_key": config.get("api_key", self.default_api_key),
+            "max_concurrency": config.get("max_concurrency", self.default_max_concurrency),
+        }
+
+    def _get_or_create(self, cache: dict, key, factory: Callable):
+        with self._lock:
+            if key not in cache:
+                cache[key] = factory()
+            return cache[key]
+
+    def limiter(self, model: str) -> ConcurrencyLimiter:
+        return self._get_or_create(
+            self._limiters, model,
+            lambda: ConcurrencyLimiter(self.endpoint(model)["max_concurrency"], name=model),
+        )
+
+    def http_client(self, model: str) -> httpx.Client:
+        limiter = self.limiter(model)
+        return self._get_or_create(
+            self._http_clients, model,
+            lambda: httpx.Client(transport=LimitedTransport(limiter, httpx.HTTPTransport(limits=self._limits))),
+        )
+
+    def async_http_client(self, model: str) -> httpx.AsyncClient:
+        limiter = self.limiter(model)
+        return self._get_or_create(
+            self._async_http_clients, model,
+            lambda: httpx.AsyncClient(
+                transport=AsyncLimitedTransport(limiter, httpx.AsyncHTTPTransport(limits=self._limits))
+            ),
+        )
+
+    def chat_model(self, model: str, api_key: Optional[str] = None, **kwargs) -> ChatOpenAI:
+        """
+        LangChain 聊天模型，相同 (模型, 密钥, 参数) 返回同一个实例
+
+        Args:
+            kwargs: 其余 ChatOpenAI 参数，如 temperature
+        """
+        endpoint = self.endpoint(model)
+        api_key = api_key or endpoint["api_key"]
+        key = ("chat", model, api_key, tuple(sorted(kwargs.items())))
+        return self._get_or_create(
+            self._clients, key,
+            lambda: ChatOpenAI(
+                model=model,
+                openai_api_key=api_key,
+                openai_api_base=endpoint["base_url"],
+                http_client=self.http_client(model),
+                http_async_client=self.async_http_client(model),
+                **kwargs,
+            ),
+        )
+
+    def openai_client(self, model: str, api_key: Optional[str] = None) -> OpenAI:
+        endpoint = self.endpoint(model)
+        api_key = api_key or endpoint["api_key"]
+        return self._get_or_create(
+            self._clients, ("openai", model, api_key),
+            lambda: OpenAI(api_key=api_key, base_url=endpoint["base_url"], http_client=self.http_client(model)),
+        )
+
+    def async_openai_client(self, model: str, api_key: Optional[str] = None) -> AsyncOpenAI:
+        endpoint = self.endpoint(model)
+        api_key = api_key or endpoint["api_key"]
+        return self._get_or_create(
+            self._clients, ("async_openai", model, api_key),
+            lambda: AsyncOpenAI(
+                api_key=api_key, base_url=endpoint["base_url"], http_client=self.async_http_client(model)
+            ),
+        )
+
+
+@lru_cache()
+def get_llm_registry() -> LLMClientRegistry:
+    return LLMClientRegistry(
+        endpoints=settings.LLM_ENDPOINTS,
+        default_base_url=settings.Silicon_base_url,
+        default_api_key=settings.Silicon_api_key1,
+        default_max_concurrency=settings.LLM_DEFAULT_MAX_CONCURRENCY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_chat_model(model: str, api_key: Optional[str] = None, **kwargs) -> ChatOpenAI:
+    """get_llm_registry().chat_model 的简写"""
+    return get_llm_registry().chat_model(model, api_key=api_key, **kwargs)
@@ -2,29 +2,72 @@
 RAG业务模块
 """
 
-# from qwak_inference import RealTimeClient
-from langchain_openai import ChatOpenAI
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator
 
+# from qwak_inference import RealTimeClient
+from app.services.llm.clients import get_chat_model, get_llm_registry
 from app.services.llm.prompt_templates import InferenceTemplate
 from app.services.monitoring import PromptMonitoringManager
-from app.services.rag import VectorRetriever
+from app.services.rag.retriever import VectorRetriever
+from app.services.rag.context_packer import pack_context
+from app.services.rag.deadline import Deadline
+from app.services.rag.semantic_cache import get_semantic_cache
 from app.config import settings
 
 from app.utils.logging import get_logger
 logger = get_logger(__name__)
 
 
+def _cache_lookup(query: str, collections: list[str], namespace: str):
+    """语义缓存只是加速手段，查询失败时按未命中处理"""
+    try:
+        return get_semantic_cache().get(query, collections, namespace)
+    except Exception:
+        logger.exception("语义缓存查询失败。")
+        return None
+
+
+def _cache_store(query: str, collections: list[str], value: str, namespace: str) -> None:
+    try:
+        get_semantic_cache().set(query, collections, value, namespace)
+    except Exception:
+        logger.exception("语义缓存写入失败。")
+
+
+def _pack(passages: list[str]) -> list[str]:
+    """按 token 预算截取重排后的文本块"""
+    packed = pack_context(passages)
+    logger.info(
+        "上下文拼装完成。",
+        tokens=packed.tokens,
+        passages=len(packed.passages),
+        dropped=packed.dropped,
+        truncated=packed.truncated,
+    )
+    return packed.passages
+
+
+def _chat_chunk(completion_id: str, created: int, delta: dict, finish_reason: str | None = None) -> dict:
+    """OpenAI chat.completion.chunk 格式的流式响应块"""
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": settings.Silicon_model_v1,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
 class WEYON_LLM:
     def __init__(self) -> None:
         # self.qwak_client = RealTimeClient(
         #     model_id=settings.QWAK_DEPLOYMENT_MODEL_ID,
         #     model_api=settings.QWAK_DEPLOYMENT_MODEL_API,
         # )
-        self._client = ChatOpenAI(
-            model=settings.Silicon_model_v1,
-            openai_api_key=settings.Silicon_api_key1,
-            openai_api_base=settings.Silicon_base_url,
-        )
+        self._client = get_chat_model(settings.Silicon_model_v1)
         # self._client = OpenAI(
         #     api_key=settings.Silicon_api_key1,
         #     base_url=settings.Silicon_base_url,
@@ -32,6 +75,24 @@ class WEYON_LLM:
         self.template = InferenceTemplate()
         self.prompt_monitoring_manager = PromptMonitoringManager()
 
+    def _build_prompt(self, query: str, collections: list[str], enable_rag: bool, deadline: Deadline) -> str:
+        prompt_template = self.template.create_template(enable_rag=enable_rag)
+
+        if enable_rag is True:
+            retriever = VectorRetriever(query=query)
+            retrieve = (
+                retriever.retrieve_top_k_pipelined if settings.RAG_PIPELINED_RETRIEVAL else retriever.retrieve_top_k
+            )
+            hits = retrieve(
+                k=settings.TOP_K,
+                to_expand_to_n_queries=settings.EXPAND_N_QUERY,
+                collections=collections,
+                deadline=deadline,
+            )
+            context = _pack(retriever.rerank(hits=hits, keep_top_k=settings.KEEP_TOP_K, deadline=deadline))
+            return prompt_template.format(question=query, context=context)
+        return prompt_template.format(question=query)
+
     def generate(
         self,
         query: str,
@@ -39,23 +100,18 @@ class WEYON_LLM:
         enable_rag: bool = False,
         enable_evaluation: bool = False,
         enable_monitoring: bool = False,
+        deadline: Deadline | None = None,
     ) -> str | list[str | dict]:
-        prompt_template = self.template.create_template(enable_rag=enable_rag)
-        prompt_template_variables = {
-            "question": query,
-        }
+        """
+        Args:
+            deadline: 请求的时间预算，各阶段超出份额时降级，跳过的阶段记录在 deadline.skipped 中
+        """
+        deadline = deadline or Deadline()
+        use_cache = enable_rag and settings.SEMANTIC_CACHE_ENABLED
+        if use_cache and (cached := _cache_lookup(query, collections, "weyon_answer")) is not None:
+            return cached
 
-        if enable_rag is True:
-            retriever = VectorRetriever(query=query)
-            hits = retriever.retrieve_top_k(
-                k=settings.TOP_K, to_expand_to_n_queries=settings.EXPAND_N_QUERY, collections=collections
-            )
-            context = retriever.rerank(hits=hits, keep_top_k=settings.KEEP_TOP_K)  # list
-            prompt_template_variables["context"] = context
-
-            prompt = prompt_template.format(question=query, context=context)
-        else:
-            prompt = prompt_template.format(question=query)
+        prompt = self._build_prompt(query, collections, enable_rag, deadline)
 
         # input_ = pd.DataFrame([{"instruction": prompt}]).to_json()
 
@@ -71,48 +127,89 @@ class WEYON_LLM:
         # )
         # answer = response
         # answer = response.choices[0].message.content
-        answer = self._client.invoke(prompt).content
+        # 时间预算已耗尽时仍保留 1 秒下限，避免请求必然失败
+        answer = self._client.invoke(prompt, timeout=max(deadline.remaining(), 1.0)).content
 
         # if enable_evaluation is True:
         #     evaluation_result = evaluate_llm(query=query, output=answer)
         # else:
         #     evaluation_result = None
-        #
-        # if enable_monitoring is True:
-        #     if evaluation_result is not None:
-        #         metadata = {"llm_evaluation_result": evaluation_result}
-        #     else:
-        #         metadata = None
-        #
-        #     self.prompt_monitoring_manager.log(
-        #         prompt=prompt,
-        #         prompt_template=prompt_template.template,
-        #         prompt_template_variables=prompt_template_variables,
-        #         output=answer,
-        #         metadata=metadata,
-        #     )
-        #     self.prompt_monitoring_manager.log_chain(
-        #         query=query, response=answer, eval_output=evaluation_result
-        #     )
+        evaluation_result = None
+
+        # 监控事件只进入批量导出队列，不阻塞请求
+        if enable_monitoring is True:
+            if evaluation_result is not None:
+                metadata = {"llm_evaluation_result": evaluation_result}
+            else:
+                metadata = None
+
+            self.prompt_monitoring_manager.log(
+                prompt=prompt,
+                output=answer,
+                metadata=metadata,
+            )
+            self.prompt_monitoring_manager.log_chain(
+                query=query, response=answer, eval_output=evaluation_result
+            )
+
+        # 降级得到的结果不写入缓存
+        if use_cache and not deadline.skipped:
+            _cache_store(query, collections, answer, "weyon_answer")
 
         return answer
 
+    async def astream(
+        self,
+        query: str,
+        collections: list[str],
+        enable_rag: bool = False,
+        enable_monitoring: bool = False,
+        deadline: Deadline | None = None,
+    ) -> AsyncIterator[dict]:
+        """
+        流式生成，逐个产出 OpenAI chat.completion.chunk 格式的增量
+
+        检索在线程中执行，模型增量到达即产出；语义缓存命中时整段答案作为一个块返回。
+        """
+        deadline = deadline or Deadline()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        use_cache = enable_rag and settings.SEMANTIC_CACHE_ENABLED
+
+        if use_cache and (
+                cached := await asyncio.to_thread(_cache_lookup, query, collections, "weyon_answer")
+        ) is not None:
+            yield _chat_chunk(completion_id, created, {"role": "assistant", "content": cached})
+            yield _chat_chunk(completion_id, created, {}, finish_reason="stop")
+            return
+
+        prompt = await asyncio.to_thread(self._build_prompt, query, collections, enable_rag, deadline)
+
+        parts = []
+        delta = {"role": "assistant"}
+        async for chunk in self._client.astream(prompt, timeout=max(deadline.remaining(), 1.0)):
+            if not chunk.content:
+                continue
+            parts.append(chunk.content)
+            yield _chat_chunk(completion_id, created, {**delta, "content": chunk.content})
+            delta = {}
+        yield _chat_chunk(completion_id, created, {}, finish_reason="stop")
+
+        answer = "".join(parts)
+        if enable_monitoring is True:
+            self.prompt_monitoring_manager.log(prompt=prompt, output=answer)
+            self.prompt_monitoring_manager.log_chain(query=query, response=answer, eval_output=None)
+
+        if use_cache and not deadline.skipped:
+            await asyncio.to_thread(_cache_store, query, collections, answer, "weyon_answer")
 
 
-from openai import OpenAI
 
 
 class InferenceOpenAI:
     def __init__(self) -> None:
-        self._langchain_client = ChatOpenAI(
-            model=settings.Silicon_model_v1,
-            openai_api_key=settings.Silicon_api_key1,
-            openai_api_base=settings.Silicon_base_url,
-        )
-        self._openai_client = OpenAI(
-            api_key=settings.Silicon_api_key1,
-            base_url=settings.Silicon_base_url,
-        )
+        self._langchain_client = get_chat_model(settings.Silicon_model_v1)
+        self._openai_client = get_llm_registry().openai_client(settings.Silicon_model_v1)
         self.template = InferenceTemplate()
 
     def generate(
@@ -120,7 +217,14 @@ class InferenceOpenAI:
         query: str,
         collections: list[str],
         enable_rag: bool = True,
+        deadline: Deadline | None = None,
     ) -> str:
+        deadline = deadline or Deadline()
+        # 这里的结果是拼接好检索上下文的 prompt，命中时省去查询扩展、检索和重排
+        use_cache = enable_rag and settings.SEMANTIC_CACHE_ENABLED
+        if use_cache and (cached := _cache_lookup(query, collections, "openai_prompt")) is not None:
+            return cached
+
         prompt_template = self.template.create_template(enable_rag=enable_rag)
         prompt_template_variables = {
             "question": query,
@@ -128,10 +232,16 @@ class InferenceOpenAI:
 
         if enable_rag is True:
             retriever = VectorRetriever(query=query)
-            hits = retriever.retrieve_top_k(
-                k=settings.TOP_K, to_expand_to_n_queries=settings.EXPAND_N_QUERY, collections=collections
+            retrieve = (
+                retriever.retrieve_top_k_pipelined if settings.RAG_PIPELINED_RETRIEVAL else retriever.retrieve_top_k
+            )
+            hits = retrieve(
+                k=settings.TOP_K,
+                to_expand_to_n_queries=settings.EXPAND_N_QUERY,
+                collections=collections,
+                deadline=deadline,
             )
-            context = retriever.rerank(hits=hits, keep_top_k=settings.KEEP_TOP_K)  # list
+            context = _pack(retriever.rerank(hits=hits, keep_top_k=settings.KEEP_TOP_K, deadline=deadline))
             prompt_template_variables["context"] = context
 
             prompt = prompt_template.format(question=query, context=context)
@@ -149,5 +259,7 @@ class InferenceOpenAI:
         #     stream=True
         # )
 
+        if use_cache and not deadline.skipped:
+            _cache_store(query, collections, prompt, "openai_prompt")
 
         return prompt
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/23 15:30
+# @Author  : Galleons
+# @File    : replica_pool.py
+
+"""
+本地 LLM 副本池
+
+把多个 vLLM 服务（qwen2-mini1、qwen2-mini2 ……）当作同一逻辑模型的副本，对外是一个 LangChain Runnable，
+可以直接放进 prompt | llm | parser 链：
+- 按 (在途请求数 + 1) × 近期平均延迟 选择负载最低的副本
+- 副本连续失败后由熔断器摘除，冷却结束后用一次真实请求探测
+- 请求失败时切换到下一个副本；流式输出只在产出第一个块之前切换
+"""
+
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.config import settings
+from app.services.llm.clients import get_chat_model
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.monitoring import LLM_REPLICA_FAILURES, LLM_REPLICA_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+
+class NoHealthyReplicaError(Exception):
+    """所有副本均不可用"""
+    pass
+
+
+class LLMReplica:
+    def __init__(self, name: str, runnable: Runnable, breaker: CircuitBreaker):
+        self.name = name
+        self.runnable = runnable
+        self.breaker = breaker
+        self.in_flight = 0
+        self.latency: Optional[float] = None  # 近期延迟的指数滑动平均（秒），尚无样本时为 None
+
+
+class ReplicaPool(Runnable):
+    def __init__(self, replicas: List[LLMReplica], latency_alpha: float = 0.3, default_latency: float = 1.0):
+        """
+        Args:
+            replicas: 同一逻辑模型的副本
+            latency_alpha: 延迟滑动平均的权重，越大越偏向最近的请求
+            default_latency: 还没有延迟样本的副本按此延迟估算
+        """
+        if not replicas:
+            raise ValueError("至少需要配置一个 LLM 副本")
+        self.replicas = replicas
+        self.latency_alpha = latency_alpha
+        self.default_latency = default_latency
+        self._lock = threading.Lock()
+
+    @property
+    def temperature(self) -> float:
+        """副本中最高的采样温度，供响应缓存判断输出是否确定"""
+        return max(getattr(replica.runnable, "temperature", 0) or 0 for replica in self.replicas)
+
+    def _load(self, replica: LLMReplica) -> float:
+        latency = self.default_latency if replica.latency is None else replica.latency
+        return (replica.in_flight + 1) * latency
+
+    def _acquire(self, tried: set) -> Optional[LLMReplica]:
+        """选出负载最低且熔断器放行的副本，并计入在途数"""
+        with self._lock:
+            candidates = sorted(
+                (replica for replica in self.replicas if replica.name not in tried),
+                key=self._load,
+            )
+            for replica in candidates:
+                if replica.breaker.allow_request():
+                    replica.in_flight += 1
+                    LLM_REPLICA_IN_FLIGHT.labels(replica=replica.name).set(replica.in_flight)
+                    return replica
+        return None
+
+    def _release(self, replica: LLMReplica) -> None:
+        with self._lock:
+            replica.in_flight -= 1
+            LLM_REPLICA_IN_FLIGHT.labels(replica=replica.name).set(replica.in_flight)
+
+    def _on_success(self, replica: LLMReplica, elapsed: float) -> None:
+        replica.breaker.record_success()
+        with self._lock:
+            if replica.latency is None:
+                replica.latency = elapsed
+            else:
+                replica.latency = self.latency_alpha * elapsed + (1 - self.latency_alpha) * replica.latency
+
+    def _on_failure(self, replica: LLMReplica, error: Exception) -> None:
+        replica.breaker.record_failure()
+        LLM_REPLICA_FAILURES.labels(replica=replica.name).inc()
+        logger.warning(f"LLM 副本 {replica.name} 请求失败, 切换副本: {str(error)}")
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        tried: set = set()
+        last_error: Optional[Exception] = None
+        while (replica := self._acquire(tried)) is not None:
+            tried.add(replica.name)
+            started = time.perf_counter()
+            try:
+                result = replica.runnable.invoke(input, config, **kwargs)
+            except Exception as e:
+                self._on_failure(replica, e)
+                last_error = e
+                continue
+            except BaseException:
+                # 请求被取消，结果未知，不计为失败，但要归还半开状态的探测名额
+                replica.breaker.release_probe()
+                raise
+            finally:
+                self._release(replica)
+            self._on_success(replica, time.perf_counter() - started)
+            return result
+        raise NoHealthyReplicaError(f"没有可用的 LLM 副本: {str(last_error)}") from last_error
+
+    async def ainvoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        tried: set = set()
+        last_error: Optional[Exception] = None
+        while (replica := self._acquire(tried)) is not None:
+            tried.add(replica.name)
+            started = time.perf_counter()
+            try:
+                result = await replica.runnable.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                self._on_failure(replica, e)
+                last_error = e
+                continue
+            except BaseException:
+                # 请求被取消，结果未知，不计为失败，但要归还半开状态的探测名额
+                replica.breaker.release_probe()
+                raise
+            finally:
+                self._release(replica)
+            self._on_success(replica, time.perf_counter() - started)
+            return result
+        raise NoHealthyReplicaError(f"没有可用的 LLM 副本: {str(last_error)}") from last_error
+
+    def stream(self, input, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator:
+        tried: set = set()
+        last_error: Optional[Exception] = None
+        while (replica := self._acquire(tried)) is not None:
+            tried.add(replica.name)
+            started = time.perf_counter()
+            emitted = False
+            try:
+                for chunk in replica.runnable.stream(input, config, **kwargs):
+                    emitted = True
+                    yield chunk
+            except GeneratorExit:
+                # 调用方提前停止读取，副本本身是正常的
+                self._on_success(replica, time.perf_counter() - started)
+                raise
+            except Exception as e:
+                self._on_failure(replica, e)
+                if emitted:
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                replica.breaker.release_probe()
+                raise
+            finally:
+                self._release(replica)
+            self._on_success(replica, time.perf_counter() - started)
+            return
+        raise NoHealthyReplicaError(f"没有可用的 LLM 副本: {str(last_error)}") from last_error
+
+    async def astream(self, input, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator:
+        tried: set = set()
+        last_error: Optional[Exception] = None
+        while (replica := self._acquire(tried)) is not None:
+            tried.add(replica.name)
+            started = time.perf_counter()
+            emitted = False
+            try:
+                async for chunk in replica.runnable.astream(input, config, **kwargs):
+                    emitted = True
+                    yield chunk
+            except GeneratorExit:
+                # 调用方提前停止读取，副本本身是正常的
+                self._on_success(replica, time.perf_counter() - started)
+                raise
+            except Exception as e:
+                self._on_failure(replica, e)
+                if emitted:
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                replica.breaker.release_probe()
+                raise
+            finally:
+                self._release(replica)
+            self._on_success(replica, time.perf_counter() - started)
+            return
+        raise NoHealthyReplicaError(f"没有可用的 LLM 副本: {str(last_error)}") from last_error
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "replica": replica.name,
+                "state": replica.breaker.state,
+                "in_flight": replica.in_flight,
+                "latency": replica.latency,
+            }
+            for replica in self.replicas
+        ]
+
+
+@lru_cache()
+def get_llm_pool(logical_model: str, **kwargs) -> ReplicaPool:
+    """
+    按 LLM_REPLICA_POOLS 构建逻辑模型的副本池，相同参数返回同一个实例
+
+    Args:
+        logical_model: 逻辑模型名，如 qwen2-mini
+        kwargs: 传给每个副本 ChatOpenAI 的参数，如 temperature
+    """
+    return ReplicaPool([
+        LLMReplica(
+            name=model,
+            runnable=get_chat_model(model, **kwargs),
+            breaker=CircuitBreaker(
+                failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.LLM_BREAKER_RECOVERY_TIMEOUT,
+            ),
+        )
+        for model in settings.LLM_REPLICA_POOLS[logical_model]
+    ])
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/24 10:10
+# @Author  : Galleons
+# @File    : response_cache.py
+
+"""
+temperature=0 链的 LLM 响应缓存
+
+同一模板、同一组变量、同一模型在 temperature=0 下输出确定，重复提交的岗位介绍、学生意愿无需再次调用 LLM。
+缓存包住 prompt | llm | 输出解析器，只缓存解析器接受的结果：格式错误的模型输出直接抛出、不写入缓存，
+重试时重新调用模型，不会在整个 TTL 内重放同一个错误答案；后续的检索、抽样仍然每次执行。
+- 缓存键：(模板ID, 渲染变量, 模型, 解析器)，模板ID包含模板内容的哈希，修改提示词后旧缓存自动失效
+- 存储：diskcache（SQLite），重启后保留，可被多个 uvicorn worker 共享；条目按 TTL 过期，超出容量按 LRU 淘汰
+- 缓存读写失败按未命中处理，不影响请求
+"""
+
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from typing import Optional
+
+from diskcache import Cache
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.output_parsers import BaseOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.config import settings
+from app.utils.monitoring import LLM_RESPONSE_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+def template_id(name: str, prompt: BasePromptTemplate) -> str:
+    """模板名 + 模板内容哈希"""
+    digest = hashlib.sha1(prompt.pretty_repr().encode("utf-8")).hexdigest()
+    return f"{name}:{digest[:12]}"
+
+
+class CachedLLMRunnable(Runnable):
+    def __init__(
+            self,
+            runnable: Runnable,
+            template_id: str,
+            model: str,
+            cache: Cache,
+            ttl: Optional[float] = None,
+            parser: Optional[str] = None,
+    ):
+        """
+        Args:
+            runnable: prompt | llm（输出为模型消息）或 prompt | llm | parser（输出为解析结果），输入为模板变量
+            template_id: 模板ID，见 template_id()
+            model: 逻辑模型名，参与缓存键
+            cache: 磁盘缓存
+            ttl: 条目有效期（秒），为 None 时不过期
+            parser: runnable 末尾输出解析器的名称，设置时缓存解析结果，参与缓存键
+        """
+        self.runnable = runnable
+        self.template_id = template_id
+        self.model = model
+        self.cache = cache
+        self.ttl = ttl
+        self.parser = parser
+
+    def make_key(self, variables: dict) -> str:
+        key = {"template": self.template_id, "model": self.model, "variables": variables}
+        if self.parser is not None:
+            key["parser"] = self.parser
+        payload = json.dumps(key, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str):
+        try:
+            content = self.cache.get(key)
+        except Exception:
+            logger.exception("LLM 响应缓存读取失败。")
+            content = None
+        result = "miss" if content is None else "hit"
+        LLM_RESPONSE_CACHE_REQUESTS.labels(template=self.template_id.split(":")[0], result=result).inc()
+        if content is None or self.parser is not None:
+            return content
+        return AIMessage(content=content)
+
+    def _store(self, key: str, output) -> None:
+        if self.parser is not None:
+            # 能走到这里说明解析器已接受该输出
+            content = output
+        else:
+            content = output.content if isinstance(output, BaseMessage) else output
+            if not isinstance(content, str):
+                return
+        try:
+            self.cache.set(key, content, expire=self.ttl)
+        except Exception:
+            logger.exception("LLM 响应缓存写入失败。")
+
+    def invoke(self, input: dict, config: Optional[RunnableConfig] = None, **kwargs):
+        key = self.make_key(input)
+        if (cached := self._lookup(key)) is not None:
+            return cached
+        output = self.runnable.invoke(input, config, **kwargs)
+        self._store(key, output)
+        return output
+
+    async def ainvoke(self, input: dict, config: Optional[RunnableConfig] = None, **kwargs):
+        key = self.make_key(input)
+        if (cached := self._lookup(key)) is not None:
+            return cached
+        output = await self.runnable.ainvoke(input, config, **kwargs)
+        self._store(key, output)
+        return output
+
+
+@lru_cache()
+def get_llm_response_cache() -> Cache:
+    return Cache(
+        settings.LLM_CACHE_DIR,
+        size_limit=settings.LLM_CACHE_SIZE_LIMIT,
+        eviction_policy="least-recently-used",
+    )
+
+
+def cached_llm(
+        name: str,
+        prompt: BasePromptTemplate,
+        llm: Runnable,
+        model: str,
+        parser: Optional[BaseOutputParser] = None,
+) -> Runnable:
+    """
+    为 temperature=0 的 prompt | llm | parser 加上响应缓存（LLM_CACHE_ENABLED 关闭时原样返回）
+
+    Args:
+        name: 模板名，用作缓存键和监控指标标签
+        prompt: 提示词模板
+        llm: temperature=0 的模型或副本池
+        model: 模型名
+        parser: 输出解析器，设置时只缓存解析成功的结果
+    """
+    if getattr(llm, "temperature", 0):
+        raise ValueError("只有 temperature=0 的模型输出是确定的，才能使用响应缓存")
+    runnable = prompt | llm if parser is None else prompt | llm | parser
+    if not settings.LLM_CACHE_ENABLED:
+        return runnable
+    return CachedLLMRunnable(
+        runnable,
+        template_id=template_id(name, prompt),
+        model=model,
+        cache=get_llm_response_cache(),
+        ttl=settings.LLM_CACHE_TTL,
+        parser=None if parser is None else type(parser).__name__,
+    )
@@ -1,3 +1,4 @@
+from .batch_exporter import BatchExporter, get_batch_exporter, shutdown_batch_exporter
 from .prompt_monitoring import PromptMonitoringManager
 
-__all__ = ["PromptMonitoringManager"]
+__all__ = ["BatchExporter", "PromptMonitoringManager", "get_batch_exporter", "shutdown_batch_exporter"]
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/25 10:40
+# @Author  : Galleons
+# @File    : batch_exporter.py
+
+"""
+请求路径之外的批量监控导出
+
+请求线程只把事件放入有界队列（不阻塞），后台线程攒够 batch_size 条或等待 flush_interval 秒后批量导出。
+导出后端变慢时队列写满，新事件直接丢弃并计数，不会拖慢请求；进程退出时把队列中剩余的事件导出。
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from app.services.monitoring.exporters import MonitoringExporter
+from app.utils.monitoring import MONITORING_EVENTS
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BatchExporter:
+    def __init__(
+            self,
+            exporter: MonitoringExporter,
+            max_queue_size: int = 1000,
+            batch_size: int = 50,
+            flush_interval: float = 2.0,
+    ):
+        """
+        Args:
+            exporter: 导出后端
+            max_queue_size: 队列容量，写满后丢弃新事件
+            batch_size: 每批最多导出的事件数
+            flush_interval: 不足一批时最长等待时间（秒）
+        """
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="monitoring-exporter", daemon=True)
+        self._worker.start()
+
+    def submit(self, event: dict) -> bool:
+        """放入队列，队列已满或已关闭时丢弃并返回 False"""
+        if self._closed:
+            MONITORING_EVENTS.labels(result="dropped_closed").inc()
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            MONITORING_EVENTS.labels(result="dropped_full").inc()
+            return False
+        return True
+
+    def _next_batch(self) -> tuple[List[dict], bool]:
+        """取出一批事件，返回 (事件, 是否收到停止信号)"""
+        batch: List[dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(timeout, 0)) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _export(self, batch: List[dict]) -> None:
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception:
+            logger.exception(f"监控事件导出失败，丢弃 {len(batch)} 条")
+            MONITORING_EVENTS.labels(result="export_error").inc(len(batch))
+        else:
+            MONITORING_EVENTS.labels(result="exported").inc(len(batch))
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            self._export(batch)
+        # 停止前导出剩余事件
+        remaining: List[dict] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            self._export(remaining[start:start + self.batch_size])
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """停止接收事件，导出队列中剩余的事件后退出后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        # 队列已满时停止信号也要能放进去
+        while True:
+            try:
+                self._queue.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                if not self._worker.is_alive():
+                    break
+        self._worker.join(timeout)
+        try:
+            self.exporter.close()
+        except Exception:
+            logger.exception("关闭监控导出后端失败")
+
+
+_batch_exporter: Optional[BatchExporter] = None
+_lock = threading.Lock()
+
+
+def get_batch_exporter() -> BatchExporter:
+    """进程内共享的批量导出器，首次使用时按配置创建后端并启动后台线程"""
+    global _batch_exporter
+    with _lock:
+        if _batch_exporter is None:
+            from app.config import settings
+            from app.services.monitoring.exporters import create_exporter
+
+            _batch_exporter = BatchExporter(
+                create_exporter(settings.MONITORING_EXPORTER),
+                max_queue_size=settings.MONITORING_QUEUE_SIZE,
+                batch_size=settings.MONITORING_BATCH_SIZE,
+                flush_interval=settings.MONITORING_FLUSH_INTERVAL,
+            )
+            atexit.register(_batch_exporter.close)
+        return _batch_exporter
+
+
+def shutdown_batch_exporter(timeout: Optional[float] = 10.0) -> None:
+    """应用关闭时调用，导出剩余事件"""
+    with _lock:
+        exporter = _batch_exporter
+    if exporter is not None:
+        exporter.close(timeout)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/25 10:00
+# @Author  : Galleons
+# @File    : exporters.py
+
+"""
+提示词监控事件的导出后端
+
+事件为 dict，kind 为 prompt（单次提示词与输出）或 chain（查询-回答-评估链路）。
+后端由 MONITORING_EXPORTER 选择：
+- comet：发送到 Comet LLM，comet_llm 只在该后端下导入并初始化一次
+- jsonl：按天追加写入本地 JSONL 文件，供离线分析
+- prometheus：只记录提示词、输出长度等摘要指标，不保存原文
+"""
+
+import json
+import os
+import time
+from typing import List
+
+from app.config import settings
+from app.utils.monitoring import PROMPT_MONITORING_CHARS
+
+
+class MonitoringExporter:
+    def export(self, events: List[dict]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class CometExporter(MonitoringExporter):
+    def __init__(self):
+        import comet_llm
+
+        self._comet = comet_llm
+        self.project = f"{settings.COMET_PROJECT}-monitoring"
+        comet_llm.init(project=self.project, api_key=settings.COMET_API_KEY, workspace=settings.COMET_WORKSPACE)
+
+    def _log_prompt(self, event: dict) -> None:
+        self._comet.log_prompt(
+            workspace=settings.COMET_WORKSPACE,
+            project=self.project,
+            api_key=settings.COMET_API_KEY,
+            prompt=event["prompt"],
+            prompt_template=event.get("prompt_template"),
+            prompt_template_variables=event.get("prompt_template_variables"),
+            output=event["output"],
+            metadata=event.get("metadata"),
+        )
+
+    def _log_chain(self, event: dict) -> None:
+        self._comet.start_chain(
+            inputs={"user_query": event["query"]},
+            project=self.project,
+            api_key=settings.COMET_API_KEY,
+            workspace=settings.COMET_WORKSPACE,
+        )
+        with self._comet.Span(category="twin_response", inputs={"user_query": event["query"]}) as span:
+            span.set_outputs(outputs=event["response"])
+        with self._comet.Span(category="gpt3.5-eval", inputs={"eval_result": event["eval_output"]}) as span:
+            span.set_outputs(outputs=event["response"])
+        self._comet.end_chain(outputs={"response": event["response"], "eval_output": event["eval_output"]})
+
+    def export(self, events: List[dict]) -> None:
+        for event in events:
+            if event["kind"] == "chain":
+                self._log_chain(event)
+            else:
+                self._log_prompt(event)
+
+
+class JSONLExporter(MonitoringExporter):
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, events: List[dict]) -> None:
+        path = os.path.join(self.directory, f"prompt_monitoring_{time.strftime('%Y%m%d')}.jsonl")
+        with open(path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+
+class PrometheusExporter(MonitoringExporter):
+    def export(self, events: List[dict]) -> None:
+        for event in events:
+            if event["kind"] == "chain":
+                PROMPT_MONITORING_CHARS.labels(field="query").observe(len(event["query"] or ""))
+                PROMPT_MONITORING_CHARS.labels(field="response").observe(len(event["response"] or ""))
+            else:
+                PROMPT_MONITORING_CHARS.labels(field="prompt").observe(len(event["prompt"] or ""))
+                PROMPT_MONITORING_CHARS.labels(field="output").observe(len(event["output"] or ""))
+
+
+def create_exporter(name: str) -> MonitoringExporter:
+    if name == "comet":
+        return CometExporter()
+    if name == "jsonl":
+        return JSONLExporter(settings.MONITORING_JSONL_DIR)
+    if name == "prometheus":
+        return PrometheusExporter()
+    raise ValueError(f"未知的监控导出后端: {name}")
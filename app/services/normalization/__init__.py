@@ -0,0 +1,13 @@
+from .dictionary import VocabularyDictionary, get_dictionary, normalize_batch
+from .vocab_index import VocabHit, VocabularyIndex, VocabularyIndexService, get_vocab_qdrant_client, get_vocab_service
+
+__all__ = [
+    "VocabHit",
+    "VocabularyDictionary",
+    "VocabularyIndex",
+    "VocabularyIndexService",
+    "get_dictionary",
+    "get_vocab_qdrant_client",
+    "get_vocab_service",
+    "normalize_batch",
+]
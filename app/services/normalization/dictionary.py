@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/25 17:30
+# @Author  : Galleons
+# @File    : dictionary.py
+
+"""
+字典归一化快速路径
+
+大多数待归一化的值（城市名、"本科"等学历、标准专业名）与词表条目完全一致或是已知别名，不需要嵌入和向量检索。
+每个字典集合预先构建：
+- 标准名哈希表：去空白、全角转半角、小写后的名称 -> payload
+- 别名哈希表：标准名去掉常见后缀（如"市"、"及以上"、"专业"）及配置的显式别名，
+  同一别名对应多个标准名时视为歧义，不使用
+- 前缀树：查询以某个标准名开头时取最长的那个（如"长沙市岳麓区" -> "长沙市"），
+  或查询是唯一一个标准名的前缀时取该标准名。仅对 VOCAB_PREFIX_COLLECTIONS 中的集合启用，
+  岗位名等集合里"销售经理"与"销售"是不同的条目，不能按前缀归一
+依次尝试以上三级，都未命中才回退到向量检索，各级命中次数记录在 normalization_lookups_total 中。
+
+字典内容来自词表内存索引中的 payload，另可从 Excel/CSV 文件补充（如专业分类完整版.xlsx），
+索引刷新后下次查询时自动重建。
+"""
+
+import logging
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.services.normalization.vocab_index import get_vocab_service
+from app.utils.monitoring import NORMALIZATION_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+_AMBIGUOUS = object()
+
+
+def normalize_key(text: str) -> str:
+    text = unicodedata.normalize("NFKC", str(text))
+    return "".join(text.split()).lower()
+
+
+def _strip_suffix(key: str, suffixes: Iterable[str]) -> str:
+    for suffix in suffixes:
+        if len(key) > len(suffix) and key.endswith(suffix):
+            return key[:-len(suffix)]
+    return key
+
+
+class _TrieNode:
+    __slots__ = ("children", "value", "count")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.value: Optional[dict] = None
+        self.count = 0  # 以该节点为前缀的标准名数量
+
+
+class PrefixTrie:
+    def __init__(self):
+        self._root = _TrieNode()
+
+    def insert(self, key: str, value: dict) -> None:
+        node = self._root
+        path = [node]
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            path.append(node)
+        if node.value is None:
+            for visited in path:
+                visited.count += 1
+        node.value = value
+
+    def longest_prefix(self, text: str, min_chars: int = 2) -> Optional[dict]:
+        """text 以之开头的最长标准名"""
+        node, best = self._root, None
+        for depth, char in enumerate(text, start=1):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.value is not None and depth >= min_chars:
+                best = node.value
+        return best
+
+    def unique_completion(self, prefix: str, min_chars: int = 2) -> Optional[dict]:
+        """prefix 恰好是一个标准名的前缀时返回该标准名"""
+        if len(prefix) < min_chars:
+            return None
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        if node.count != 1:
+            return None
+        while node.value is None:
+            node = next(iter(node.children.values()))
+        return node.value
+
+
+class VocabularyDictionary:
+    def __init__(
+            self,
+            collection: str,
+            name_field: str,
+            suffixes: Iterable[str] = (),
+            aliases: Optional[Dict[str, str]] = None,
+            prefix: bool = False,
+            min_prefix_chars: int = 2,
+    ):
+        """
+        Args:
+            collection: 字典集合名
+            name_field: payload 中标准名所在的字段
+            suffixes: 生成别名时去掉的后缀，查询时同样去掉后再匹配
+            aliases: 显式别名 -> 标准名
+            prefix: 是否启用前缀匹配
+            min_prefix_chars: 前缀匹配至少匹配的字符数
+        """
+        self.collection = collection
+        self.name_field = name_field
+        self.suffixes = sorted((normalize_key(suffix) for suffix in suffixes), key=len, reverse=True)
+        self.explicit_aliases = {normalize_key(alias): normalize_key(name) for alias, name in (aliases or {}).items()}
+        self.prefix = prefix
+        self.min_prefix_chars = min_prefix_chars
+        self._exact: Dict[str, dict] = {}
+        self._aliases: Dict[str, object] = {}
+        self._trie = PrefixTrie()
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def _add_alias(self, alias: str, payload: dict) -> None:
+        if alias in self._exact:
+            return
+        existing = self._aliases.get(alias)
+        if existing is None:
+            self._aliases[alias] = payload
+        elif existing is not payload:
+            self._aliases[alias] = _AMBIGUOUS
+
+    def add(self, payloads: Iterable[dict]) -> "VocabularyDictionary":
+        """加入条目，已有的标准名不覆盖，因此先加入的来源优先"""
+        for payload in payloads:
+            name = payload.get(self.name_field)
+            if not isinstance(name, str) or not name.strip():
+                continue
+            key = normalize_key(name)
+            if key in self._exact:
+                continue
+            self._exact[key] = payload
+            self._aliases.pop(key, None)
+            self._trie.insert(key, payload)
+            alias = _strip_suffix(key, self.suffixes)
+            if alias != key:
+                self._add_alias(alias, payload)
+        for alias, key in self.explicit_aliases.items():
+            if key in self._exact:
+                self._add_alias(alias, self._exact[key])
+        return self
+
+    def _alias(self, key: str) -> Optional[dict]:
+        payload = self._aliases.get(key)
+        return None if payload is _AMBIGUOUS else payload
+
+    def lookup(self, text: str) -> Optional[Tuple[dict, str]]:
+        """返回 (payload, 命中方式)，命中方式为 exact/alias/prefix，未命中返回 None"""
+        key = normalize_key(text)
+        if not key:
+            return None
+        if key in self._exact:
+            return self._exact[key], "exact"
+
+        stripped = _strip_suffix(key, self.suffixes)
+        payload = self._alias(key) or self._exact.get(stripped) or self._alias(stripped)
+        if payload is not None:
+            return payload, "alias"
+        if not self.prefix:
+            return None
+
+        payload = (
+                self._trie.longest_prefix(key, self.min_prefix_chars)
+                or self._trie.unique_completion(stripped, self.min_prefix_chars)
+        )
+        if payload is not None:
+            return payload, "prefix"
+        return None
+
+
+@lru_cache()
+def load_table_source(path: str) -> List[dict]:
+    """读取 Excel/CSV 词表文件，每行作为一个 payload"""
+    import pandas as pd
+
+    try:
+        frame = pd.read_csv(path, dtype=str) if path.endswith(".csv") else pd.read_excel(path, dtype=str)
+    except Exception as e:
+        logger.error(f"读取词表文件 {path} 失败: {str(e)}")
+        return []
+    return [
+        {column: value for column, value in row.items() if isinstance(value, str)}
+        for row in frame.to_dict(orient="records")
+    ]
+
+
+def build_dictionary(collection: str, payloads: Iterable[dict]) -> Optional[VocabularyDictionary]:
+    """按配置构建字典，集合未配置标准名字段时返回 None"""
+    name_field = settings.VOCAB_NAME_FIELDS.get(collection)
+    if name_field is None:
+        return None
+    dictionary = VocabularyDictionary(
+        collection,
+        name_field,
+        suffixes=settings.VOCAB_ALIAS_SUFFIXES.get(collection, ()),
+        aliases=settings.VOCAB_ALIASES.get(collection),
+        prefix=collection in settings.VOCAB_PREFIX_COLLECTIONS,
+        min_prefix_chars=settings.VOCAB_PREFIX_MIN_CHARS,
+    )
+    dictionary.add(payloads)
+    for path in settings.VOCAB_EXTRA_SOURCES.get(collection, ()):
+        dictionary.add(load_table_source(path))
+    return dictionary
+
+
+_dictionaries: Dict[str, Tuple[int, Optional[VocabularyDictionary]]] = {}
+_lock = threading.Lock()
+
+
+def get_dictionary(collection: str) -> Optional[VocabularyDictionary]:
+    """返回集合的字典，词表索引内容变化后重建"""
+    index = get_vocab_service().get(collection) if settings.VOCAB_INDEX_ENABLED else None
+    version = index.version if index is not None else 0
+    with _lock:
+        cached = _dictionaries.get(collection)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        dictionary = build_dictionary(collection, index.payloads() if index is not None else [])
+        if dictionary is not None and not len(dictionary):
+            dictionary = None
+        _dictionaries[collection] = (version, dictionary)
+        return dictionary
+
+
+def normalize_batch(
+        lookups: List[Tuple[str, str]],
+        vector_search: Callable[[List[Tuple[str, str]]], List[dict]],
+) -> List[dict]:
+    """
+    先查字典，未命中的 (查询文本, 集合名) 一次交给 vector_search 批量处理
+
+    Returns:
+        与 lookups 顺序一致的 payload
+    """
+    payloads: List[Optional[dict]] = [None] * len(lookups)
+    misses: List[int] = []
+    for i, (text, collection) in enumerate(lookups):
+        dictionary = get_dictionary(collection) if settings.NORMALIZATION_FAST_PATH_ENABLED else None
+        hit = dictionary.lookup(text) if dictionary is not None else None
+        if hit is None:
+            misses.append(i)
+            continue
+        payloads[i] = hit[0]
+        NORMALIZATION_LOOKUPS.labels(collection=collection, method=hit[1]).inc()
+
+    if misses:
+        for i, payload in zip(misses, vector_search([lookups[i] for i in misses])):
+            payloads[i] = payload
+            NORMALIZATION_LOOKUPS.labels(collection=lookups[i][1], method="vector").inc()
+    return payloads
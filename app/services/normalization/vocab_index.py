@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/25 15:00
+# @Author  : Galleons
+# @File    : vocab_index.py
+
+"""
+小词表集合的内存向量索引
+
+城市、学历、工作性质、福利、专业、职业类别等字典集合每个最多几千条，
+启动时把向量（按行归一化）和 payload 读入连续的 NumPy 矩阵，查询只需一次矩阵-向量乘法，不访问 Qdrant。
+
+增量刷新：只滚动读取 id 和 payload，与内存中的 payload 摘要比对，
+仅为新增或 payload 变化的点拉取向量，删除的点移出矩阵；没有变化时不重建矩阵。
+只改向量不改 payload 的更新无法感知，需调用 load() 全量重建。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+from qdrant_client import QdrantClient
+
+from app.config import settings
+from app.utils.monitoring import VOCAB_INDEX_REFRESHES, VOCAB_INDEX_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class VocabHit(BaseModel):
+    id: Any
+    score: float
+    payload: Dict[str, Any]
+
+
+def _payload_digest(payload: Optional[dict]) -> str:
+    return hashlib.sha1(
+        json.dumps(payload or {}, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class _Snapshot:
+    """一次加载结果，整体替换，查询线程拿到的引用不会被修改"""
+
+    def __init__(self, ids: list, matrix: np.ndarray, payloads: List[dict], digests: List[str]):
+        self.ids = ids
+        self.matrix = matrix
+        self.payloads = payloads
+        self.digests = digests
+        self.rows = {point_id: row for row, point_id in enumerate(ids)}
+
+
+class VocabularyIndex:
+    def __init__(self, client: QdrantClient, collection: str, vector_name: Optional[str] = None, page_size: int = 1000):
+        """
+        Args:
+            client: 集合所在的 Qdrant 客户端
+            collection: 集合名
+            vector_name: 命名向量名，集合只有默认向量时为 None
+            page_size: 滚动读取的每页条数
+        """
+        self.client = client
+        self.collection = collection
+        self.vector_name = vector_name
+        self.page_size = page_size
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self.version = 0  # 每次内容变化加 1，供派生的数据结构判断是否需要重建
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids) if self._snapshot is not None else 0
+
+    def _scroll(self, with_vectors) -> list:
+        points, offset = [], None
+        while True:
+            page, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=self.page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors,
+            )
+            points.extend(page)
+            if offset is None:
+                return points
+
+    def _vector_of(self, point) -> List[float]:
+        vector = point.vector
+        if isinstance(vector, dict):
+            vector = vector[self.vector_name]
+        return vector
+
+    def _vector_selector(self):
+        return [self.vector_name] if self.vector_name else True
+
+    def _build(self, ids: list, vectors, payloads: List[dict]) -> _Snapshot:
+        if len(ids):
+            matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        else:
+            dim = self._snapshot.matrix.shape[1] if self._snapshot is not None else 0
+            matrix = np.zeros((0, dim), dtype=np.float32)
+        return _Snapshot(
+            ids=ids,
+            matrix=np.ascontiguousarray(matrix),
+            payloads=payloads,
+            digests=[_payload_digest(payload) for payload in payloads],
+        )
+
+    def payloads(self) -> List[dict]:
+        return list(self._snapshot.payloads) if self._snapshot is not None else []
+
+    def _swap(self, snapshot: _Snapshot) -> None:
+        self._snapshot = snapshot
+        self.version += 1
+        VOCAB_INDEX_SIZE.labels(collection=self.collection).set(len(snapshot.ids))
+
+    def load(self) -> None:
+        """全量加载集合的向量和 payload"""
+        with self._lock:
+            points = self._scroll(self._vector_selector())
+            self._swap(self._build(
+                [point.id for point in points],
+                [self._vector_of(point) for point in points],
+                [point.payload or {} for point in points],
+            ))
+            VOCAB_INDEX_REFRESHES.labels(collection=self.collection, result="full").inc()
+            logger.info(f"词表索引 {self.collection} 已加载 {len(points)} 条")
+
+    def refresh(self) -> bool:
+        """增量刷新，返回是否有变化；尚未加载时执行全量加载"""
+        if self._snapshot is None:
+            self.load()
+            return True
+
+        with self._lock:
+            old = self._snapshot
+            points = self._scroll(False)
+            current = {point.id: point.payload or {} for point in points}
+            # 用集合保存变更 id，重建时的成员判断为 O(1)
+            changed = {
+                point_id for point_id, payload in current.items()
+                if point_id not in old.rows or old.digests[old.rows[point_id]] != _payload_digest(payload)
+            }
+            removed = [point_id for point_id in old.rows if point_id not in current]
+            if not changed and not removed:
+                VOCAB_INDEX_REFRESHES.labels(collection=self.collection, result="unchanged").inc()
+                return False
+
+            fetched = {}
+            if changed:
+                for point in self.client.retrieve(
+                        collection_name=self.collection,
+                        ids=list(changed),
+                        with_payload=True,
+                        with_vectors=self._vector_selector(),
+                ):
+                    fetched[point.id] = point
+
+            # 未变化的行直接复用旧矩阵，变化的行使用新拉取的向量；期间被删除的点跳过
+            ids, rows, payloads = [], [], []
+            for point_id in current:
+                if point_id in fetched:
+                    ids.append(point_id)
+                    rows.append(np.asarray(self._vector_of(fetched[point_id]), dtype=np.float32))
+                    payloads.append(fetched[point_id].payload or {})
+                elif point_id in old.rows and point_id not in changed:
+                    ids.append(point_id)
+                    rows.append(old.matrix[old.rows[point_id]])
+                    payloads.append(old.payloads[old.rows[point_id]])
+            self._swap(self._build(ids, np.vstack(rows) if rows else [], payloads))
+            VOCAB_INDEX_REFRESHES.labels(collection=self.collection, result="incremental").inc()
+            logger.info(
+                f"词表索引 {self.collection} 增量刷新：更新 {len(fetched)} 条，删除 {len(removed)} 条，共 {len(ids)} 条"
+            )
+            return True
+
+    def search_batch(self, vectors, k: int = 1) -> List[List[VocabHit]]:
+        """多条查询一次矩阵乘法，返回每条查询按相似度降序的 top-k"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError(f"词表索引 {self.collection} 尚未加载")
+        queries = _normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if not snapshot.ids:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ snapshot.matrix.T
+        k = min(k, scores.shape[1])
+        if k == 1:
+            top = np.argmax(scores, axis=1)[:, None]
+        else:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+        return [
+            [
+                VocabHit(id=snapshot.ids[row], score=float(scores[i, row]), payload=snapshot.payloads[row])
+                for row in top[i]
+            ]
+            for i in range(len(queries))
+        ]
+
+    def search(self, vector, k: int = 1) -> List[VocabHit]:
+        return self.search_batch([vector], k)[0]
+
+
+class VocabularyIndexService:
+    """管理多个词表索引，启动时加载并在后台定期增量刷新"""
+
+    def __init__(self, refresh_interval: float = 300.0):
+        self.refresh_interval = refresh_interval
+        self._indexes: Dict[str, VocabularyIndex] = {}
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def register(self, index: VocabularyIndex) -> VocabularyIndex:
+        self._indexes[index.collection] = index
+        return index
+
+    def get(self, collection: str) -> Optional[VocabularyIndex]:
+        """返回已加载的索引，未注册或未加载时返回 None，调用方回退到 Qdrant 查询"""
+        index = self._indexes.get(collection)
+        return index if index is not None and index.loaded else None
+
+    def refresh_all(self) -> None:
+        for index in self._indexes.values():
+            try:
+                index.refresh()
+            except Exception as e:
+                VOCAB_INDEX_REFRESHES.labels(collection=index.collection, result="error").inc()
+                logger.error(f"刷新词表索引 {index.collection} 失败: {str(e)}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh_all()
+
+    def start(self) -> None:
+        """加载全部索引并启动后台刷新，加载失败的索引在下次刷新时重试"""
+        self.refresh_all()
+        if self._worker is None and self.refresh_interval > 0:
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="vocab-index-refresh", daemon=True)
+            self._worker.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+
+@lru_cache()
+def get_vocab_qdrant_client() -> QdrantClient:
+    """填表字典所在的 Qdrant 实例，内存索引和未加载时的回退检索共用"""
+    return QdrantClient(url=settings.VOCAB_QDRANT_URL)
+
+
+@lru_cache()
+def get_vocab_service() -> VocabularyIndexService:
+    """按配置注册字典集合：填表字典在 VOCAB_QDRANT_URL，职业类别在主 Qdrant 实例"""
+    from app.db.qdrant import QdrantClientManager
+
+    service = VocabularyIndexService(refresh_interval=settings.VOCAB_INDEX_REFRESH_INTERVAL)
+    dictionary_client = get_vocab_qdrant_client()
+    for collection in settings.VOCAB_DICTIONARY_COLLECTIONS:
+        service.register(VocabularyIndex(dictionary_client, collection))
+    service.register(VocabularyIndex(QdrantClientManager.get_client(), "job_category", vector_name="position_name"))
+    return service
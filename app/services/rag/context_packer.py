@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/24 14:30
+# @Author  : Galleons
+# @File    : context_packer.py
+
+"""
+按 token 预算拼装 RAG 上下文
+
+重排后的文本块按相关性从高到低依次放入上下文，直到用完 RAG_CONTEXT_TOKEN_BUDGET：
+- 放得下的文本块整段放入
+- 放不下但剩余预算不少于 RAG_CONTEXT_MIN_PASSAGE_TOKENS 时截断后放入
+- 剩余预算更少时丢弃，继续尝试后面更短的文本块
+token 数用目标模型的分词器计算；分词器加载失败（如离线环境）时按字符保守估算。
+分词器在应用启动阶段通过 get_token_counter() 加载，不在第一次 RAG 请求时加载。
+"""
+
+import logging
+import math
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.utils.monitoring import RAG_CONTEXT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCounter(ABC):
+    """token 计数与截断，子类实现 count 和 truncate"""
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        pass
+
+    @abstractmethod
+    def truncate(self, text: str, max_tokens: int) -> str:
+        pass
+
+
+class HFTokenCounter(TokenCounter):
+    def __init__(self, tokenizer):
+        """
+        Args:
+            tokenizer: transformers 分词器
+        """
+        self.tokenizer = tokenizer
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        token_ids = self.tokenizer.encode(text, add_special_tokens=False)
+        return self.tokenizer.decode(token_ids[:max_tokens])
+
+
+def _char_cost(char: str) -> float:
+    # 中日韩字符按 1 个 token 计，其余字符按 3 个字符 1 个 token 计，均高于 Qwen 分词器的实际值
+    return 1.0 if "⺀" <= char <= "鿿" or "가" <= char <= "힯" else 1 / 3
+
+
+class EstimateTokenCounter(TokenCounter):
+    """按字符保守估算，宁可少放也不超出上下文窗口"""
+
+    def count(self, text: str) -> int:
+        return math.ceil(sum(_char_cost(char) for char in text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        used = 0.0
+        for index, char in enumerate(text):
+            used += _char_cost(char)
+            if used > max_tokens:
+                return text[:index]
+        return text
+
+
+class PackedContext(BaseModel):
+    passages: List[str]
+    tokens: int  # 上下文实际使用的 token 数
+    dropped: int = 0  # 被丢弃的文本块数
+    truncated: int = 0  # 被截断的文本块数
+
+
+class ContextPacker:
+    def __init__(self, counter: TokenCounter, budget: int, min_passage_tokens: int = 64):
+        """
+        Args:
+            counter: token 计数器
+            budget: 上下文 token 预算
+            min_passage_tokens: 截断后至少保留的 token 数，剩余预算更少时直接丢弃
+        """
+        self.counter = counter
+        self.budget = budget
+        self.min_passage_tokens = min_passage_tokens
+
+    def pack(self, passages: List[str]) -> PackedContext:
+        """passages 需已按相关性从高到低排列"""
+        packed: List[str] = []
+        used = dropped = truncated = 0
+        for passage in passages:
+            remaining = self.budget - used
+            tokens = self.counter.count(passage)
+            if tokens <= remaining:
+                packed.append(passage)
+                used += tokens
+            elif remaining >= self.min_passage_tokens:
+                passage = self.counter.truncate(passage, remaining)
+                packed.append(passage)
+                used += self.counter.count(passage)
+                truncated += 1
+            else:
+                dropped += 1
+        return PackedContext(passages=packed, tokens=used, dropped=dropped, truncated=truncated)
+
+
+@lru_cache()
+def get_token_counter(model_name: Optional[str] = None) -> TokenCounter:
+    model_name = model_name or settings.RAG_TOKENIZER
+    try:
+        from transformers import AutoTokenizer
+
+        return HFTokenCounter(AutoTokenizer.from_pretrained(model_name))
+    except Exception as e:
+        logger.warning(f"加载分词器 {model_name} 失败，按字符估算 token 数: {str(e)}")
+        return EstimateTokenCounter()
+
+
+def pack_context(passages: List[str], budget: Optional[int] = None) -> PackedContext:
+    """按配置的分词器和预算拼装上下文"""
+    packer = ContextPacker(
+        counter=get_token_counter(),
+        budget=settings.RAG_CONTEXT_TOKEN_BUDGET if budget is None else budget,
+        min_passage_tokens=settings.RAG_CONTEXT_MIN_PASSAGE_TOKENS,
+    )
+    packed = packer.pack(passages)
+    RAG_CONTEXT_TOKENS.observe(packed.tokens)
+    return packed
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/21 09:40
+# @Author  : Galleons
+# @File    : deadline.py
+
+"""
+RAG 请求的时间预算
+
+每个请求创建一个 Deadline 并逐级传给查询扩展、检索、重排和 LLM 生成。
+各阶段按 RAG_STAGE_BUDGETS 中的比例分得预算，预算不足时降级（跳过扩展、跳过重排、减小 k），
+并记录被跳过的阶段，供响应元数据和监控指标使用。
+"""
+
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+from app.utils.logging import get_logger
+from app.utils.monitoring import RAG_STAGE_SKIPPED
+
+logger = get_logger(__name__)
+
+
+class Deadline:
+    def __init__(
+            self,
+            budget: Optional[float] = None,
+            stage_shares: Optional[Dict[str, float]] = None,
+            timer: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            budget: 整个请求的时间预算（秒），默认取 RAG_DEADLINE
+            stage_shares: 各阶段占总预算的比例，默认取 RAG_STAGE_BUDGETS
+            timer: 时钟函数，测试时可替换
+        """
+        self.budget = settings.RAG_DEADLINE if budget is None else budget
+        self.stage_shares = settings.RAG_STAGE_BUDGETS if stage_shares is None else stage_shares
+        self._timer = timer
+        self._started = timer()
+        self.skipped: List[str] = []
+
+    def elapsed(self) -> float:
+        return self._timer() - self._started
+
+    def remaining(self) -> float:
+        return max(0.0, self.budget - self.elapsed())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def share(self, stage: str) -> float:
+        """阶段按比例分得的预算（秒）"""
+        return self.budget * self.stage_shares.get(stage, 0.0)
+
+    def reserved_after(self, stage: str) -> float:
+        """排在该阶段之后的各阶段需要预留的时间（秒）"""
+        stages = list(self.stage_shares)
+        later = stages[stages.index(stage) + 1:] if stage in stages else []
+        return sum(self.share(name) for name in later)
+
+    def stage_timeout(self, stage: str) -> float:
+        """
+        该阶段最多可用的时间：剩余时间扣除后续阶段的预留
+
+        前序阶段提前完成时，节省的时间顺延给当前阶段；前序阶段超时则压缩当前阶段。
+        """
+        return max(0.0, self.remaining() - self.reserved_after(stage))
+
+    def behind_schedule(self, stage: str) -> bool:
+        """剩余时间已不足以按份额完成该阶段及之后的阶段"""
+        return self.remaining() < self.share(stage) + self.reserved_after(stage)
+
+    def skip(self, stage: str, reason: str = "") -> None:
+        self.skipped.append(stage)
+        RAG_STAGE_SKIPPED.labels(stage=stage).inc()
+        logger.warning("时间预算不足，跳过RAG阶段。", stage=stage, reason=reason, remaining=round(self.remaining(), 3))
+
+    def metadata(self) -> dict:
+        return {
+            "deadline": self.budget,
+            "elapsed": round(self.elapsed(), 3),
+            "skipped_stages": list(self.skipped),
+        }
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/17 10:30
+# @Author  : Galleons
+# @File    : fusion.py
+
+"""
+扩展查询结果的排名融合
+
+多个扩展查询经常命中同一个文本块，直接拼接后送去重排会让重复内容被反复传输、分词和打分。
+这里按 (集合, point id) 去重（不同集合的 id 各自独立，相同 id 可能是无关的文本块），
+并用倒数排名融合（RRF）合并各路结果：
+score(d) = Σ 1 / (k + rank_i(d))，只把融合后排名靠前的唯一文本块送去重排。
+"""
+
+from typing import Hashable, Iterable, List, Sequence, Tuple
+
+from qdrant_client import models
+
+
+def reciprocal_rank_fusion(
+        ranked_lists: Iterable[Tuple[str, Sequence[models.ScoredPoint]]],
+        k: int = 60,
+        top_n: int | None = None,
+) -> List[models.ScoredPoint]:
+    """
+    按 (集合, point id) 去重并做倒数排名融合
+
+    Args:
+        ranked_lists: (集合名, 该集合上某个查询按相似度排好序的检索结果) 列表
+        k: RRF 平滑常数，越大排名靠后的结果权重衰减越慢
+        top_n: 只保留融合分数最高的前 top_n 个，None 表示全部保留
+
+    Returns:
+        去重后的结果，score 替换为融合分数，按分数从高到低排列
+    """
+    scores: dict[Hashable, float] = {}
+    points: dict[Hashable, models.ScoredPoint] = {}
+    for collection_name, hits in ranked_lists:
+        for rank, hit in enumerate(hits, start=1):
+            key = (collection_name, hit.id)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            points.setdefault(key, hit)
+
+    # sorted 是稳定排序，同分时保持首次出现的顺序
+    ordered = sorted(scores, key=scores.__getitem__, reverse=True)
+    if top_n is not None:
+        ordered = ordered[:top_n]
+    return [points[key].model_copy(update={"score": scores[key]}) for key in ordered]
@@ -1,31 +1,49 @@
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 
+from app.config import settings
 from app.services.llm.chain import GeneralChain
 from app.services.llm.prompt_templates import QueryExpansionTemplate
+from app.services.llm.replica_pool import ReplicaPool, get_llm_pool
+from app.utils.cache import TTLCache
+from app.utils.embedding_cache import normalize_text
+
+# 按 (归一化查询, 扩展数量) 缓存扩展结果，常见问题无需重复调用 LLM
+_expansion_cache = TTLCache(
+    maxsize=settings.QUERY_EXPANSION_CACHE_SIZE,
+    ttl=settings.QUERY_EXPANSION_CACHE_TTL,
+    name="query_expansion",
+)
+
+
+@lru_cache()
+def _get_model() -> ReplicaPool:
+    """进程内共享的 LLM 客户端（复用连接池，请求分配到负载最低的副本）"""
+    return get_llm_pool("qwen2-mini")
+
+
+@lru_cache(maxsize=16)
+def _get_chain(to_expand_to_n: int):
+    prompt_template = QueryExpansionTemplate().create_template(to_expand_to_n)
+    return GeneralChain().get_chain(
+        llm=_get_model(), output_key="expanded_queries", template=prompt_template
+    )
 
 
 class QueryExpansion:
     @staticmethod
     def generate_response(query: str, to_expand_to_n: int = 3) -> list[str]:
-        query_expansion_template = QueryExpansionTemplate()
-        prompt_template = query_expansion_template.create_template(to_expand_to_n)
-        model = ChatOpenAI(
-            model="qwen2-mini1",
-            openai_api_key='empty',
-            openai_api_base="http://192.168.100.111:8011/v1",
-            # temperature=0
-        )
-
-        chain = GeneralChain().get_chain(
-            llm=model, output_key="expanded_queries", template=prompt_template
-        )
-
-        response = chain.invoke({"question": query})
+        cache_key = (normalize_text(query), to_expand_to_n)
+        cached = _expansion_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        response = _get_chain(to_expand_to_n).invoke({"question": query})
         result = response["expanded_queries"]
 
-        queries = result.strip().split(query_expansion_template.separator)
+        queries = result.strip().split(QueryExpansionTemplate().separator)
         stripped_queries = [
             stripped_item for item in queries if (stripped_item := item.strip())
         ]
 
+        _expansion_cache.set(cache_key, tuple(stripped_queries))
         return stripped_queries
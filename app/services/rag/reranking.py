@@ -1,71 +1,302 @@
+"""
+重排序
+
+- RemoteReranker: SiliconFlow /rerank 接口，复用 httpx 连接池，限制同时在途的请求数并设置超时
+- LocalReranker: 进程内 CPU 交叉编码器（bge-reranker），远程接口变慢或被限流时兜底，设置超时时调用方最多等待该时长
+- Reranker: 按 (模型, 查询哈希, 文本哈希) 缓存相关性分数，重复出现的文本块不再重新打分
+
+RERANK_BACKEND 控制后端：remote（默认）/ local / auto（优先远程，失败时切换到本地）。
+本地模型数 GB，只在显式配置 local/auto 时创建，并在应用启动阶段通过 warmup() 加载，不在请求路径上加载。
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import httpx
+
 from app.config import settings
-import requests
-import json
-import os
+from app.utils.cache import TTLCache
+from app.utils.embedding_cache import normalize_text
+from app.utils.logging import get_logger
 
-class Reranker:
-    @staticmethod
-    def generate_response(
-        query: str, passages: list[str], keep_top_k: int
-    ) -> list[str]:
-        # reranking_template = RerankingTemplate()
-        # prompt_template = reranking_template.create_template(keep_top_k=keep_top_k)
-        #
-        # model = ChatOpenAI(
-        #     model=settings.Silicon_model_v1,
-        #     openai_api_key=settings.Silicon_api_key1,
-        #     openai_api_base=settings.Silicon_base_url,
-        #     temperature=0
-        # )
-        # chain = GeneralChain().get_chain(
-        #     llm=model, output_key="rerank", template=prompt_template
-        # )
-        #
-        # stripped_passages = [
-        #     stripped_item for item in passages if (stripped_item := item.strip())
-        # ]
-        # passages = reranking_template.separator.join(stripped_passages)
-        # response = chain.invoke({"question": query, "passages": passages})
-        #
-        # result = response["rerank"]
-        # reranked_passages = result.strip().split(reranking_template.separator)
-        # stripped_passages = [
-        #     stripped_item
-        #     for item in reranked_passages
-        #     if (stripped_item := item.strip())
-        # ]
-
-        payload = {
-            "model": settings.Silicon_model_rerank,
+logger = get_logger(__name__)
+
+
+class RemoteReranker:
+    def __init__(
+            self,
+            base_url: str,
+            api_key: str | None,
+            model: str,
+            timeout: float = 5.0,
+            max_connections: int = 20,
+            max_concurrency: int = 8,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.model_id = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url, headers=self._headers, limits=self._limits, timeout=self.timeout
+            )
+        return self._async_client
+
+    def _get_sync_client(self) -> httpx.Client:
+        if self._sync_client is None or self._sync_client.is_closed:
+            self._sync_client = httpx.Client(
+                base_url=self.base_url, headers=self._headers, limits=self._limits, timeout=self.timeout
+            )
+        return self._sync_client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _payload(self, query: str, passages: List[str]) -> dict:
+        return {
+            "model": self.model,
             "query": query,
             "documents": passages,
-            "top_n": keep_top_k,
+            "top_n": len(passages),  # 取回全部分数，排序与截断在本地完成
             "return_documents": False,
             "max_chunks_per_doc": 1024,
-            "overlap_tokens": 80
+            "overlap_tokens": 80,
         }
 
-        headers = {
-            "Authorization": f"Bearer {settings.Silicon_api_key1}",
-            "Content-Type": "application/json"
-        }
+    @staticmethod
+    def _parse(result: dict, expected: int) -> List[float]:
+        scores = [0.0] * expected
+        for item in result["results"]:
+            scores[item["index"]] = float(item["relevance_score"])
+        return scores
+
+    async def score(self, query: str, passages: List[str], timeout: Optional[float] = None) -> List[float]:
+        async with self._get_semaphore():
+            response = await self._get_async_client().post(
+                "/rerank",
+                json=self._payload(query, passages),
+                timeout=timeout if timeout is not None else self.timeout,
+            )
+        response.raise_for_status()
+        return self._parse(response.json(), len(passages))
+
+    def score_sync(self, query: str, passages: List[str], timeout: Optional[float] = None) -> List[float]:
+        with self._sync_semaphore:
+            response = self._get_sync_client().post(
+                "/rerank",
+                json=self._payload(query, passages),
+                timeout=timeout if timeout is not None else self.timeout,
+            )
+        response.raise_for_status()
+        return self._parse(response.json(), len(passages))
+
+
+class LocalReranker:
+    """进程内 CPU 交叉编码器，模型在第一次调用时加载"""
+
+    def __init__(self, model_name: str = "BAAI/bge-reranker-v2-m3"):
+        self.model_name = model_name
+        self.model_id = f"{model_name}-local"
+        self._model = None
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-rerank")
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from FlagEmbedding import FlagReranker
+
+                    from app.utils.EMBEDDING import flag_device_kwargs
+
+                    logger.info("加载本地重排序模型。", model=self.model_name)
+                    self._model = FlagReranker(
+                        self.model_name, use_fp16=False, **flag_device_kwargs(FlagReranker, "cpu")
+                    )
+        return self._model
+
+    def warmup(self) -> None:
+        self._get_model()
+
+    def _compute(self, query: str, passages: List[str]) -> List[float]:
+        scores = self._get_model().compute_score([[query, passage] for passage in passages], normalize=True)
+        return [float(score) for score in (scores if isinstance(scores, list) else [scores])]
+
+    def score_sync(self, query: str, passages: List[str], timeout: Optional[float] = None) -> List[float]:
+        """
+        本地推理无法中途取消：设置 timeout 时在单线程池中计算，超时后调用方不再等待，
+        尚未开始的计算被取消，已开始的计算跑完后丢弃结果
+        """
+        if timeout is None:
+            return self._compute(query, passages)
+        future = self._executor.submit(self._compute, query, passages)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"本地重排序超过 {timeout:.3f}s")
+
+    async def score(self, query: str, passages: List[str], timeout: Optional[float] = None) -> List[float]:
+        return await asyncio.to_thread(self.score_sync, query, passages, timeout)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    def __init__(
+            self,
+            remote: Optional[RemoteReranker] = None,
+            local: Optional[LocalReranker] = None,
+            backend: str = "remote",
+            cache: Optional[TTLCache] = None,
+    ):
+        """
+        Args:
+            remote: 远程重排序接口
+            local: 本地交叉编码器
+            backend: remote / local / auto
+            cache: 相关性分数缓存，为 None 时不缓存
+        """
+        self.remote = remote
+        self.local = local
+        self.backend = backend
+        self.cache = cache
+
+    def _backends(self) -> list:
+        if self.backend == "remote":
+            return [self.remote]
+        if self.backend == "local":
+            return [self.local]
+        return [backend for backend in (self.remote, self.local) if backend is not None]
+
+    def warmup(self) -> None:
+        """加载本地交叉编码器（已配置时），应用启动时调用"""
+        if self.local is not None and self.backend != "remote":
+            self.local.warmup()
+
+    def _lookup(self, model_id: str, query_hash: str, passages: List[str]) -> Dict[str, float]:
+        if self.cache is None:
+            return {}
+        found = {}
+        for passage in passages:
+            score = self.cache.get((model_id, query_hash, _hash(passage)))
+            if score is not None:
+                found[passage] = score
+        return found
+
+    def _store(self, model_id: str, query_hash: str, scores: Dict[str, float]) -> None:
+        if self.cache is None:
+            return
+        for passage, score in scores.items():
+            self.cache.set((model_id, query_hash, _hash(passage)), score)
+
+    @staticmethod
+    def _remaining(ends_at: Optional[float]) -> Optional[float]:
+        """各后端共用一次调用的超时，前一个后端失败耗掉的时间不再给下一个后端"""
+        if ends_at is None:
+            return None
+        remaining = ends_at - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("重排序超时")
+        return remaining
+
+    @staticmethod
+    def _rank(passages: List[str], scores: Dict[str, float], keep_top_k: int) -> List[str]:
+        return sorted(passages, key=lambda passage: scores[passage], reverse=True)[:keep_top_k]
+
+    def generate_response(
+            self, query: str, passages: List[str], keep_top_k: int, timeout: Optional[float] = None
+    ) -> List[str]:
+        """对文本块打分并返回相关性最高的 keep_top_k 个，timeout 为整次调用（含切换后端）的超时（秒）"""
+        passages = list(dict.fromkeys(passages))
+        query_hash = _hash(query)
+        last_error: Optional[Exception] = None
+        ends_at = None if timeout is None else time.monotonic() + timeout
+        for backend in self._backends():
+            scores = self._lookup(backend.model_id, query_hash, passages)
+            missing = [passage for passage in passages if passage not in scores]
+            try:
+                if missing:
+                    remaining = self._remaining(ends_at)
+                    fresh = dict(zip(missing, backend.score_sync(query, missing, timeout=remaining)))
+                    self._store(backend.model_id, query_hash, fresh)
+                    scores.update(fresh)
+            except Exception as e:
+                logger.warning("重排序后端调用失败，尝试下一个后端。", backend=backend.model_id, error=str(e))
+                last_error = e
+                continue
+            return self._rank(passages, scores, keep_top_k)
+        raise RuntimeError(f"没有可用的重排序后端: {str(last_error)}") from last_error
 
-        response = requests.post(
-            os.path.join(settings.Silicon_base_url, 'rerank'),
-            json=payload,
-            headers=headers)
-        response_data = json.loads(response.text)
+    async def agenerate_response(
+            self, query: str, passages: List[str], keep_top_k: int, timeout: Optional[float] = None
+    ) -> List[str]:
+        """generate_response 的 async 版本"""
+        passages = list(dict.fromkeys(passages))
+        query_hash = _hash(query)
+        last_error: Optional[Exception] = None
+        ends_at = None if timeout is None else time.monotonic() + timeout
+        for backend in self._backends():
+            scores = self._lookup(backend.model_id, query_hash, passages)
+            missing = [passage for passage in passages if passage not in scores]
+            try:
+                if missing:
+                    remaining = self._remaining(ends_at)
+                    fresh = dict(zip(missing, await backend.score(query, missing, timeout=remaining)))
+                    self._store(backend.model_id, query_hash, fresh)
+                    scores.update(fresh)
+            except Exception as e:
+                logger.warning("重排序后端调用失败，尝试下一个后端。", backend=backend.model_id, error=str(e))
+                last_error = e
+                continue
+            return self._rank(passages, scores, keep_top_k)
+        raise RuntimeError(f"没有可用的重排序后端: {str(last_error)}") from last_error
 
-        # Sort passages based on reranking results
-        ranked_indices = [result["index"] for result in response_data["results"]]
-        reranked_passages = [passages[idx] for idx in ranked_indices]
 
-        return reranked_passages
+@lru_cache()
+def get_reranker() -> Reranker:
+    """进程内共享的重排序器（连接池、并发限制和分数缓存在所有请求间复用）"""
+    return Reranker(
+        remote=RemoteReranker(
+            base_url=settings.Silicon_base_url,
+            api_key=settings.Silicon_api_key1,
+            model=settings.Silicon_model_rerank,
+            timeout=settings.RERANK_HTTP_TIMEOUT,
+            max_concurrency=settings.RERANK_MAX_CONCURRENCY,
+        ),
+        local=LocalReranker(settings.RERANK_LOCAL_MODEL_NAME) if settings.RERANK_BACKEND != "remote" else None,
+        backend=settings.RERANK_BACKEND,
+        cache=TTLCache(maxsize=settings.RERANK_CACHE_SIZE, ttl=settings.RERANK_CACHE_TTL, name="rerank_score"),
+    )
 
 
 if __name__ == "__main__":
     query = "苹果"
     passages = ["苹果", "香蕉", "水果", "蔬菜"]
     keep_top_k = 4
-    reranked_passages = Reranker.generate_response(query, passages, keep_top_k)
-    print(reranked_passages)
\ No newline at end of file
+    reranked_passages = get_reranker().generate_response(query, passages, keep_top_k)
+    print(reranked_passages)
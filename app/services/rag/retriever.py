@@ -1,17 +1,29 @@
 import concurrent.futures
+import math
+import time
 
 from app.utils.logging import get_logger
 import app.utils
+from app.db.knowledge_base import resolve_kb_targets
 from app.db.qdran import QdrantDatabaseConnector
 from qdrant_client import models
+from app.services.rag.deadline import Deadline
+from app.services.rag.fusion import reciprocal_rank_fusion
 from app.services.rag.query_expansion import QueryExpansion
-from app.services.rag.reranking import Reranker
+from app.services.rag.reranking import get_reranker
 from app.services.rag.self_query import SelfQuery
 #from sentence_transformers.SentenceTransformer import SentenceTransformer
-from app.utils.embeddings import embed_model
+from app.utils.embeddings import embed_texts
+from app.utils.embedding_cache import normalize_text
+from app.config import settings
 
 logger = get_logger(__name__)
 
+# 流水线检索中运行查询扩展的共享线程池（超时的扩展仍会跑完并写入扩展缓存）
+_expansion_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=settings.RAG_EXPANSION_WORKERS, thread_name_prefix="query-expansion"
+)
+
 
 class VectorRetriever:
     """
@@ -21,114 +33,115 @@ class VectorRetriever:
     def __init__(self, query: str) -> None:
         self._client = QdrantDatabaseConnector()
         self.query = query
-        #self._embedder = SentenceTransformer(settings.EMBEDDING_MODEL_ID)
-        self._embedder = embed_model
         self._query_expander = QueryExpansion()
         self._metadata_extractor = SelfQuery()
-        self._reranker = Reranker()
-
-    def _search_single_query(
-        self, generated_query: str, collections: list[str], metadata_filter_value: dict | None = None, k: int = 3
-    ):
-        # assert k > 3, "查询集合限制，k应该小于3"
-        #
-        # query_vector = self._embedder.create_embedding(generated_query)['data'][0]['embedding']    #.tolist()
-        # vectors = [
-        #     self._client.search(
-        #         collection_name="vector_posts",
-        #         query_filter=models.Filter(
-        #             must=[
-        #                 models.FieldCondition(
-        #                     key="author_id",
-        #                     match=models.MatchValue(
-        #                         value=metadata_filter_value,
-        #                     ),  # 查询 + 元数据过滤
-        #                 )
-        #             ]
-        #         ) if metadata_filter_value else None,   # 若为None则不进行过滤
-        #         query_vector=query_vector,
-        #         limit=k // 3,
-        #     ),
-        #     self._client.search(
-        #         collection_name="vector_articles",
-        #         query_filter=models.Filter(
-        #             must=[
-        #                 models.FieldCondition(
-        #                     key="author_id",
-        #                     match=models.MatchValue(
-        #                         value=metadata_filter_value,
-        #                     ),
-        #                 )
-        #             ]
-        #         ) if metadata_filter_value else None,
-        #         query_vector=query_vector,
-        #         limit=k // 3,
-        #     ),
-        #     self._client.search(
-        #         collection_name="vector_repositories",
-        #         query_filter=models.Filter(
-        #             must=[
-        #                 models.FieldCondition(
-        #                     key="owner_id",
-        #                     match=models.MatchValue(
-        #                         value=metadata_filter_value,
-        #                     ),
-        #                 )
-        #             ]
-        #         ) if metadata_filter_value else None,
-        #         query_vector=query_vector,
-        #         limit=k // 3,
-        #     ),
-        # ]
-
-        # assert k > len(collections), f"查询集合限制，k应该大于集合的数量: {len(collections)}"
+        self._reranker = get_reranker()
+
+    @staticmethod
+    def _build_filter(metadata_filter_value: dict | None) -> models.Filter | None:
+        if not metadata_filter_value:
+            return None    # 若为None则不进行过滤
+        return models.Filter(
+            must=[
+                models.FieldCondition(
+                    key=metadata_filter_value['key'],
+                    match=models.MatchValue(
+                        value=metadata_filter_value['value'],
+                    ),
+                )
+            ]
+        )
 
+    def _search_batch(
+        self,
+        generated_queries: list[str],
+        collections: list[str],
+        metadata_filter_value: dict | None = None,
+        k: int = 3,
+        deadline: Deadline | None = None,
+    ) -> list[tuple[str, list]]:
+        """
+        批量检索：所有扩展查询一次嵌入，每个集合一次 query_batch_points 请求
+
+        Qdrant 的批量查询以集合为单位，无法跨集合合并，
+        因此网络往返从「查询数 × (1 + 集合数)」降到「1 + 集合数」。
+        返回每个 (查询, 集合) 各自排好序的结果列表及其集合名，供排名融合按 (集合, id) 去重。
+        有时间预算时嵌入和每次 Qdrant 请求都以检索阶段的剩余时间为超时，预算用完时跳过剩余的请求。
+        """
         assert k > 3, "查询集合限制，k应该小于3"
-        # 生成查询向量
-        query_vector = self._embedder.create_embedding(generated_query)['data'][0]['embedding']
-
-        # 初始化存储各集合查询结果的列表
-        vectors = []
-
-        # 通用过滤条件
-        if metadata_filter_value:
-            filter_condition = models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key=metadata_filter_value['key'],
-                        match=models.MatchValue(
-                            value=metadata_filter_value['value'],
-                        ),
-                    )
-                ]
-            )
-        else:
-            filter_condition = None
+        timeout = self._retrieval_timeout(deadline)
+        if timeout is not None and timeout <= 0:
+            deadline.skip("retrieval", "剩余时间不足")
+            return []
+        query_vectors = embed_texts(generated_queries, model=settings.EMBEDDING_MODEL_ID, timeout=timeout)
+        filter_condition = self._build_filter(metadata_filter_value)
 
-        # 遍历集合并进行搜索
-        for collection_name in collections:
-            # 执行搜索并添加到 vectors 列表中
-            vectors.append(
-                self._client.search(
+        # 租户模式下多个知识库合并为共享集合上的一次检索，limit 按合并的知识库数量放大
+        ranked_lists = []
+        for collection_name, query_filter, weight in resolve_kb_targets(collections, filter_condition):
+            timeout = self._retrieval_timeout(deadline)
+            if timeout is not None and timeout <= 0:
+                deadline.skip("retrieval", f"剩余时间不足，未检索集合 {collection_name}")
+                break
+            ranked_lists.extend(
+                (collection_name, points)
+                for points in self._client.search_batch(
                     collection_name=collection_name,
-                    query_filter=filter_condition,
-                    query_vector=query_vector,
-                    limit=k // len(collections),
+                    query_vectors=query_vectors,
+                    query_filter=query_filter,
+                    limit=k // len(collections) * weight,
+                    timeout=None if timeout is None else math.ceil(timeout),
                 )
             )
 
-        return app.utils.flatten(vectors)
+        return ranked_lists
+
+    @staticmethod
+    def _await_expansion(
+        expansion: concurrent.futures.Future, timeout: float, deadline: Deadline | None = None
+    ) -> list[str]:
+        """等待查询扩展结果，超时或出错返回空列表"""
+        try:
+            return expansion.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            logger.warning("查询扩展超时，仅使用原始查询的检索结果。", timeout=round(timeout, 3))
+            if deadline is not None:
+                deadline.skip("expansion", "查询扩展超时")
+        except Exception:
+            logger.exception("查询扩展失败，仅使用原始查询的检索结果。")
+        return []
+
+    @staticmethod
+    def _budget_k(k: int, deadline: Deadline | None) -> int:
+        """进度落后于预算时减小 k，减少检索结果和后续重排的数据量"""
+        if deadline is None or not deadline.behind_schedule("retrieval"):
+            return k
+        deadline.skip("reduce_k", f"k: {k} -> {max(4, k // 2)}")
+        return max(4, k // 2)
 
+    @staticmethod
+    def _retrieval_timeout(deadline: Deadline | None) -> float | None:
+        return deadline.stage_timeout("retrieval") if deadline is not None else None
 
     def retrieve_top_k(self,
                        k: int,
                        collections: list[str],
                        filter_setting: dict | None = None,
-                       to_expand_to_n_queries: int = 3) -> list:
+                       to_expand_to_n_queries: int = 3,
+                       deadline: Deadline | None = None) -> list:
         # 生成多重查询
-        generated_queries = self._query_expander.generate_response(
-            self.query, to_expand_to_n=to_expand_to_n_queries
-        )
+        if deadline is None:
+            generated_queries = self._query_expander.generate_response(
+                self.query, to_expand_to_n=to_expand_to_n_queries
+            )
+        else:
+            # 有时间预算时，扩展超出自身份额则退化为只用原始查询
+            expansion = _expansion_executor.submit(
+                self._query_expander.generate_response, self.query, to_expand_to_n_queries
+            )
+            generated_queries = (
+                self._await_expansion(expansion, deadline.stage_timeout("expansion"), deadline) or [self.query]
+            )
         logger.info(
             "成功生成搜索查询。",
             num_queries=len(generated_queries),
@@ -144,28 +157,100 @@ class VectorRetriever:
         # else:
         #     logger.info("无法从查询中提取author_id。")
 
-        # 在不同的线程上分别运行各查询以减少网络I/O开销，不受python的GIL限制阻碍
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            search_tasks = [
-                executor.submit(self._search_single_query, query, collections, filter_setting, k)
-                for query in generated_queries
-            ]
+        # 所有查询合并为一次嵌入请求，每个集合一次批量检索
+        k = self._budget_k(k, deadline)
+        ranked_lists = self._search_batch(
+            generated_queries, collections, filter_setting, k, deadline=deadline
+        )
 
-            hits = [
-                task.result() for task in concurrent.futures.as_completed(search_tasks)
-            ]   # 等待所有线程
-            hits = app.utils.flatten(hits)
+        # 按 (集合, point id) 去重并做 RRF 融合，只保留排名靠前的唯一文本块送去重排
+        hits = reciprocal_rank_fusion(
+            ranked_lists, k=settings.RAG_FUSION_K, top_n=settings.RERANK_CANDIDATES
+        )
 
-        logger.info("成功检索到所有文档。", num_documents=len(hits))
+        logger.info(
+            "成功检索到所有文档。",
+            num_documents=sum(len(points) for _, points in ranked_lists),
+            num_unique=len(hits),
+        )
 
         return hits
 
-    def rerank(self, hits: list, keep_top_k: int) -> list[str]:
-        content_list = [hit.payload["content"] for hit in hits]
-        rerank_hits = self._reranker.generate_response(
-            query=self.query, passages=content_list, keep_top_k=keep_top_k
+    def retrieve_top_k_pipelined(self,
+                                 k: int,
+                                 collections: list[str],
+                                 filter_setting: dict | None = None,
+                                 to_expand_to_n_queries: int = 3,
+                                 expansion_deadline: float | None = None,
+                                 deadline: Deadline | None = None) -> list:
+        """
+        流水线检索：原始查询立即检索，同时在后台做查询扩展
+
+        扩展结果在截止时间内返回时，对新增查询再做一次批量检索并参与融合；
+        超时或出错则只使用原始查询的结果，首个上下文的耗时约等于一次向量检索。
+
+        Args:
+            expansion_deadline: 从调用开始计算的扩展等待上限（秒），默认取 RAG_EXPANSION_DEADLINE
+            deadline: 请求的时间预算，扩展等待时间同时受其 expansion 阶段份额限制
+        """
+        started = time.monotonic()
+        wait_limit = settings.RAG_EXPANSION_DEADLINE if expansion_deadline is None else expansion_deadline
+        expansion = _expansion_executor.submit(
+            self._query_expander.generate_response, self.query, to_expand_to_n_queries
+        )
+
+        k = self._budget_k(k, deadline)
+        ranked_lists = self._search_batch(
+            [self.query], collections, filter_setting, k, deadline=deadline
+        )
+
+        timeout = max(0.0, wait_limit - (time.monotonic() - started))
+        if deadline is not None:
+            timeout = min(timeout, deadline.stage_timeout("expansion"))
+        generated_queries = self._await_expansion(expansion, timeout, deadline)
+
+        original = normalize_text(self.query)
+        extra_queries = [query for query in generated_queries if normalize_text(query) != original]
+        if extra_queries:
+            ranked_lists += self._search_batch(
+                extra_queries, collections, filter_setting, k, deadline=deadline
+            )
+
+        hits = reciprocal_rank_fusion(
+            ranked_lists, k=settings.RAG_FUSION_K, top_n=settings.RERANK_CANDIDATES
         )
 
+        logger.info(
+            "流水线检索完成。",
+            num_expanded=len(extra_queries),
+            num_unique=len(hits),
+            elapsed=round(time.monotonic() - started, 3),
+        )
+
+        return hits
+
+    def rerank(self, hits: list, keep_top_k: int, deadline: Deadline | None = None) -> list[str]:
+        # 不同文本块可能内容相同，保持融合顺序去重
+        content_list = list(dict.fromkeys(hit.payload["content"] for hit in hits))
+
+        if deadline is None:
+            rerank_hits = self._reranker.generate_response(
+                query=self.query, passages=content_list, keep_top_k=keep_top_k
+            )
+        else:
+            # 预算不足或重排超时时跳过重排，直接使用融合排序
+            timeout = deadline.stage_timeout("rerank")
+            if timeout < settings.RAG_MIN_RERANK_SECONDS:
+                deadline.skip("rerank", "剩余时间不足")
+                return content_list[:keep_top_k]
+            try:
+                rerank_hits = self._reranker.generate_response(
+                    query=self.query, passages=content_list, keep_top_k=keep_top_k, timeout=timeout
+                )
+            except Exception as e:
+                deadline.skip("rerank", str(e))
+                return content_list[:keep_top_k]
+
         logger.info("成功重新排序文档。", num_documents=len(rerank_hits))
 
         return rerank_hits
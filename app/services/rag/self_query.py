@@ -1,28 +1,44 @@
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
+
 from app.services.llm.chain import GeneralChain
+from app.services.llm.clients import get_chat_model
 from app.services.llm.prompt_templates import SelfQueryTemplate
 from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.embedding_cache import normalize_text
+
+# None 也是有效结果（查询中没有可提取的元数据），需要与未命中区分
+_MISSING = object()
+
+_self_query_cache = TTLCache(
+    maxsize=settings.QUERY_EXPANSION_CACHE_SIZE,
+    ttl=settings.QUERY_EXPANSION_CACHE_TTL,
+    name="self_query",
+)
+
+
+@lru_cache()
+def _get_chain():
+    """进程内共享的自查询链，LLM 客户端只创建一次"""
+    model = get_chat_model(settings.Silicon_model_mini, temperature=0)
+    return GeneralChain().get_chain(
+        llm=model, output_key="metadata_filter_value", template=SelfQueryTemplate().create_template()
+    )
 
 
 class SelfQuery:
     @staticmethod
     def generate_response(query: str) -> str | None:
-        prompt = SelfQueryTemplate().create_template()
-        model = ChatOpenAI(
-            model=settings.Silicon_model_mini,
-            openai_api_key=settings.Silicon_api_key1,
-            openai_api_base=settings.Silicon_base_url,
-            temperature=0
-        )
-
-        chain = GeneralChain().get_chain(
-            llm=model, output_key="metadata_filter_value", template=prompt
-        )
-
-        response = chain.invoke({"question": query})
+        cache_key = normalize_text(query)
+        cached = _self_query_cache.get(cache_key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        response = _get_chain().invoke({"question": query})
         result = response.get("metadata_filter_value", "none")
 
         if result.lower() == "none":
-            return None
+            result = None
 
+        _self_query_cache.set(cache_key, result)
         return result
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/20 10:15
+# @Author  : Galleons
+# @File    : semantic_cache.py
+
+"""
+知识库问答的语义缓存
+
+学生对同一知识库提出的问题往往只是措辞不同。这里按 (命名空间, 集合组合) 保存历史查询向量和结果，
+新查询与历史查询的余弦相似度超过阈值时直接返回缓存结果，省去查询扩展、检索、重排和 LLM 生成。
+
+失效策略：每条缓存记录保存写入时集合的指纹（知识库版本标记 + 点数，租户模式下为该知识库分区的点数），
+指纹变化后旧记录不再命中；另有 TTL 兜底。
+- 版本标记由知识库写入路径（QdrantVectorDataSink）在每次写入后更新，原地更新、删除后插入同样数量的文本块也能感知
+- 点数兜底不经过写入路径的修改（如手工删除）
+指纹本身缓存 fingerprint_ttl 秒，写入后最多这么久旧答案仍可能命中。
+
+内存上限：最多保存 max_buckets 个 (命名空间, 集合组合)，超出后淘汰最久未使用的组合；
+每个组合最多 max_entries 条记录，超出后淘汰最久未命中的记录。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.embedding_cache import normalize_text
+from app.utils.logging import get_logger
+from app.utils.monitoring import SEMANTIC_CACHE_REQUESTS
+
+logger = get_logger(__name__)
+
+
+class _Bucket:
+    """同一 (命名空间, 集合组合) 下的缓存记录，向量按行存放在一个矩阵中"""
+
+    def __init__(self, dim: int):
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.entries: List[Tuple[Any, Tuple, float]] = []  # (结果, 指纹, 过期时间)
+        self.last_used = np.empty(0, dtype=np.float64)  # 写入或最近一次命中的时间
+
+    def remove(self, rows: Sequence[int]) -> None:
+        drop = set(rows)
+        keep = [row for row in range(len(self.entries)) if row not in drop]
+        self.vectors = self.vectors[keep]
+        self.entries = [self.entries[row] for row in keep]
+        self.last_used = self.last_used[keep]
+
+
+class SemanticCache:
+    def __init__(
+            self,
+            embed_fn: Callable[[str], Sequence[float]],
+            fingerprint_fn: Callable[[str], Any],
+            threshold: float = 0.95,
+            max_entries: int = 2000,
+            max_buckets: int = 256,
+            ttl: float = 24 * 3600,
+            fingerprint_ttl: float = 10.0,
+    ):
+        """
+        Args:
+            embed_fn: 查询文本 -> 向量
+            fingerprint_fn: 集合名 -> 集合当前状态的指纹
+            threshold: 命中所需的最低余弦相似度
+            max_entries: 每个 (命名空间, 集合组合) 最多保存的记录数，超出后淘汰最久未命中的记录
+            max_buckets: 最多保存的 (命名空间, 集合组合) 数，超出后淘汰最久未使用的组合
+            ttl: 记录有效期（秒）
+            fingerprint_ttl: 集合指纹的缓存时间（秒），避免每次查询都访问 Qdrant
+        """
+        self.embed_fn = embed_fn
+        self.fingerprint_fn = fingerprint_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_buckets = max_buckets
+        self.ttl = ttl
+        self._fingerprints = TTLCache(maxsize=1024, ttl=fingerprint_ttl, name="semantic_cache_fingerprint")
+        self._buckets: "OrderedDict[Tuple[str, Tuple[str, ...]], _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fingerprint(self, collections: Tuple[str, ...]) -> Tuple:
+        result = []
+        for collection in collections:
+            fingerprint = self._fingerprints.get(collection)
+            if fingerprint is None:
+                fingerprint = self.fingerprint_fn(collection)
+                self._fingerprints.set(collection, fingerprint)
+            result.append(fingerprint)
+        return tuple(result)
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(normalize_text(query)), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, query: str, collections: Sequence[str], namespace: str = "default") -> Optional[Any]:
+        """查找语义相近的历史结果，未命中返回 None"""
+        key = (namespace, tuple(sorted(collections)))
+        with self._lock:
+            if key not in self._buckets or not self._buckets[key].entries:  # 冷启动时省去一次嵌入
+                SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+
+        vector = self._embed(query)
+        fingerprint = self._fingerprint(key[1])
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or not bucket.entries:
+                SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+
+            stale = [
+                row for row, (_, entry_fingerprint, expires_at) in enumerate(bucket.entries)
+                if entry_fingerprint != fingerprint or expires_at <= now
+            ]
+            if stale:
+                bucket.remove(stale)
+                SEMANTIC_CACHE_REQUESTS.labels(result="stale").inc(len(stale))
+            if not bucket.entries:
+                SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+
+            similarities = bucket.vectors @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+            value = bucket.entries[best][0]
+            bucket.last_used[best] = now
+            self._buckets.move_to_end(key)
+
+        SEMANTIC_CACHE_REQUESTS.labels(result="hit").inc()
+        logger.info("语义缓存命中。", namespace=namespace, similarity=float(similarities[best]))
+        return value
+
+    def set(self, query: str, collections: Sequence[str], value: Any, namespace: str = "default") -> None:
+        key = (namespace, tuple(sorted(collections)))
+        vector = self._embed(query)
+        fingerprint = self._fingerprint(key[1])
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(vector.shape[0])
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+            bucket.vectors = np.vstack([bucket.vectors, vector[None, :]])
+            bucket.entries.append((value, fingerprint, now + self.ttl))
+            bucket.last_used = np.append(bucket.last_used, now)
+            if len(bucket.entries) > self.max_entries:
+                # argsort 稳定，同一时间写入的记录先淘汰较早的
+                bucket.remove(np.argsort(bucket.last_used, kind="stable")[:len(bucket.entries) - self.max_entries].tolist())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+        self._fingerprints.clear()
+
+
+def _embed_query(query: str) -> List[float]:
+    from app.utils.embeddings import embed_texts
+
+    # 与检索使用同一模型，原始查询的向量随后可直接命中嵌入缓存
+    return embed_texts([query], model=settings.EMBEDDING_MODEL_ID)[0]
+
+
+def _collection_fingerprint(collection: str) -> Any:
+    from app.db.knowledge_base import resolve_kb_targets
+    from app.db.qdran import QdrantDatabaseConnector
+
+    connector = QdrantDatabaseConnector()
+    # 租户模式下知识库是共享集合中的一个分区，按租户过滤计数
+    (collection_name, query_filter, _), = resolve_kb_targets([collection])
+    if query_filter is not None:
+        points_count = connector.count(collection_name, query_filter)
+    else:
+        points_count = connector.get_collection(collection_name).points_count
+    return connector.kb_version(collection), points_count
+
+
+@lru_cache()
+def get_semantic_cache() -> SemanticCache:
+    """进程内共享的语义缓存"""
+    return SemanticCache(
+        embed_fn=_embed_query,
+        fingerprint_fn=_collection_fingerprint,
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        max_buckets=settings.SEMANTIC_CACHE_MAX_BUCKETS,
+        ttl=settings.SEMANTIC_CACHE_TTL,
+    )
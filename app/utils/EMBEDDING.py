@@ -7,12 +7,14 @@
 这里是文件说明
 """
 from typing import List, Dict, Union, Optional, Tuple
+import inspect
 import logging
 from functools import lru_cache
 from FlagEmbedding import BGEM3FlagModel
 import torch
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import time
 
 # 配置日志
@@ -28,6 +30,21 @@ class EmbeddingServiceError(Exception):
     pass
 
 
+def flag_device_kwargs(model_cls, device: Optional[str]) -> dict:
+    """
+    FlagEmbedding 各版本指定设备的参数名不同：1.2.x 为 device，1.3 起为 devices（并接受 **kwargs，传错名会被静默忽略）
+
+    按构造函数签名选择参数名，device 为 None 或构造函数不支持时不传，由 FlagEmbedding 自动选择设备
+    """
+    if device is None:
+        return {}
+    parameters = inspect.signature(model_cls.__init__).parameters
+    for name in ("devices", "device"):
+        if name in parameters:
+            return {name: device}
+    return {}
+
+
 class BGEM3EmbeddingService:
     def __init__(
             self,
@@ -35,20 +52,26 @@ class BGEM3EmbeddingService:
             use_fp16: bool = True,
             max_workers: int = 4,
             cache_size: int = 1024,
-            batch_size: int = 32
+            batch_size: int = 32,
+            devices: Optional[str] = None,
+            quantize: bool = False
     ):
         """
         初始化 BGE M3 嵌入服务
 
         Args:
             model_name: 模型名称或路径
-            use_fp16: 是否使用半精度
+            use_fp16: 是否使用半精度（CPU上应关闭）
             max_workers: 最大线程数
             cache_size: LRU缓存大小
             batch_size: 批处理大小
+            devices: 运行设备，例如 "cpu"，None 时自动选择
+            quantize: 是否对线性层做 int8 动态量化（仅CPU）
         """
         try:
-            self.model = BGEM3FlagModel(model_name, use_fp16=use_fp16)
+            self.model = BGEM3FlagModel(model_name, use_fp16=use_fp16, **flag_device_kwargs(BGEM3FlagModel, devices))
+            if quantize:
+                self._quantize()
             self.executor = ThreadPoolExecutor(max_workers=max_workers)
             self.batch_size = batch_size
             logger.info(f"Successfully initialized BGE M3 model: {model_name}")
@@ -56,6 +79,51 @@ class BGEM3EmbeddingService:
             logger.error(f"Failed to initialize model: {str(e)}")
             raise EmbeddingServiceError(f"Model initialization failed: {str(e)}")
 
+    def _quantize(self) -> None:
+        """对底层 transformer 的线性层做 int8 动态量化，CPU 推理提速约 2 倍"""
+        module = getattr(self.model, "model", None)
+        if not isinstance(module, torch.nn.Module):
+            logger.warning("模型结构不支持动态量化，跳过")
+            return
+        self.model.model = torch.quantization.quantize_dynamic(
+            module, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        logger.info("已启用 int8 动态量化")
+
+    def encode_dense(self, texts: List[str]) -> List[List[float]]:
+        """
+        仅计算稠密向量，供嵌入后端使用
+
+        Args:
+            texts: 输入文本列表
+
+        Returns:
+            与输入顺序一致的稠密向量列表
+        """
+        outputs = self.get_embedding(texts, return_dense=True, return_sparse=False)
+        return [np.asarray(output['dense_vecs'], dtype=np.float32).tolist() for output in outputs]
+
+    def encode_sparse(self, texts: List[str]) -> List[Dict[str, float]]:
+        """
+        仅计算词法权重（lexical_weights），用于稀疏向量检索
+
+        Args:
+            texts: 输入文本列表
+
+        Returns:
+            每条文本的 {token_id: 权重} 字典
+        """
+        outputs = self.get_embedding(texts, return_dense=False, return_sparse=True)
+        return [
+            {str(token_id): float(weight) for token_id, weight in output['lexical_weights'].items()}
+            for output in outputs
+        ]
+
+    async def aencode_dense(self, texts: List[str]) -> List[List[float]]:
+        """在服务自带的线程池中计算稠密向量，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.encode_dense, texts)
+
     @lru_cache(maxsize=1024)
     def _get_cached_embedding(self, text: str) -> dict:
         """
@@ -155,18 +223,15 @@ class BGEM3EmbeddingService:
         processed_outputs = []
 
         if isinstance(batch_output, dict):
-            num_samples = len(batch_output.get('dense_vecs', [])) if 'dense_vecs' in batch_output else len(
-                batch_output.get('lexical_weights', []))
+            # FlagEmbedding 总是返回全部三个键，未请求的值为 None
+            keys = [
+                key for key in ('dense_vecs', 'lexical_weights', 'colbert_vecs')
+                if batch_output.get(key) is not None
+            ]
+            num_samples = len(batch_output[keys[0]]) if keys else 0
 
             for i in range(num_samples):
-                sample_output = {}
-                if 'dense_vecs' in batch_output:
-                    sample_output['dense_vecs'] = batch_output['dense_vecs'][i]
-                if 'lexical_weights' in batch_output:
-                    sample_output['lexical_weights'] = batch_output['lexical_weights'][i]
-                if 'colbert_vecs' in batch_output:
-                    sample_output['colbert_vecs'] = batch_output['colbert_vecs'][i]
-                processed_outputs.append(sample_output)
+                processed_outputs.append({key: batch_output[key][i] for key in keys})
 
         return processed_outputs
 
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/17 15:20
+# @Author  : Galleons
+# @File    : cache.py
+
+"""
+进程内带过期时间的 LRU 缓存
+
+用于缓存 LLM 调用等结果相对稳定、但不应永久保留的数据（查询扩展、自查询等）。
+条目超过 ttl 秒即视为失效，容量超过 maxsize 时淘汰最近最少使用的条目。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from app.utils.monitoring import TTL_CACHE_REQUESTS
+
+
+class TTLCache:
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            ttl: float = 3600.0,
+            name: str = "default",
+            timer: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            maxsize: 最多保存的条目数
+            ttl: 条目有效期（秒）
+            name: 缓存名称，用作监控指标标签
+            timer: 时钟函数，测试时可替换
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._timer = timer
+        self._data: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] <= self._timer():
+                del self._data[key]
+                item = None
+            if item is None:
+                TTL_CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+                return default
+            self._data.move_to_end(key)
+        TTL_CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = self._timer() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/14 15:20
+# @Author  : Galleons
+# @File    : circuit_breaker.py
+
+"""
+熔断器
+
+closed    正常放行
+open      连续失败达到阈值后熔断，冷却期内不再放行
+half_open 冷却结束后只放行一个探测请求，成功则恢复，失败则重新熔断；
+          探测请求被取消等未得出结果时调用方须调用 release_probe() 归还探测名额，否则节点会一直被拒绝
+"""
+
+import threading
+import time
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            recovery_timeout: 熔断后多久允许发送探测请求（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._cooled_down():
+                return self.HALF_OPEN
+            return self._state
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.recovery_timeout
+
+    def allow_request(self) -> bool:
+        """是否允许发送请求；半开状态下同一时间只放行一个探测请求"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._cooled_down():
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """探测请求没有得出结果（如被取消、超时中止）时归还探测名额，下一个请求可以重新探测"""
+        with self._lock:
+            self._probing = False
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/23 10:20
+# @Author  : Galleons
+# @File    : concurrency.py
+
+"""
+同时被线程和协程使用的并发限制器
+
+同步调用（线程池中的查询扩展、LangChain invoke）与异步调用（流式接口）共用同一个额度，
+按到达顺序排队，排队时间和在途请求数记录到监控指标中。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Union
+
+from app.utils.monitoring import CONCURRENCY_IN_FLIGHT, CONCURRENCY_QUEUE_WAIT
+
+_Waiter = Union[threading.Event, asyncio.Future]
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int, name: str = "default"):
+        """
+        Args:
+            limit: 最多同时在途的请求数
+            name: 限制器名称，用作监控指标标签
+        """
+        if limit < 1:
+            raise ValueError("limit 必须大于 0")
+        self.limit = limit
+        self.name = name
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters: Deque[_Waiter] = deque()
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _try_acquire(self) -> bool:
+        """在持有锁时调用；有空闲额度且没有人排队时直接占用"""
+        if self._in_use < self.limit and not self._waiters:
+            self._in_use += 1
+            return True
+        return False
+
+    def _acquired(self, started: float) -> None:
+        CONCURRENCY_QUEUE_WAIT.labels(limiter=self.name).observe(time.perf_counter() - started)
+        CONCURRENCY_IN_FLIGHT.labels(limiter=self.name).inc()
+
+    def acquire(self) -> None:
+        started = time.perf_counter()
+        with self._lock:
+            waiter = None if self._try_acquire() else threading.Event()
+            if waiter is not None:
+                self._waiters.append(waiter)
+        if waiter is not None:
+            waiter.wait()
+        self._acquired(started)
+
+    async def aacquire(self) -> None:
+        started = time.perf_counter()
+        with self._lock:
+            waiter = None if self._try_acquire() else asyncio.get_running_loop().create_future()
+            if waiter is not None:
+                self._waiters.append(waiter)
+        if waiter is not None:
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._waiters.remove(waiter)
+                        granted = False
+                    except ValueError:
+                        granted = True
+                # 额度已交给这个协程：结果已设置时由这里归还，否则由 _wake 发现取消后归还
+                if granted and waiter.done() and not waiter.cancelled():
+                    self._release()
+                raise
+        self._acquired(started)
+
+    def _wake(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            self._release()
+        else:
+            waiter.set_result(None)
+
+    def _release(self) -> None:
+        """把额度直接交给队首的等待者，没有等待者时归还"""
+        with self._lock:
+            if not self._waiters:
+                self._in_use -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            waiter.get_loop().call_soon_threadsafe(self._wake, waiter)
+
+    def release(self) -> None:
+        CONCURRENCY_IN_FLIGHT.labels(limiter=self.name).dec()
+        self._release()
+
+    @contextmanager
+    def hold(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def ahold(self):
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/13 10:21
+# @Author  : Galleons
+# @File    : embedding_batcher.py
+
+"""
+嵌入请求微批处理
+
+在很短的时间窗口内收集并发的 vectorize 调用，合并为一次批量嵌入请求，
+再把结果分发回各个调用方的 future。
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EmbedBatchFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class EmbeddingBatcher:
+    """
+    嵌入请求合并器
+
+    - 第一个请求到达后最多等待 max_wait_ms 毫秒，或凑满 max_batch_size 条即发送
+    - 同一批次内重复的文本只嵌入一次
+    - 批次发送在后台任务中进行，不阻塞下一批次的收集
+    """
+
+    def __init__(
+            self,
+            embed_batch: EmbedBatchFn,
+            max_batch_size: int = 32,
+            max_wait_ms: float = 5.0,
+    ):
+        """
+        Args:
+            embed_batch: 批量嵌入函数，输入文本列表，按相同顺序返回向量列表
+            max_batch_size: 单批次最大文本数
+            max_wait_ms: 收集批次的最长等待时间（毫秒）
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size 必须大于0")
+
+        self._embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str) -> List[float]:
+        """提交单条文本，等待所在批次完成后返回其向量"""
+        loop = self._ensure_worker()
+        future = loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    def _ensure_worker(self) -> asyncio.AbstractEventLoop:
+        """在当前事件循环中启动（或重启）批次收集任务"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+        return loop
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = loop.create_task(self._flush(batch))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        pending = [(text, future) for text, future in batch if not future.done()]
+        if not pending:
+            return
+
+        unique_texts = list(dict.fromkeys(text for text, _ in pending))
+        try:
+            embeddings = await self._embed_batch(unique_texts)
+            if len(embeddings) != len(unique_texts):
+                raise ValueError(
+                    f"批量嵌入返回数量不匹配: 期望 {len(unique_texts)}, 实际 {len(embeddings)}"
+                )
+        except Exception as e:
+            logger.error(f"批量嵌入失败, batch_size={len(unique_texts)}: {str(e)}")
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        vectors = dict(zip(unique_texts, embeddings))
+        for text, future in pending:
+            if not future.done():
+                future.set_result(vectors[text])
+
+        logger.debug(f"合并嵌入请求: {len(pending)} 个调用 -> {len(unique_texts)} 条文本")
+
+    async def close(self) -> None:
+        """停止收集任务并等待已发出的批次完成"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/13 16:02
+# @Author  : Galleons
+# @File    : embedding_cache.py
+
+"""
+内容寻址的两级嵌入缓存
+
+- 一级：进程内 LRU，保存 float32 向量
+- 二级：磁盘缓存（diskcache，SQLite + mmap），重启后保留，可被多个 uvicorn worker 共享
+
+async 调用方使用 aget_many / aset_many，磁盘层的读写在线程池中完成，不阻塞事件循环。
+
+缓存键由 (模型ID, 归一化文本的哈希) 组成，同一文本在不同模型下互不干扰。
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from diskcache import Cache
+
+from app.config import settings
+from app.utils.monitoring import EMBEDDING_CACHE_REQUESTS, EMBEDDING_CACHE_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """统一全半角并压缩空白，使等价文本得到相同的缓存键"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class EmbeddingCache:
+    def __init__(
+            self,
+            memory_size: int = 10000,
+            directory: Optional[str] = None,
+            disk_size_limit: int = 2 ** 30,
+            mmap_size: int = 2 ** 28,
+    ):
+        """
+        Args:
+            memory_size: 进程内 LRU 最多保存的向量条数
+            directory: 磁盘缓存目录，为 None 时仅使用进程内缓存
+            disk_size_limit: 磁盘缓存容量上限（字节），超出后按最近最少使用淘汰
+            mmap_size: SQLite 内存映射大小（字节）
+        """
+        self.memory_size = memory_size
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._disk: Optional[Cache] = None
+        if directory:
+            self._disk = Cache(
+                directory,
+                size_limit=disk_size_limit,
+                eviction_policy="least-recently-used",
+                sqlite_mmap_size=mmap_size,
+            )
+
+    @staticmethod
+    def make_key(model_id: str, text: str) -> str:
+        digest = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{model_id}:{digest}"
+
+    def _get_memory(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+        EMBEDDING_CACHE_REQUESTS.labels(tier="memory", result="hit" if vector is not None else "miss").inc()
+        return vector
+
+    def _get_disk(self, key: str) -> Optional[np.ndarray]:
+        if self._disk is not None:
+            try:
+                raw = self._disk.get(key)
+            except Exception as e:
+                logger.warning(f"读取磁盘嵌入缓存失败: {str(e)}")
+                raw = None
+            if raw is not None:
+                vector = np.frombuffer(raw, dtype=np.float32)
+                self._remember(key, vector)
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                EMBEDDING_CACHE_REQUESTS.labels(tier="disk", result="hit").inc()
+                return vector
+            EMBEDDING_CACHE_REQUESTS.labels(tier="disk", result="miss").inc()
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _set_disk(self, items: Sequence[tuple]) -> None:
+        if self._disk is None:
+            return
+        for key, vector in items:
+            try:
+                self._disk.set(key, vector.tobytes())
+            except Exception as e:
+                logger.warning(f"写入磁盘嵌入缓存失败: {str(e)}")
+
+    def _prepare(self, model_id: str, text: str, embedding: Sequence[float]) -> tuple:
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        return self.make_key(model_id, text), vector
+
+    def get(self, model_id: str, text: str) -> Optional[np.ndarray]:
+        """查询缓存，未命中时返回 None"""
+        key = self.make_key(model_id, text)
+        vector = self._get_memory(key)
+        return vector if vector is not None else self._get_disk(key)
+
+    def set(self, model_id: str, text: str, embedding: Sequence[float]) -> np.ndarray:
+        """写入两级缓存，返回 float32 向量"""
+        key, vector = self._prepare(model_id, text, embedding)
+        self._remember(key, vector)
+        self._set_disk([(key, vector)])
+        return vector
+
+    def get_many(self, model_id: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        return [self.get(model_id, text) for text in texts]
+
+    def set_many(self, model_id: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        for text, embedding in zip(texts, embeddings):
+            self.set(model_id, text, embedding)
+
+    async def aget_many(self, keys: Sequence[tuple]) -> List[Optional[np.ndarray]]:
+        """
+        异步批量查询，keys 为 (模型ID, 文本) 列表
+
+        内存层在事件循环中直接查询，内存未命中的键一次交给线程池读取磁盘层，SQLite I/O 不阻塞事件循环。
+        """
+        cache_keys = [self.make_key(model_id, text) for model_id, text in keys]
+        vectors = [self._get_memory(key) for key in cache_keys]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            found = await asyncio.to_thread(lambda: [self._get_disk(cache_keys[i]) for i in misses])
+            for i, vector in zip(misses, found):
+                vectors[i] = vector
+        return vectors
+
+    async def aset_many(self, keys: Sequence[tuple], embeddings: Sequence[Sequence[float]]) -> List[np.ndarray]:
+        """异步批量写入：立即写入内存层，磁盘层在线程池中写入"""
+        items = [self._prepare(model_id, text, embedding) for (model_id, text), embedding in zip(keys, embeddings)]
+        for key, vector in items:
+            self._remember(key, vector)
+        if self._disk is not None and items:
+            await asyncio.to_thread(self._set_disk, items)
+        return [vector for _, vector in items]
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        evicted = 0
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+                evicted += 1
+            self._stats["evictions"] += evicted
+        if evicted:
+            EMBEDDING_CACHE_EVICTIONS.inc(evicted)
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中率统计以及两级缓存的当前容量"""
+        with self._lock:
+            stats = dict(self._stats, memory_items=len(self._memory))
+        if self._disk is not None:
+            stats["disk_items"] = len(self._disk)
+            stats["disk_bytes"] = self._disk.volume()
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+
+
+@lru_cache()
+def get_embedding_cache() -> EmbeddingCache:
+    """获取进程内共享的嵌入缓存实例"""
+    return EmbeddingCache(
+        memory_size=settings.EMBEDDING_CACHE_MEMORY_SIZE,
+        directory=settings.EMBEDDING_CACHE_DIR if settings.EMBEDDING_CACHE_DISK_ENABLED else None,
+        disk_size_limit=settings.EMBEDDING_CACHE_DISK_SIZE_LIMIT,
+    )
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/14 09:47
+# @Author  : Galleons
+# @File    : embedding_client.py
+
+"""
+Xinference 嵌入接口的 HTTP 客户端
+
+xinference.client 的模型句柄是同步调用，在 async 接口里直接使用会阻塞事件循环。
+这里直接请求 Xinference 的 OpenAI 兼容接口 /v1/embeddings：
+- 异步调用使用 httpx.AsyncClient，同步调用（导入脚本、线程池）使用 httpx.Client
+- 两者都复用 keep-alive 连接池
+- 每次调用可单独指定超时，并通过信号量限制同时在途的请求数
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class XinferenceEmbeddingClient:
+    def __init__(
+            self,
+            base_url: str,
+            timeout: float = 10.0,
+            max_connections: int = 20,
+            max_concurrency: int = 8,
+    ):
+        """
+        Args:
+            base_url: Xinference 服务地址，例如 http://192.168.100.111:9997
+            timeout: 默认请求超时（秒）
+            max_connections: 连接池最大连接数
+            max_concurrency: 同时在途的嵌入请求上限
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url, limits=self._limits, timeout=self.timeout
+            )
+        return self._async_client
+
+    def _get_sync_client(self) -> httpx.Client:
+        if self._sync_client is None or self._sync_client.is_closed:
+            self._sync_client = httpx.Client(
+                base_url=self.base_url, limits=self._limits, timeout=self.timeout
+            )
+        return self._sync_client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def embed(self, texts: List[str], model: str, timeout: Optional[float] = None) -> List[List[float]]:
+        """
+        异步批量嵌入
+
+        Args:
+            texts: 文本列表
+            model: Xinference 中的模型 UID
+            timeout: 本次调用的超时（秒），为 None 时使用默认值
+
+        Returns:
+            与输入顺序一致的向量列表
+        """
+        async with self._get_semaphore():
+            response = await self._get_async_client().post(
+                "/v1/embeddings",
+                json={"model": model, "input": texts},
+                timeout=timeout if timeout is not None else self.timeout,
+            )
+        response.raise_for_status()
+        return self._parse(response.json(), len(texts))
+
+    def embed_sync(self, texts: List[str], model: str, timeout: Optional[float] = None) -> List[List[float]]:
+        """同步批量嵌入，供导入脚本和线程池中的调用方使用"""
+        with self._sync_semaphore:
+            response = self._get_sync_client().post(
+                "/v1/embeddings",
+                json={"model": model, "input": texts},
+                timeout=timeout if timeout is not None else self.timeout,
+            )
+        response.raise_for_status()
+        return self._parse(response.json(), len(texts))
+
+    @staticmethod
+    def _parse(result: Dict[str, Any], expected: int) -> List[List[float]]:
+        if not result or not result.get("data") or len(result["data"]) != expected:
+            raise ValueError("Invalid embedding result")
+        data = sorted(result["data"], key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in data]
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+        if self._sync_client is not None:
+            self._sync_client.close()
+
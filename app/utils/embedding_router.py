@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/14 16:05
+# @Author  : Galleons
+# @File    : embedding_router.py
+
+"""
+多节点嵌入路由
+
+把配置中的每个 Xinference 节点当作同一嵌入服务的副本：
+- 每个批次发往在途请求数最少的健康节点
+- 节点连续失败后由熔断器摘除，冷却结束后放行的第一个请求作为探测，成功即恢复路由
+- 请求失败时自动切换到下一个节点
+在线接口（vectorize）和离线导入脚本共用同一个路由。
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+from app.config import settings
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.embedding_client import XinferenceEmbeddingClient
+from app.utils.monitoring import EMBEDDING_BACKEND_IN_FLIGHT, EMBEDDING_BACKEND_FAILURES
+
+logger = logging.getLogger(__name__)
+
+
+class NoHealthyBackendError(Exception):
+    """所有嵌入节点均不可用"""
+    pass
+
+
+class EmbeddingBackend:
+    def __init__(self, client: XinferenceEmbeddingClient, breaker: CircuitBreaker):
+        self.client = client
+        self.breaker = breaker
+        self.in_flight = 0
+
+    @property
+    def name(self) -> str:
+        return self.client.base_url
+
+
+class EmbeddingRouter:
+    def __init__(self, backends: List[EmbeddingBackend]):
+        if not backends:
+            raise ValueError("至少需要配置一个嵌入节点")
+        self.backends = backends
+        self._lock = threading.Lock()
+
+    def _acquire(self, tried: set) -> Optional[EmbeddingBackend]:
+        """选出在途请求最少且熔断器放行的节点，并计入在途数"""
+        with self._lock:
+            candidates = sorted(
+                (backend for backend in self.backends if backend.name not in tried),
+                key=lambda backend: backend.in_flight,
+            )
+            for backend in candidates:
+                if backend.breaker.allow_request():
+                    backend.in_flight += 1
+                    EMBEDDING_BACKEND_IN_FLIGHT.labels(backend=backend.name).set(backend.in_flight)
+                    return backend
+        return None
+
+    def _release(self, backend: EmbeddingBackend) -> None:
+        with self._lock:
+            backend.in_flight -= 1
+            EMBEDDING_BACKEND_IN_FLIGHT.labels(backend=backend.name).set(backend.in_flight)
+
+    def _on_failure(self, backend: EmbeddingBackend, error: Exception) -> None:
+        backend.breaker.record_failure()
+        EMBEDDING_BACKEND_FAILURES.labels(backend=backend.name).inc()
+        logger.warning(f"嵌入节点 {backend.name} 请求失败, 切换节点: {str(error)}")
+
+    async def embed(self, texts: List[str], model: str, timeout: Optional[float] = None) -> List[List[float]]:
+        """异步批量嵌入，失败时依次切换到其余健康节点"""
+        tried: set = set()
+        last_error: Optional[Exception] = None
+        while (backend := self._acquire(tried)) is not None:
+            tried.add(backend.name)
+            try:
+                result = await backend.client.embed(texts, model, timeout=timeout)
+            except Exception as e:
+                self._on_failure(backend, e)
+                last_error = e
+                continue
+            except BaseException:
+                # 请求被取消，结果未知，不计为失败，但要归还半开状态的探测名额
+                backend.breaker.release_probe()
+                raise
+            finally:
+                self._release(backend)
+            backend.breaker.record_success()
+            return result
+        raise NoHealthyBackendError(f"没有可用的嵌入节点: {str(last_error)}") from last_error
+
+    def embed_sync(self, texts: List[str], model: str, timeout: Optional[float] = None) -> List[List[float]]:
+        """同步批量嵌入，供导入脚本使用"""
+        tried: set = set()
+        last_error: Optional[Exception] = None
+        while (backend := self._acquire(tried)) is not None:
+            tried.add(backend.name)
+            try:
+                result = backend.client.embed_sync(texts, model, timeout=timeout)
+            except Exception as e:
+                self._on_failure(backend, e)
+                last_error = e
+                continue
+            except BaseException:
+                # 请求被取消，结果未知，不计为失败，但要归还半开状态的探测名额
+                backend.breaker.release_probe()
+                raise
+            finally:
+                self._release(backend)
+            backend.breaker.record_success()
+            return result
+        raise NoHealthyBackendError(f"没有可用的嵌入节点: {str(last_error)}") from last_error
+
+    def status(self) -> List[dict]:
+        return [
+            {"backend": backend.name, "state": backend.breaker.state, "in_flight": backend.in_flight}
+            for backend in self.backends
+        ]
+
+
+@lru_cache()
+def get_embedding_router() -> EmbeddingRouter:
+    """根据配置的 Xinference 节点构建进程内共享的嵌入路由"""
+    return EmbeddingRouter([
+        EmbeddingBackend(
+            client=XinferenceEmbeddingClient(
+                base_url=endpoint,
+                timeout=settings.EMBEDDING_HTTP_TIMEOUT,
+                max_connections=settings.EMBEDDING_HTTP_MAX_CONNECTIONS,
+                max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+            ),
+            breaker=CircuitBreaker(
+                failure_threshold=settings.EMBEDDING_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.EMBEDDING_BREAKER_RECOVERY_TIMEOUT,
+            ),
+        )
+        for endpoint in settings.XINFERENCE_ENDPOINTS
+    ])
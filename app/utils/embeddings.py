@@ -6,30 +6,39 @@
 """
 由于SentenceTransformer以及fastembed的调用都无法保证完全本地读取运行时接口，在调用时延时太长
 所以改为调用部署在111服务器上的Xinference模型端口进行嵌入
+也可以通过 EMBEDDING_BACKEND 切换为进程内 CPU 后端（见 local_embedding.py）
 """
+from functools import lru_cache
+
 from app.config import settings
+from app.utils.embedding_cache import get_embedding_cache
 
 from xinference.client import Client
 import numpy as np
 
-client = Client("http://192.168.100.111:9997")
-embed_model_raw = client.get_model(settings.EMBEDDING_MODEL_ID)
-embed_model = client.get_model(settings.EMBEDDING_MODEL_ID)
+
+@lru_cache()
+def get_xinference_model(model_id: str = settings.EMBEDDING_MODEL_ID):
+    """延迟连接 Xinference，导入本模块时不再依赖模型服务器在线"""
+    return Client(settings.XINFERENCE_ENDPOINTS[0]).get_model(model_id)
 
 #from fastembed import TextEmbedding
 #embedding_model = TextEmbedding()
 
 
 def embedd_text(text: str) -> np.ndarray:
-    embedding_list = embed_model.create_embedding(text)['data'][0]['embedding']
-    return np.array(embedding_list)
+    cache = get_embedding_cache()
+    cached = cache.get(settings.EMBEDDING_MODEL_ID, text)
+    if cached is not None:
+        return cached
+    embedding_list = get_xinference_model().create_embedding(text)['data'][0]['embedding']
+    return cache.set(settings.EMBEDDING_MODEL_ID, text, embedding_list)
     #embeddings_generator: np.ndarray = embedding_model.embed(text)
     #embeddings_text = list(embeddings_generator)[0]
     #return embeddings_text
 
 def embedd_text_tolist(text: str) -> list[int]:
-    embedding_list = embed_model.create_embedding(text)['data'][0]['embedding']
-    return embedding_list
+    return embedd_text(text).tolist()
     #embeddings_generator: np.ndarray = embedding_model.embed(text)
     #embeddings_text = list(embeddings_generator)[0]
     #return embeddings_text
@@ -41,9 +50,7 @@ def embedd_repositories(text: str):
     #sentence = text
     #instruction = "Represent the structure of the repository"
     #return model.encode([instruction, sentence])
-    embedding_list = embed_model.create_embedding(input)['data'][0]['embedding']
-    embedding_array = np.array(embedding_list)
-    return embedding_array
+    return embedd_text(text)
     #embeddings_generator: np.ndarray = embedding_model.embed(text)
     #embeddings_text = list(embeddings_generator)[0]
     #return embeddings_text
@@ -52,11 +59,14 @@ def embedd_repositories(text: str):
 from xinference.client import Client
 from tenacity import retry, stop_after_attempt, wait_exponential
 from contextlib import contextmanager
-from typing import List, Optional, Any, Coroutine
+from typing import List, Optional
+import asyncio
 import numpy as np
 import logging
-from functools import lru_cache
 from app.config import settings
+from app.utils.embedding_batcher import EmbeddingBatcher
+from app.utils.embedding_router import get_embedding_router
+from app.utils.local_embedding import get_local_embedding_backend
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -73,8 +83,8 @@ class EmbeddingClientManager:
         """获取 Xinference 客户端的上下文管理器"""
         if cls._client is None:
             try:
-                cls._client = Client("http://192.168.100.111:9997")
-                cls._embed_model = cls._client.get_model("bge-m3")
+                cls._client = Client(settings.XINFERENCE_ENDPOINTS[0])
+                cls._embed_model = cls._client.get_model(settings.EMBEDDING_MODEL_ID_PRO)
             except Exception as e:
                 logger.error(f"Failed to initialize Xinference client: {str(e)}")
                 raise
@@ -100,13 +110,71 @@ class EmbeddingClientManager:
             return False
 
 
+def _use_local(text: str, model: str) -> bool:
+    """判断文本是否交给进程内本地后端嵌入（本地后端只提供 bge-m3）"""
+    if model != settings.EMBEDDING_MODEL_ID_PRO:
+        return False
+    if settings.EMBEDDING_BACKEND == "local":
+        return True
+    return settings.EMBEDDING_BACKEND == "auto" and len(text) <= settings.EMBEDDING_LOCAL_MAX_CHARS
+
+
+def _cache_model_id(text: str, model: str) -> str:
+    return get_local_embedding_backend().model_id if _use_local(text, model) else model
+
+
+def _embed_uncached(texts: List[str], model: str, timeout: Optional[float] = None) -> List[List[float]]:
+    """按后端拆分文本后同步嵌入，结果按输入顺序返回"""
+    local = [text for text in texts if _use_local(text, model)]
+    remote = [text for text in texts if not _use_local(text, model)]
+    vectors = {}
+    if local:
+        vectors.update(zip(local, get_local_embedding_backend().embed_sync(local)))
+    if remote:
+        vectors.update(zip(remote, get_embedding_router().embed_sync(remote, model, timeout=timeout)))
+    return [vectors[text] for text in texts]
+
+
+async def _aembed_uncached(texts: List[str], model: str, timeout: Optional[float] = None) -> List[List[float]]:
+    """按后端拆分文本后并发嵌入，结果按输入顺序返回"""
+    groups, jobs = [], []
+    local = [text for text in texts if _use_local(text, model)]
+    remote = [text for text in texts if not _use_local(text, model)]
+    if local:
+        groups.append(local)
+        jobs.append(get_local_embedding_backend().embed(local))
+    if remote:
+        groups.append(remote)
+        jobs.append(get_embedding_router().embed(remote, model, timeout=timeout))
+
+    vectors = {}
+    for group, embeddings in zip(groups, await asyncio.gather(*jobs)):
+        vectors.update(zip(group, embeddings))
+    return [vectors[text] for text in texts]
+
+
+async def _embed_batch(texts: List[str]) -> List[List[float]]:
+    """短文本可走本地后端，其余经 embedding_router 发往负载最低的 Xinference 节点"""
+    return await _aembed_uncached(texts, settings.EMBEDDING_MODEL_ID_PRO)
+
+
+# 合并并发的 vectorize 调用，一个批次只发送一次嵌入请求
+embedding_batcher = EmbeddingBatcher(
+    _embed_batch,
+    max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+    max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+)
+
+
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10)
 )
 async def vectorize(text: str) -> List[float]:
     """
-    使用 Xinference 生成文本嵌入向量
+    生成文本嵌入向量（Xinference 节点或进程内本地后端，由 EMBEDDING_BACKEND 决定）
+
+    先查询两级嵌入缓存，未命中的并发调用会经由 embedding_batcher 合并为批量请求。
 
     Args:
         text: 需要生成嵌入向量的文本
@@ -120,27 +188,84 @@ async def vectorize(text: str) -> List[float]:
     if not text:
         return []
 
-    try:
-        with EmbeddingClientManager.get_client_context() as embed_model:
-            result = embed_model.create_embedding(text)
-            if not result or 'data' not in result or not result['data']:
-                raise ValueError("Invalid embedding result")
+    cache = get_embedding_cache()
+    model_id = _cache_model_id(text, settings.EMBEDDING_MODEL_ID_PRO)
+    cached = (await cache.aget_many([(model_id, text)]))[0]
+    if cached is not None:
+        return cached.tolist()
 
-            embedding = result['data'][0]['embedding']
-            return embedding
+    try:
+        embedding = await embedding_batcher.submit(text)
+        await cache.aset_many([(model_id, text)], [embedding])
+        return embedding
 
     except Exception as e:
         logger.error(f"Error generating embedding for text: {str(e)}")
         raise
 
 
-# 可选：为短文本添加缓存以提高性能
-@lru_cache(maxsize=1000)
-def get_cached_embedding(text: str) -> Coroutine[Any, Any, list[float]]:
+async def get_cached_embedding(text: str) -> List[float]:
     """
     为短文本提供缓存的嵌入向量生成
-    仅用于长度小于500字符的文本
+
+    缓存统一由 embedding_cache 负责，这里保留原接口以兼容旧调用。
+    """
+    return await vectorize(text)
+
+
+def _split_cached(model: str, texts: List[str]) -> tuple[dict, List[str]]:
+    """返回已缓存的 {文本: 向量} 以及去重后未命中的文本"""
+    cache = get_embedding_cache()
+    found = {}
+    for text in texts:
+        vector = cache.get(_cache_model_id(text, model), text)
+        if vector is not None:
+            found[text] = vector.tolist()
+    missing = list(dict.fromkeys(text for text in texts if text not in found))
+    return found, missing
+
+
+def _store(model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+    cache = get_embedding_cache()
+    for text, embedding in zip(texts, embeddings):
+        cache.set(_cache_model_id(text, model), text, embedding)
+
+
+async def _asplit_cached(model: str, texts: List[str]) -> tuple[dict, List[str]]:
+    """_split_cached 的 async 版本，磁盘层在线程池中读取"""
+    vectors = await get_embedding_cache().aget_many([(_cache_model_id(text, model), text) for text in texts])
+    found = {text: vector.tolist() for text, vector in zip(texts, vectors) if vector is not None}
+    missing = list(dict.fromkeys(text for text in texts if text not in found))
+    return found, missing
+
+
+async def _astore(model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+    await get_embedding_cache().aset_many([(_cache_model_id(text, model), text) for text in texts], embeddings)
+
+
+def embed_texts(
+        texts: List[str], model: str = settings.EMBEDDING_MODEL_ID_PRO, timeout: Optional[float] = None
+) -> List[List[float]]:
     """
-    if len(text) > 500:
-        return vectorize(text)
-    return vectorize(text)
\ No newline at end of file
+    同步批量嵌入，供导入脚本等离线场景使用
+
+    已缓存的文本直接返回，其余文本一次请求完成；timeout 只作用于远程节点。
+    """
+    found, missing = _split_cached(model, texts)
+    if missing:
+        embeddings = _embed_uncached(missing, model, timeout)
+        _store(model, missing, embeddings)
+        found.update(zip(missing, embeddings))
+    return [found[text] for text in texts]
+
+
+async def aembed_texts(
+        texts: List[str], model: str = settings.EMBEDDING_MODEL_ID_PRO, timeout: Optional[float] = None
+) -> List[List[float]]:
+    """embed_texts 的异步版本"""
+    found, missing = await _asplit_cached(model, texts)
+    if missing:
+        embeddings = await _aembed_uncached(missing, model, timeout)
+        await _astore(model, missing, embeddings)
+        found.update(zip(missing, embeddings))
+    return [found[text] for text in texts]
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/15 10:12
+# @Author  : Galleons
+# @File    : local_embedding.py
+
+"""
+进程内 CPU 嵌入后端
+
+基于 BGEM3EmbeddingService，在第一次使用时才加载模型（FlagEmbedding/torch 也延迟导入），
+接口与 EmbeddingRouter 保持一致，可以直接替换远程 Xinference 节点。
+短文本（专业、类别、城市名）走本地后端可以省去一次网络往返，
+没有模型服务器的机器也能运行完整服务。
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEmbeddingBackend:
+    def __init__(
+            self,
+            model_name: str = "BAAI/bge-m3",
+            model_id: str = "bge-m3",
+            quantize: bool = False,
+            max_workers: int = 2,
+            batch_size: int = 32,
+    ):
+        """
+        Args:
+            model_name: HuggingFace 模型名称或本地路径
+            model_id: 与远程节点一致的模型ID，用作缓存键
+            quantize: 是否启用 int8 动态量化
+            max_workers: 推理线程数
+            batch_size: 模型内部批处理大小
+        """
+        self.model_name = model_name
+        self.quantize = quantize
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        # 量化后的向量与远程节点略有差异，使用独立的缓存键
+        self.model_id = f"{model_id}-int8" if quantize else model_id
+        self._service = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._service is not None
+
+    def _get_service(self):
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    from app.utils.EMBEDDING import BGEM3EmbeddingService
+
+                    logger.info(f"加载本地嵌入模型: {self.model_name}, int8={self.quantize}")
+                    self._service = BGEM3EmbeddingService(
+                        model_name=self.model_name,
+                        use_fp16=False,
+                        max_workers=self.max_workers,
+                        batch_size=self.batch_size,
+                        devices="cpu",
+                        quantize=self.quantize,
+                    )
+        return self._service
+
+    def embed_sync(self, texts: List[str], model: Optional[str] = None, timeout: Optional[float] = None) -> List[List[float]]:
+        """同步批量嵌入；model 与 timeout 仅为兼容 EmbeddingRouter 接口"""
+        return self._get_service().encode_dense(texts)
+
+    async def embed(self, texts: List[str], model: Optional[str] = None, timeout: Optional[float] = None) -> List[List[float]]:
+        """异步批量嵌入，推理在服务线程池中执行"""
+        return await self._get_service().aencode_dense(texts)
+
+    def embed_sparse_sync(self, texts: List[str]) -> List[Dict[str, float]]:
+        """计算 BGE-M3 词法权重，供稀疏向量检索使用"""
+        return self._get_service().encode_sparse(texts)
+
+    def close(self) -> None:
+        if self._service is not None:
+            self._service.executor.shutdown()
+
+
+@lru_cache()
+def get_local_embedding_backend() -> LocalEmbeddingBackend:
+    """获取进程内共享的本地嵌入后端（模型在第一次调用时加载）"""
+    return LocalEmbeddingBackend(
+        model_name=settings.EMBEDDING_LOCAL_MODEL_NAME,
+        model_id=settings.EMBEDDING_MODEL_ID_PRO,
+        quantize=settings.EMBEDDING_LOCAL_QUANTIZE,
+        max_workers=settings.EMBEDDING_LOCAL_MAX_WORKERS,
+        batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+    )
@@ -114,4 +114,124 @@ def monitor_operation(operation_type: str, collection: str):
                     collection=collection
                 ).observe(duration)
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator 
+
+# 嵌入缓存指标
+EMBEDDING_CACHE_REQUESTS = Counter(
+    'embedding_cache_requests_total',
+    'Total number of embedding cache lookups',
+    ['tier', 'result']  # tier: memory/disk, result: hit/miss
+)
+
+EMBEDDING_CACHE_EVICTIONS = Counter(
+    'embedding_cache_evictions_total',
+    'Total number of vectors evicted from the in-process embedding cache'
+)
+
+# 嵌入节点路由指标
+EMBEDDING_BACKEND_IN_FLIGHT = Gauge(
+    'embedding_backend_in_flight',
+    'In-flight embedding requests per Xinference backend',
+    ['backend']
+)
+
+EMBEDDING_BACKEND_FAILURES = Counter(
+    'embedding_backend_failures_total',
+    'Total number of failed embedding requests per Xinference backend',
+    ['backend']
+)
+
+# 进程内 TTL 缓存指标（查询扩展、自查询等）
+TTL_CACHE_REQUESTS = Counter(
+    'ttl_cache_requests_total',
+    'Total number of in-process TTL cache lookups',
+    ['cache', 'result']  # result: hit/miss
+)
+
+# 知识库问答语义缓存指标
+SEMANTIC_CACHE_REQUESTS = Counter(
+    'semantic_cache_requests_total',
+    'Total number of semantic answer cache lookups',
+    ['result']  # result: hit/miss/stale
+)
+
+# RAG 时间预算降级指标
+RAG_STAGE_SKIPPED = Counter(
+    'rag_stage_skipped_total',
+    'Total number of RAG stages skipped or degraded to stay within the request deadline',
+    ['stage']  # stage: expansion/reduce_k/rerank
+)
+
+# LLM 等下游服务的并发限制指标（limiter 为模型名）
+CONCURRENCY_QUEUE_WAIT = Histogram(
+    'concurrency_limiter_queue_wait_seconds',
+    'Time spent waiting for a concurrency slot before calling a downstream service',
+    ['limiter'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+CONCURRENCY_IN_FLIGHT = Gauge(
+    'concurrency_limiter_in_flight',
+    'Number of requests currently holding a concurrency slot',
+    ['limiter']
+)
+
+# 本地 LLM 副本池指标
+LLM_REPLICA_IN_FLIGHT = Gauge(
+    'llm_replica_in_flight',
+    'Number of in-flight requests per local LLM replica',
+    ['replica']
+)
+
+LLM_REPLICA_FAILURES = Counter(
+    'llm_replica_failures_total',
+    'Total number of failed requests per local LLM replica',
+    ['replica']
+)
+
+# temperature=0 链的 LLM 响应缓存指标
+LLM_RESPONSE_CACHE_REQUESTS = Counter(
+    'llm_response_cache_requests_total',
+    'Total number of deterministic LLM response cache lookups',
+    ['template', 'result']  # result: hit/miss
+)
+
+# RAG 上下文 token 数
+RAG_CONTEXT_TOKENS = Histogram(
+    'rag_context_tokens',
+    'Number of context tokens packed into RAG prompts',
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000)
+)
+
+# 提示词监控导出指标
+MONITORING_EVENTS = Counter(
+    'prompt_monitoring_events_total',
+    'Total number of prompt monitoring events by outcome',
+    ['result']  # result: exported/export_error/dropped_full/dropped_closed
+)
+
+PROMPT_MONITORING_CHARS = Histogram(
+    'prompt_monitoring_chars',
+    'Length in characters of monitored prompts and outputs',
+    ['field'],  # field: prompt/output/query/response
+    buckets=(100, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+)
+
+# 字典集合内存索引指标
+VOCAB_INDEX_SIZE = Gauge(
+    'vocab_index_size',
+    'Number of entries loaded into the in-memory vocabulary index',
+    ['collection']
+)
+
+VOCAB_INDEX_REFRESHES = Counter(
+    'vocab_index_refreshes_total',
+    'Total number of vocabulary index loads and refreshes',
+    ['collection', 'result']  # result: full/incremental/unchanged/error
+)
+
+NORMALIZATION_LOOKUPS = Counter(
+    'normalization_lookups_total',
+    'Total number of dictionary normalization lookups by resolution method',
+    ['collection', 'method']  # method: exact/alias/prefix/vector
+)
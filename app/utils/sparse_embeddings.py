@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2025/1/16 09:20
+# @Author  : Galleons
+# @File    : sparse_embeddings.py
+
+"""
+稀疏向量编码
+
+为混合检索提供与稠密向量并列存储的稀疏向量：
+- bm25（默认）: fastembed 的 Qdrant/bm25，只产出词频，IDF 由 Qdrant 在服务端计算（Modifier.IDF），模型只有几 MB
+- bge-m3（需显式配置）: BGE-M3 的 lexical_weights，对中文技能词（Java、CAD）效果较好，
+  但会在 API 进程内加载完整的本地 FlagEmbedding 模型（数 GB），只适合有足够内存的部署
+模型推理是同步 CPU 计算，async 接口放到线程中执行，避免阻塞事件循环。
+开启混合检索时应用启动阶段调用 warmup() 加载模型，不在第一次查询时加载。
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from qdrant_client import models
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SparseEncoder(ABC):
+    """稀疏编码器基类，子类实现 encode_documents"""
+
+    # 写入集合配置时使用的修饰符（BM25 需要服务端 IDF）
+    modifier: Optional[models.Modifier] = None
+
+    @abstractmethod
+    def encode_documents(self, texts: List[str]) -> List[models.SparseVector]:
+        pass
+
+    def warmup(self) -> None:
+        """加载模型，应用启动时调用"""
+        self.encode_documents(["预热"])
+
+    def encode_query(self, text: str) -> models.SparseVector:
+        return self.encode_documents([text])[0]
+
+    async def aencode_documents(self, texts: List[str]) -> List[models.SparseVector]:
+        return await asyncio.to_thread(self.encode_documents, texts)
+
+    async def aencode_query(self, text: str) -> models.SparseVector:
+        return await asyncio.to_thread(self.encode_query, text)
+
+
+def weights_to_sparse(weights: Dict[str, float]) -> models.SparseVector:
+    """把 {token_id: 权重} 字典转换为 Qdrant 稀疏向量"""
+    items = sorted((int(token_id), float(weight)) for token_id, weight in weights.items() if weight > 0)
+    return models.SparseVector(
+        indices=[token_id for token_id, _ in items],
+        values=[weight for _, weight in items],
+    )
+
+
+class BGEM3SparseEncoder(SparseEncoder):
+    """基于 BGE-M3 lexical_weights 的稀疏编码，复用本地嵌入后端已加载的模型"""
+
+    def encode_documents(self, texts: List[str]) -> List[models.SparseVector]:
+        from app.utils.local_embedding import get_local_embedding_backend
+
+        weights = get_local_embedding_backend().embed_sparse_sync(texts)
+        return [weights_to_sparse(item) for item in weights]
+
+
+class BM25SparseEncoder(SparseEncoder):
+    """基于 fastembed Qdrant/bm25 的稀疏编码"""
+
+    modifier = models.Modifier.IDF
+
+    def __init__(self, model_name: str = "Qdrant/bm25"):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from fastembed import SparseTextEmbedding
+
+                    logger.info(f"加载稀疏编码模型: {self.model_name}")
+                    self._model = SparseTextEmbedding(model_name=self.model_name)
+        return self._model
+
+    @staticmethod
+    def _to_sparse(embedding) -> models.SparseVector:
+        return models.SparseVector(indices=embedding.indices.tolist(), values=embedding.values.tolist())
+
+    def encode_documents(self, texts: List[str]) -> List[models.SparseVector]:
+        return [self._to_sparse(item) for item in self._get_model().embed(texts)]
+
+    def encode_query(self, text: str) -> models.SparseVector:
+        return self._to_sparse(next(iter(self._get_model().query_embed(text))))
+
+
+@lru_cache()
+def get_sparse_encoder() -> SparseEncoder:
+    """根据配置获取进程内共享的稀疏编码器"""
+    if settings.SPARSE_ENCODER == "bm25":
+        return BM25SparseEncoder()
+    if settings.SPARSE_ENCODER != "bge-m3":
+        raise ValueError(f"不支持的稀疏编码器: {settings.SPARSE_ENCODER}")
+    return BGEM3SparseEncoder()
@@ -0,0 +1,74 @@
+import pytest
+from qdrant_client import QdrantClient, models
+
+from app.config import settings
+from app.db import hybrid_search
+
+
+class KeywordEncoder:
+    """按词表编码的稀疏编码器，用于测试"""
+    modifier = None
+    vocab = {"java": 0, "cad": 1, "设计": 2}
+
+    def encode_documents(self, texts):
+        return [self.encode_query(text) for text in texts]
+
+    def encode_query(self, text):
+        indices = sorted({index for word, index in self.vocab.items() if word in text.lower()})
+        return models.SparseVector(indices=indices, values=[1.0] * len(indices))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_SEARCH_ENABLED", True)
+    monkeypatch.setattr(hybrid_search, "get_sparse_encoder", lambda: KeywordEncoder())
+    hybrid_search._sparse_support.clear()
+
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        "jobs",
+        vectors_config={"job_name": models.VectorParams(size=2, distance=models.Distance.COSINE)},
+        sparse_vectors_config={"job_name_sparse": models.SparseVectorParams()},
+    )
+    docs = {1: ("前端开发", [1.0, 0.0]), 2: ("Java 后端开发", [0.6, 0.8]), 3: ("CAD 设计", [0.0, 1.0])}
+    client.upsert("jobs", [
+        models.PointStruct(
+            id=point_id,
+            vector={"job_name": vector, **hybrid_search.sparse_vectors_for(client, "jobs", {"job_name": text})},
+            payload={"job_name": text},
+        )
+        for point_id, (text, vector) in docs.items()
+    ])
+    return client
+
+
+def test_exact_keyword_boosted_by_fusion(client):
+    """稠密向量更接近其他岗位时，精确技能词仍能通过稀疏向量排到第一"""
+    dense_only = client.query_points("jobs", query=[1.0, 0.1], using="job_name", limit=3).points
+    assert dense_only[0].id == 1
+
+    fused = hybrid_search.hybrid_query_points(client, "jobs", [1.0, 0.1], "Java", using="job_name", limit=3)
+    assert fused[0].id == 2
+
+
+def test_falls_back_to_dense_without_sparse_vectors(client, monkeypatch):
+    """集合没有对应稀疏向量时退回稠密检索"""
+    client.create_collection(
+        "legacy", vectors_config={"job_name": models.VectorParams(size=2, distance=models.Distance.COSINE)}
+    )
+    client.upsert("legacy", [models.PointStruct(id=1, vector={"job_name": [1.0, 0.0]})])
+
+    assert hybrid_search.sparse_vectors_for(client, "legacy", {"job_name": "Java"}) == {}
+    points = hybrid_search.hybrid_query_points(client, "legacy", [1.0, 0.0], "Java", using="job_name")
+    assert [point.id for point in points] == [1]
+
+
+def test_sparse_encoder_defaults_to_bm25():
+    """默认使用轻量的 bm25，基类不能直接实例化"""
+    from app.utils import sparse_embeddings
+
+    assert settings.SPARSE_ENCODER == "bm25"
+    sparse_embeddings.get_sparse_encoder.cache_clear()
+    assert isinstance(sparse_embeddings.get_sparse_encoder(), sparse_embeddings.BM25SparseEncoder)
+    with pytest.raises(TypeError):
+        sparse_embeddings.SparseEncoder()
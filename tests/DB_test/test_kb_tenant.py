@@ -0,0 +1,44 @@
+from qdrant_client import QdrantClient, models
+
+from app.config import settings
+from app.db.knowledge_base import resolve_kb_targets
+from app.services.data_process.kb_tenant_migration import ensure_shared_collection, migrate_collection
+
+
+def test_resolve_targets_merges_kb_collections(monkeypatch):
+    """租户模式下多个知识库合并为共享集合上的一次带租户过滤的检索"""
+    monkeypatch.setattr(settings, "KB_TENANT_MODE", True)
+
+    targets = resolve_kb_targets(["zsk_1", "vector_posts", "zsk_2"])
+
+    assert [(name, weight) for name, _, weight in targets] == [("vector_posts", 1), (settings.KB_SHARED_COLLECTION, 2)]
+    condition = targets[1][1].must[0]
+    assert condition.key == "knowledge_id" and condition.match.any == ["1", "2"]
+
+
+def test_legacy_mode_keeps_collections(monkeypatch):
+    monkeypatch.setattr(settings, "KB_TENANT_MODE", False)
+    assert [name for name, _, _ in resolve_kb_targets(["zsk_1"])] == ["zsk_1"]
+
+
+def test_migration_keeps_identical_chunks_per_tenant():
+    """两个知识库中相同的文本块迁移后各自保留"""
+    client = QdrantClient(":memory:")
+    for knowledge_id in ("1", "2"):
+        name = f"zsk_{knowledge_id}"
+        client.create_collection(name, vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+        client.upsert(name, [
+            models.PointStruct(id="9b2d5b8e-0000-0000-0000-000000000001", vector=[1.0, 0.0], payload={"content": "招生简章"})
+        ])
+    ensure_shared_collection(client, vector_size=2)
+
+    assert migrate_collection(client, "zsk_1") == 1
+    assert migrate_collection(client, "zsk_2") == 1
+
+    hits = client.query_points(
+        settings.KB_SHARED_COLLECTION,
+        query=[1.0, 0.0],
+        query_filter=models.Filter(must=[models.FieldCondition(key="knowledge_id", match=models.MatchValue(value="2"))]),
+    ).points
+    assert client.count(settings.KB_SHARED_COLLECTION).count == 2
+    assert [hit.payload["knowledge_id"] for hit in hits] == ["2"]
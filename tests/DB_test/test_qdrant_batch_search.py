@@ -0,0 +1,21 @@
+from qdrant_client import QdrantClient, models
+
+from app.db.qdran import QdrantDatabaseConnector
+
+
+def test_search_batch_keeps_query_order():
+    """一次批量请求返回的结果与查询顺序一一对应"""
+    connector = QdrantDatabaseConnector()
+    connector._instance = QdrantClient(":memory:")
+    connector._instance.create_collection(
+        "vector_posts", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE)
+    )
+    connector._instance.upsert("vector_posts", [
+        models.PointStruct(id=1, vector=[1.0, 0.0], payload={"content": "岗位A"}),
+        models.PointStruct(id=2, vector=[0.0, 1.0], payload={"content": "岗位B"}),
+    ])
+
+    results = connector.search_batch("vector_posts", [[0.0, 1.0], [1.0, 0.0]], limit=1)
+
+    assert [points[0].id for points in results] == [2, 1]
+    assert results[0][0].payload == {"content": "岗位B"}
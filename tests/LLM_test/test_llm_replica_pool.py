@@ -0,0 +1,120 @@
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from app.services.llm.replica_pool import LLMReplica, NoHealthyReplicaError, ReplicaPool
+from app.utils.circuit_breaker import CircuitBreaker
+
+
+class FakeModel:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.name} down")
+        return f"{self.name}:{prompt}"
+
+
+def make_pool(*models, failure_threshold=1, recovery_timeout=60.0):
+    return ReplicaPool([
+        LLMReplica(model.name, RunnableLambda(model), CircuitBreaker(failure_threshold, recovery_timeout))
+        for model in models
+    ])
+
+
+def test_routes_to_least_loaded_replica():
+    """请求发往在途请求数最少的副本"""
+    busy, idle = FakeModel("mini1"), FakeModel("mini2")
+    pool = make_pool(busy, idle)
+    pool.replicas[0].in_flight = 2
+
+    assert pool.invoke("你好") == "mini2:你好"
+    assert (busy.calls, idle.calls) == (0, 1)
+
+
+def test_prefers_lower_latency_replica():
+    """在途数相同时选择近期延迟更低的副本"""
+    slow, fast = FakeModel("mini1"), FakeModel("mini2")
+    pool = make_pool(slow, fast)
+    pool.replicas[0].latency = 3.0
+    pool.replicas[1].latency = 0.5
+
+    pool.invoke("a")
+    assert (slow.calls, fast.calls) == (0, 1)
+    assert pool.replicas[1].latency < 0.5
+
+
+def test_failover_and_ejection():
+    """失败副本被熔断摘除，请求切换到其他副本"""
+    down, up = FakeModel("mini1", fail=True), FakeModel("mini2")
+    pool = make_pool(down, up)
+
+    assert pool.invoke("a") == "mini2:a"
+    assert pool.status()[0]["state"] == CircuitBreaker.OPEN
+
+    pool.invoke("b")
+    assert down.calls == 1
+    assert all(replica.in_flight == 0 for replica in pool.replicas)
+
+
+def test_all_replicas_down():
+    pool = make_pool(FakeModel("mini1", fail=True), FakeModel("mini2", fail=True))
+    with pytest.raises(NoHealthyReplicaError):
+        pool.invoke("a")
+
+
+@pytest.mark.asyncio
+async def test_async_invoke_in_chain():
+    """副本池可以直接放进 LangChain 链"""
+    pool = make_pool(FakeModel("mini1", fail=True), FakeModel("mini2"))
+    chain = ChatPromptTemplate.from_template("{question}") | pool | (lambda text: text.upper())
+
+    result = await chain.ainvoke({"question": "q"})
+    assert result.startswith("MINI2:")
+
+
+def test_stream_fails_over_before_first_chunk():
+    """流式输出在第一个块之前失败时切换副本"""
+    down, up = FakeModel("mini1", fail=True), FakeModel("mini2")
+    pool = make_pool(down, up)
+
+    assert "".join(pool.stream("a")) == "mini2:a"
+    assert all(replica.in_flight == 0 for replica in pool.replicas)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_stream_releases_probe():
+    """半开副本上的流式探测被取消后，副本不会被永久摘除"""
+    import asyncio
+
+    class HangingModel:
+        def __init__(self):
+            self.hang = True
+
+        async def astream(self, input, config=None, **kwargs):
+            yield "第一块"
+            if self.hang:
+                await asyncio.sleep(10)
+            yield "第二块"
+
+    model = HangingModel()
+    pool = ReplicaPool([LLMReplica("mini1", model, CircuitBreaker(1, 0))])
+    pool.replicas[0].breaker.record_failure()
+
+    async def consume():
+        return [chunk async for chunk in pool.astream("a")]
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert pool.replicas[0].in_flight == 0
+    model.hang = False
+    assert await consume() == ["第一块", "第二块"]
+    assert pool.status()[0]["state"] == CircuitBreaker.CLOSED
@@ -0,0 +1,97 @@
+import pytest
+from diskcache import Cache
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from app.services.llm import response_cache
+from app.services.llm.response_cache import CachedLLMRunnable, cached_llm, template_id
+
+
+class FakeModel:
+    def __init__(self, temperature=0):
+        self.temperature = temperature
+        self.calls = 0
+
+    def __call__(self, prompt_value):
+        self.calls += 1
+        return AIMessage(content=f"答案{self.calls}: {prompt_value.to_string()}")
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    cache = Cache(str(tmp_path))
+    yield cache
+    cache.close()
+
+
+def make_chain(model, cache, template="岗位介绍：{intro}", name="job_item_fill"):
+    prompt = ChatPromptTemplate.from_template(template)
+    return CachedLLMRunnable(
+        prompt | RunnableLambda(model), template_id=template_id(name, prompt), model="qwen2-mini", cache=cache
+    )
+
+
+def test_hit_skips_llm(disk_cache):
+    """相同模板和变量第二次直接返回缓存"""
+    model = FakeModel()
+    chain = make_chain(model, disk_cache) | StrOutputParser()
+
+    first = chain.invoke({"intro": "负责后端开发"})
+    second = chain.invoke({"intro": "负责后端开发"})
+
+    assert first == second
+    assert model.calls == 1
+
+
+def test_variables_and_template_change_key(disk_cache):
+    """变量不同或模板内容修改后不会命中旧缓存"""
+    model = FakeModel()
+    make_chain(model, disk_cache).invoke({"intro": "a"})
+    make_chain(model, disk_cache).invoke({"intro": "b"})
+    make_chain(model, disk_cache, template="新版模板：{intro}").invoke({"intro": "a"})
+    assert model.calls == 3
+
+
+def test_survives_reopen(tmp_path):
+    """缓存保存在磁盘上，重新打开后仍然命中"""
+    model = FakeModel()
+    with Cache(str(tmp_path)) as cache:
+        make_chain(model, cache).invoke({"intro": "a"})
+    with Cache(str(tmp_path)) as cache:
+        result = make_chain(model, cache).invoke({"intro": "a"})
+    assert model.calls == 1
+    assert result.content.startswith("答案1")
+
+
+@pytest.mark.asyncio
+async def test_async_invoke_shares_cache(disk_cache):
+    model = FakeModel()
+    chain = make_chain(model, disk_cache)
+    chain.invoke({"intro": "a"})
+    result = await chain.ainvoke({"intro": "a"})
+    assert model.calls == 1
+    assert isinstance(result, AIMessage)
+
+
+def test_rejects_sampling_models():
+    """temperature 非 0 的模型不能开启缓存"""
+    with pytest.raises(ValueError):
+        cached_llm("x", ChatPromptTemplate.from_template("{a}"), FakeModel(temperature=0.7), "m")
+
+
+def test_malformed_output_is_not_cached(disk_cache, monkeypatch):
+    """解析失败的输出不写入缓存，重试时重新调用模型；解析成功后缓存解析结果"""
+    answers = iter(["不是JSON", '{"三级": "Java开发"}'])
+    model = RunnableLambda(lambda prompt_value: AIMessage(content=next(answers)))
+    model.temperature = 0
+    monkeypatch.setattr(response_cache, "get_llm_response_cache", lambda: disk_cache)
+    chain = cached_llm("job_item_fill", ChatPromptTemplate.from_template("岗位介绍：{intro}"), model, "qwen2-mini",
+                       parser=JsonOutputParser())
+
+    with pytest.raises(OutputParserException):
+        chain.invoke({"intro": "负责后端开发"})
+    assert chain.invoke({"intro": "负责后端开发"}) == {"三级": "Java开发"}
+    assert chain.invoke({"intro": "负责后端开发"}) == {"三级": "Java开发"}
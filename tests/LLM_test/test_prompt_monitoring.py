@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+
+from app.services.monitoring.batch_exporter import BatchExporter
+from app.services.monitoring.exporters import JSONLExporter, MonitoringExporter
+from app.utils.monitoring import MONITORING_EVENTS
+
+
+class RecordingExporter(MonitoringExporter):
+    def __init__(self, block: threading.Event | None = None):
+        self.batches = []
+        self.block = block
+
+    def export(self, events):
+        if self.block is not None:
+            self.block.wait(5)
+        self.batches.append(list(events))
+
+
+def dropped_full() -> float:
+    return MONITORING_EVENTS.labels(result="dropped_full")._value.get()
+
+
+def test_events_exported_in_batches():
+    """攒够一批后导出，不足一批的在关闭时导出"""
+    recorder = RecordingExporter()
+    exporter = BatchExporter(recorder, max_queue_size=100, batch_size=4, flush_interval=10)
+    for i in range(10):
+        assert exporter.submit({"kind": "prompt", "i": i})
+    exporter.close()
+
+    assert [len(batch) for batch in recorder.batches] == [4, 4, 2]
+    assert [event["i"] for batch in recorder.batches for event in batch] == list(range(10))
+
+
+def test_flush_interval_exports_partial_batch():
+    """不足一批时等待 flush_interval 后导出"""
+    recorder = RecordingExporter()
+    exporter = BatchExporter(recorder, batch_size=50, flush_interval=0.05)
+    exporter.submit({"kind": "prompt", "i": 0})
+    time.sleep(0.3)
+
+    assert recorder.batches == [[{"kind": "prompt", "i": 0}]]
+    exporter.close()
+
+
+def test_slow_backend_drops_without_blocking():
+    """后端阻塞时队列写满，submit 立即返回并计数丢弃"""
+    block = threading.Event()
+    recorder = RecordingExporter(block)
+    exporter = BatchExporter(recorder, max_queue_size=2, batch_size=1, flush_interval=0.01)
+    before = dropped_full()
+
+    start = time.monotonic()
+    results = [exporter.submit({"kind": "prompt", "i": i}) for i in range(10)]
+    assert time.monotonic() - start < 0.5
+    assert not all(results)
+    assert dropped_full() - before == results.count(False)
+
+    block.set()
+    exporter.close()
+    assert sum(len(batch) for batch in recorder.batches) == results.count(True)
+    assert not exporter.submit({"kind": "prompt"})
+
+
+def test_jsonl_exporter(tmp_path):
+    """JSONL 后端按行写入事件"""
+    exporter = BatchExporter(JSONLExporter(str(tmp_path)), batch_size=10, flush_interval=10)
+    exporter.submit({"kind": "chain", "query": "Java 岗位", "response": "推荐后端开发", "eval_output": None})
+    exporter.submit({"kind": "prompt", "prompt": "p", "output": "o"})
+    exporter.close()
+
+    (path,) = tmp_path.glob("prompt_monitoring_*.jsonl")
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["kind"] for line in lines] == ["chain", "prompt"]
+    assert lines[0]["query"] == "Java 岗位"
@@ -0,0 +1,66 @@
+import pytest
+
+from app.services.rag.context_packer import ContextPacker, EstimateTokenCounter, TokenCounter
+
+
+class WordCounter(TokenCounter):
+    """按空格分词，便于精确断言"""
+
+    def count(self, text):
+        return len(text.split())
+
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+
+def words(n, word="w"):
+    return " ".join([word] * n)
+
+
+def test_packs_in_rank_order_within_budget():
+    """按排序依次放入，整段放得下时不截断"""
+    packer = ContextPacker(WordCounter(), budget=10, min_passage_tokens=3)
+    packed = packer.pack([words(4, "a"), words(5, "b")])
+
+    assert packed.passages == [words(4, "a"), words(5, "b")]
+    assert packed.tokens == 9
+    assert (packed.dropped, packed.truncated) == (0, 0)
+
+
+def test_truncates_when_enough_budget_left():
+    packer = ContextPacker(WordCounter(), budget=10, min_passage_tokens=3)
+    packed = packer.pack([words(6, "a"), words(8, "b")])
+
+    assert packed.passages == [words(6, "a"), words(4, "b")]
+    assert packed.tokens == 10
+    assert packed.truncated == 1
+
+
+def test_drops_low_value_passages_and_keeps_shorter_ones():
+    """剩余预算太少时丢弃，后面更短的文本块仍可放入"""
+    packer = ContextPacker(WordCounter(), budget=10, min_passage_tokens=3)
+    packed = packer.pack([words(8, "a"), words(5, "b"), words(2, "c")])
+
+    assert packed.passages == [words(8, "a"), words(2, "c")]
+    assert packed.tokens == 10
+    assert packed.dropped == 1
+
+
+def test_estimate_counter_is_conservative_for_chinese():
+    counter = EstimateTokenCounter()
+    assert counter.count("云研技术团队") == 6
+    assert counter.count("abcdef") == 2
+
+    truncated = counter.truncate("云研技术团队有什么特点", 4)
+    assert truncated == "云研技术"
+    assert counter.count(truncated) <= 4
+
+
+def test_token_counter_is_abstract():
+    """未实现 count/truncate 的计数器不能实例化"""
+    class Incomplete(TokenCounter):
+        def count(self, text):
+            return len(text)
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,98 @@
+import os
+
+from app.services.normalization import dictionary as dictionary_module
+from app.services.normalization.dictionary import (
+    VocabularyDictionary, build_dictionary, load_table_source, normalize_batch,
+)
+from app.utils.monitoring import NORMALIZATION_LOOKUPS
+
+MAJOR_XLSX = os.path.join(os.path.dirname(os.path.dirname(__file__)), "docs", "专业分类完整版.xlsx")
+
+
+def city_dictionary():
+    return VocabularyDictionary(
+        "cities_name", "市区", suffixes=["自治州", "市"], aliases={"鹏城": "深圳市"}, prefix=True
+    ).add([
+        {"省份": "湖南省", "市区": "长沙市"},
+        {"省份": "广东省", "市区": "深圳市"},
+        {"省份": "广东省", "市区": "广州市"},
+        {"省份": "湖南省", "市区": "湘西土家族苗族自治州"},
+    ])
+
+
+def test_exact_and_alias():
+    """标准名精确命中，去后缀和显式别名按别名命中"""
+    cities = city_dictionary()
+
+    assert cities.lookup(" 长沙市 ") == ({"省份": "湖南省", "市区": "长沙市"}, "exact")
+    assert cities.lookup("长沙")[0]["市区"] == "长沙市"
+    assert cities.lookup("长沙")[1] == "alias"
+    assert cities.lookup("鹏城") == ({"省份": "广东省", "市区": "深圳市"}, "alias")
+    assert cities.lookup("湘西土家族苗族")[0]["市区"] == "湘西土家族苗族自治州"
+
+
+def test_prefix_fallback():
+    """查询以标准名开头或是唯一标准名的前缀时按前缀命中，有歧义时不命中"""
+    cities = city_dictionary()
+
+    assert cities.lookup("深圳市南山区") == ({"省份": "广东省", "市区": "深圳市"}, "prefix")
+    assert cities.lookup("湘西土家")[0]["市区"] == "湘西土家族苗族自治州"
+    assert cities.lookup("广") is None
+    assert cities.lookup("杭州") is None
+
+
+def test_prefix_is_opt_in_per_collection():
+    """只有 VOCAB_PREFIX_COLLECTIONS 中的集合按前缀命中，岗位名不会被归为更短的岗位"""
+    jobs = build_dictionary("job_name", [{"三级": "销售"}, {"三级": "软件工程师"}])
+    cities = build_dictionary("cities_name", [{"市区": "深圳市"}])
+
+    assert jobs.lookup("销售") == ({"三级": "销售"}, "exact")
+    assert jobs.lookup("销售经理") is None
+    assert jobs.lookup("软件") is None
+    assert cities.lookup("深圳市南山区") == ({"市区": "深圳市"}, "prefix")
+
+
+def test_ambiguous_alias_is_ignored():
+    """同一别名对应多个标准名时不按别名命中"""
+    majors = VocabularyDictionary("majors_name", "专业名称", suffixes=["类"]).add([
+        {"专业名称": "哲学类", "专业代码": "010100"},
+        {"专业名称": "哲学", "专业代码": "010101"},
+    ])
+
+    assert majors.lookup("哲学") == ({"专业名称": "哲学", "专业代码": "010101"}, "exact")
+    assert majors.lookup("哲学类")[0]["专业代码"] == "010100"
+
+
+def test_table_source():
+    """专业分类表格的每行作为一个条目"""
+    majors = VocabularyDictionary("majors_name", "专业名称", suffixes=["专业"]).add(load_table_source(MAJOR_XLSX))
+
+    payload, method = majors.lookup("软件工程专业")
+    assert method == "alias"
+    assert payload["专业名称"] == "软件工程"
+    assert payload["专业代码"] == "080902"
+
+
+def test_normalize_batch_only_searches_misses(monkeypatch):
+    """命中字典的值不做向量检索，未命中的值一次批量交给向量检索"""
+    cities = city_dictionary()
+    monkeypatch.setattr(
+        dictionary_module, "get_dictionary", lambda collection: cities if collection == "cities_name" else None
+    )
+    searched = []
+
+    def vector_search(lookups):
+        searched.append(lookups)
+        return [{"名称": f"向量:{text}"} for text, _ in lookups]
+
+    def count(method):
+        return NORMALIZATION_LOOKUPS.labels(collection="cities_name", method=method)._value.get()
+
+    before = count("exact"), count("vector")
+    payloads = normalize_batch(
+        [("长沙市", "cities_name"), ("杭州", "cities_name"), ("五险一金", "welfare")], vector_search
+    )
+
+    assert payloads == [{"省份": "湖南省", "市区": "长沙市"}, {"名称": "向量:杭州"}, {"名称": "向量:五险一金"}]
+    assert searched == [[("杭州", "cities_name"), ("五险一金", "welfare")]]
+    assert (count("exact") - before[0], count("vector") - before[1]) == (1, 1)
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.evaluation.benchmark import RAGBenchmark, compare_reports, recall_at_k, reciprocal_rank
+
+
+@pytest.fixture(scope="module")
+def report():
+    return RAGBenchmark(pipelined=True).run(iterations=2)
+
+
+def test_metrics():
+    assert recall_at_k([3, 1, 2], [1, 4], k=2) == 0.5
+    assert reciprocal_rank([3, 1, 2], [1, 2]) == 0.5
+    assert reciprocal_rank([3], [1]) == 0.0
+
+
+def test_golden_set_quality(report):
+    """黄金查询集上的检索质量不低于基线"""
+    assert report["quality"]["retrieval"]["mrr"] >= 0.8
+    assert report["quality"]["rerank"]["mrr"] >= 0.8
+    assert not report["skipped_stages"]
+
+
+def test_reports_latency_and_calls(report):
+    """每个阶段都有计时，下游调用次数与查询数一致"""
+    runs = report["queries"] * report["iterations"]
+    for stage in ("embedding", "search", "retrieval", "rerank", "llm", "total"):
+        assert report["latency_ms"][stage]["count"] >= runs
+    assert report["calls"]["llm"] == runs
+    assert report["calls"]["expansion"] == runs
+    # 第二轮的重排分数全部命中缓存
+    assert report["calls"]["rerank"] == report["queries"]
+
+
+def test_standard_mode_runs():
+    report = RAGBenchmark(pipelined=False).run(iterations=1)
+    assert report["pipelined"] is False
+    assert report["calls"]["llm"] == report["queries"]
+
+
+def test_compare_reports_flags_regressions():
+    """延迟、质量和调用次数的退化都会被发现，低于计时噪声的阶段不参与比较"""
+    baseline = {
+        "latency_ms": {"total": {"p50": 10.0, "p90": 20.0}, "fusion": {"p50": 0.1, "p90": 0.2}},
+        "quality": {"rerank": {"mrr": 0.9}},
+        "calls": {"rerank": 16},
+    }
+    current = {
+        "latency_ms": {"total": {"p50": 15.0, "p90": 21.0}, "fusion": {"p50": 0.5, "p90": 0.9}},
+        "quality": {"rerank": {"mrr": 0.8}},
+        "calls": {"rerank": 17},
+    }
+
+    assert compare_reports(baseline, baseline) == []
+    regressions = compare_reports(baseline, current)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("total p50")
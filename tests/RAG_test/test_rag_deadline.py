@@ -0,0 +1,140 @@
+import time
+
+import pytest
+
+from app.services.rag import retriever as retriever_module
+from app.services.rag.deadline import Deadline
+from app.services.rag.reranking import LocalReranker, RemoteReranker, Reranker
+
+SHARES = {"expansion": 0.1, "retrieval": 0.2, "rerank": 0.2, "llm": 0.5}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_stage_timeout_reserves_later_stages():
+    clock = FakeClock()
+    deadline = Deadline(budget=10, stage_shares=SHARES, timer=clock)
+
+    assert deadline.stage_timeout("expansion") == 1.0
+    clock.now = 0.5  # 扩展提前完成，节省的时间顺延给检索
+    assert deadline.stage_timeout("retrieval") == 2.5
+    assert deadline.stage_timeout("llm") == 9.5
+
+
+def test_behind_schedule_and_skip_metadata():
+    clock = FakeClock()
+    deadline = Deadline(budget=10, stage_shares=SHARES, timer=clock)
+    clock.now = 4.5  # 检索阶段超时
+
+    assert deadline.behind_schedule("rerank") is True
+    assert deadline.stage_timeout("rerank") == 0.5
+    deadline.skip("rerank", "剩余时间不足")
+    assert deadline.metadata() == {"deadline": 10, "elapsed": 4.5, "skipped_stages": ["rerank"]}
+
+
+def test_exhausted_budget_skips_retrieval(monkeypatch):
+    """预算用完时不再发起嵌入和 Qdrant 请求"""
+    clock = FakeClock()
+    deadline = Deadline(budget=10, stage_shares=SHARES, timer=clock)
+    clock.now = 10.0
+    embedded = []
+    monkeypatch.setattr(retriever_module, "embed_texts", lambda texts, **kwargs: embedded.append(texts))
+    retriever = retriever_module.VectorRetriever.__new__(retriever_module.VectorRetriever)
+
+    assert retriever._search_batch(["Java"], ["jobs"], k=4, deadline=deadline) == []
+    assert embedded == []
+    assert deadline.skipped == ["retrieval"]
+
+
+def test_qdrant_requests_use_remaining_retrieval_time(monkeypatch):
+    """每次 Qdrant 请求的超时取检索阶段的剩余时间，中途用完时跳过剩余集合"""
+    clock = FakeClock()
+    deadline = Deadline(budget=10, stage_shares={"retrieval": 0.2, "llm": 0.2}, timer=clock)
+    clock.now = 6.5  # 检索阶段可用 10 - 6.5 - 2.0(llm 预留) = 1.5s
+    timeouts = []
+
+    class FakeConnector:
+        def search_batch(self, collection_name, query_vectors, query_filter=None, limit=3, timeout=None):
+            timeouts.append((collection_name, timeout))
+            clock.now += 2.0
+            return [[] for _ in query_vectors]
+
+    monkeypatch.setattr(retriever_module, "embed_texts", lambda texts, **kwargs: [[0.0] for _ in texts])
+    monkeypatch.setattr(
+        retriever_module, "resolve_kb_targets", lambda collections, query_filter: [(c, query_filter, 1) for c in collections]
+    )
+    retriever = retriever_module.VectorRetriever.__new__(retriever_module.VectorRetriever)
+    retriever._client = FakeConnector()
+
+    ranked_lists = retriever._search_batch(["Java"], ["jobs", "courses"], k=4, deadline=deadline)
+
+    assert timeouts == [("jobs", 2)]
+    assert ranked_lists == [("jobs", [])]
+    assert deadline.skipped == ["retrieval"]
+
+
+def test_zero_timeout_is_not_replaced_by_default():
+    """timeout=0 表示预算已用完，不能退回到默认超时"""
+    reranker = RemoteReranker("http://rerank", api_key=None, model="bge", timeout=5.0)
+    seen = []
+
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"results": [{"index": 0, "relevance_score": 1.0}]}
+
+    class FakeClient:
+        is_closed = False
+
+        def post(self, url, json, timeout):
+            seen.append(timeout)
+            return FakeResponse()
+
+    reranker._sync_client = FakeClient()
+    reranker.score_sync("Java", ["Java 开发"], timeout=0.0)
+
+    assert seen == [0.0]
+
+
+def test_local_rerank_is_bounded_by_timeout():
+    """本地交叉编码器无法取消，调用方最多等待 timeout"""
+    local = LocalReranker()
+    local._compute = lambda query, passages: time.sleep(0.5) or [1.0 for _ in passages]
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        local.score_sync("Java", ["Java 开发"], timeout=0.05)
+    assert time.monotonic() - started < 0.4
+
+
+def test_fallback_shares_the_rerank_timeout():
+    """远程后端耗尽超时后不再切换到本地后端"""
+    class SlowRemote:
+        model_id = "remote"
+
+        def score_sync(self, query, passages, timeout=None):
+            time.sleep(timeout)
+            raise TimeoutError("rerank timeout")
+
+    class Local:
+        model_id = "local"
+        called = False
+
+        def score_sync(self, query, passages, timeout=None):
+            self.called = True
+            return [1.0 for _ in passages]
+
+    local = Local()
+    reranker = Reranker(remote=SlowRemote(), local=local, backend="auto")
+
+    with pytest.raises(RuntimeError):
+        reranker.generate_response("Java", ["Java 开发"], keep_top_k=1, timeout=0.05)
+    assert local.called is False
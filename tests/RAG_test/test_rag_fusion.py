@@ -0,0 +1,37 @@
+from qdrant_client import models
+
+from app.services.rag.fusion import reciprocal_rank_fusion
+
+
+def hit(point_id, score=0.9):
+    return models.ScoredPoint(id=point_id, version=0, score=score, payload={"content": f"chunk-{point_id}"})
+
+
+def test_dedup_and_rrf_order():
+    """多个扩展查询都命中的文本块只保留一次，并排在前面"""
+    ranked_lists = [
+        ("zsk_1", [hit(1), hit(2), hit(3)]),
+        ("zsk_1", [hit(2), hit(4)]),
+        ("zsk_1", [hit(2), hit(1)]),
+    ]
+
+    fused = reciprocal_rank_fusion(ranked_lists, k=60)
+
+    assert [point.id for point in fused] == [2, 1, 4, 3]
+    assert fused[0].score == 1 / 62 + 1 / 61 + 1 / 61
+
+
+def test_top_n_limits_rerank_candidates():
+    fused = reciprocal_rank_fusion([("zsk_1", [hit(i) for i in range(1, 10)])], top_n=3)
+    assert [point.id for point in fused] == [1, 2, 3]
+
+
+def test_same_id_in_different_collections_not_merged():
+    """不同集合中 id 相同的文本块互不相关，分别保留且分数不累加"""
+    zsk_1 = models.ScoredPoint(id=7, version=0, score=0.9, payload={"content": "知识库1的文本块"})
+    zsk_2 = models.ScoredPoint(id=7, version=0, score=0.8, payload={"content": "知识库2的文本块"})
+
+    fused = reciprocal_rank_fusion([("zsk_1", [zsk_1]), ("zsk_2", [zsk_2])], k=60)
+
+    assert [point.payload["content"] for point in fused] == ["知识库1的文本块", "知识库2的文本块"]
+    assert [point.score for point in fused] == [1 / 61, 1 / 61]
@@ -0,0 +1,63 @@
+import pytest
+
+from app.config import settings
+from app.services.rag.reranking import Reranker, get_reranker
+from app.utils.cache import TTLCache
+
+
+class FakeBackend:
+    def __init__(self, model_id, fail=False):
+        self.model_id = model_id
+        self.fail = fail
+        self.scored = []
+
+    def score_sync(self, query, passages, timeout=None):
+        if self.fail:
+            raise TimeoutError("rerank timeout")
+        self.scored.extend(passages)
+        return [float(len(passage)) for passage in passages]
+
+    async def score(self, query, passages, timeout=None):
+        return self.score_sync(query, passages)
+
+
+def test_cached_passages_are_not_rescored():
+    """同一查询下已打过分的文本块直接使用缓存分数"""
+    remote = FakeBackend("remote")
+    reranker = Reranker(remote=remote, backend="remote", cache=TTLCache())
+
+    assert reranker.generate_response("Java", ["岗位", "Java 开发岗位"], keep_top_k=1) == ["Java 开发岗位"]
+    reranker.generate_response("Java", ["岗位", "Java 开发岗位", "CAD 设计"], keep_top_k=3)
+
+    assert remote.scored == ["岗位", "Java 开发岗位", "CAD 设计"]
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_backend():
+    remote, local = FakeBackend("remote", fail=True), FakeBackend("local")
+    reranker = Reranker(remote=remote, local=local, backend="auto")
+
+    result = await reranker.agenerate_response("Java", ["a", "abc", "ab"], keep_top_k=2)
+
+    assert result == ["abc", "ab"]
+    assert local.scored == ["a", "abc", "ab"]
+
+
+def test_local_fallback_is_opt_in():
+    """默认只用远程接口，不创建本地交叉编码器"""
+    assert settings.RERANK_BACKEND == "remote"
+    assert Reranker().backend == "remote"
+    assert get_reranker().local is None
+
+
+def test_warmup_loads_local_model_only_when_configured():
+    loaded = []
+
+    class Local(FakeBackend):
+        def warmup(self):
+            loaded.append(self.model_id)
+
+    Reranker(local=Local("local"), backend="remote").warmup()
+    assert loaded == []
+    Reranker(local=Local("local"), backend="auto").warmup()
+    assert loaded == ["local"]
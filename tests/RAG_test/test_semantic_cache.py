@@ -0,0 +1,90 @@
+from app.services.rag.semantic_cache import SemanticCache
+
+VECTORS = {
+    "云研技术团队有什么特点?": [1.0, 0.0, 0.0],
+    "云研技术团队有什么特点": [0.99, 0.1, 0.0],
+    "公司在哪里?": [0.0, 1.0, 0.0],
+}
+
+
+def make_cache(points_count):
+    return SemanticCache(
+        embed_fn=lambda query: VECTORS[query],
+        fingerprint_fn=lambda collection: points_count[collection],
+        threshold=0.95,
+        fingerprint_ttl=0,
+    )
+
+
+def test_similar_question_hits_same_collections_only():
+    cache = make_cache({"zsk_1": 10, "zsk_2": 5})
+    cache.set("云研技术团队有什么特点?", ["zsk_1"], "答案A", namespace="answer")
+
+    assert cache.get("云研技术团队有什么特点", ["zsk_1"], namespace="answer") == "答案A"
+    assert cache.get("公司在哪里?", ["zsk_1"], namespace="answer") is None
+    assert cache.get("云研技术团队有什么特点", ["zsk_2"], namespace="answer") is None
+    assert cache.get("云研技术团队有什么特点", ["zsk_1"], namespace="prompt") is None
+
+
+def test_collection_change_invalidates_entries():
+    """知识库集合的文本块数量变化后，旧答案不再命中"""
+    points_count = {"zsk_1": 10}
+    cache = make_cache(points_count)
+    cache.set("云研技术团队有什么特点?", ["zsk_1"], "答案A")
+
+    points_count["zsk_1"] = 12
+    assert cache.get("云研技术团队有什么特点?", ["zsk_1"]) is None
+
+
+def test_same_size_rewrite_invalidates_entries():
+    """原地更新后点数不变，知识库版本标记变化仍使旧答案失效"""
+    from qdrant_client import QdrantClient
+
+    from app.db.qdran import QdrantDatabaseConnector
+
+    connector = QdrantDatabaseConnector()
+    connector._instance = QdrantClient(":memory:")
+    assert connector.kb_version("zsk_1") is None
+    connector.bump_kb_version("zsk_1")
+    version = connector.kb_version("zsk_1")
+
+    state = {"zsk_1": (version, 10)}
+    cache = make_cache(state)
+    cache.set("云研技术团队有什么特点?", ["zsk_1"], "答案A")
+    assert cache.get("云研技术团队有什么特点?", ["zsk_1"]) == "答案A"
+
+    connector.bump_kb_version("zsk_1")
+    state["zsk_1"] = (connector.kb_version("zsk_1"), 10)
+    assert state["zsk_1"][0] != version
+    assert cache.get("云研技术团队有什么特点?", ["zsk_1"]) is None
+
+
+def test_buckets_and_entries_are_bounded():
+    """集合组合数和每个组合的记录数都有上限，按最久未使用淘汰"""
+    cache = SemanticCache(
+        embed_fn=lambda query: VECTORS[query],
+        fingerprint_fn=lambda collection: 0,
+        max_entries=2,
+        max_buckets=2,
+        fingerprint_ttl=0,
+    )
+    cache.set("云研技术团队有什么特点?", ["zsk_1"], "答案A")
+    cache.set("公司在哪里?", ["zsk_2"], "答案B")
+    assert cache.get("云研技术团队有什么特点?", ["zsk_1"]) == "答案A"
+    cache.set("公司在哪里?", ["zsk_3"], "答案C")
+
+    assert cache.get("公司在哪里?", ["zsk_2"]) is None
+    assert cache.get("云研技术团队有什么特点?", ["zsk_1"]) == "答案A"
+
+    cache.set("公司在哪里?", ["zsk_1"], "答案D")
+    cache.get("云研技术团队有什么特点?", ["zsk_1"])
+    cache.set("云研技术团队有什么特点", ["zsk_1"], "答案E")
+    assert cache.get("公司在哪里?", ["zsk_1"]) is None
+    assert cache.get("云研技术团队有什么特点?", ["zsk_1"]) == "答案A"
+
+
+def test_disabled_by_default_with_strict_threshold():
+    from app.config import settings
+
+    assert settings.SEMANTIC_CACHE_ENABLED is False
+    assert settings.SEMANTIC_CACHE_THRESHOLD >= 0.98
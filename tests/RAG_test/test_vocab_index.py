@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient, models
+
+from app.services.normalization import VocabularyIndex, VocabularyIndexService
+
+
+@pytest.fixture
+def client():
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        "cities_name", vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE)
+    )
+    client.upsert("cities_name", [
+        models.PointStruct(id=1, vector=[1.0, 0.0, 0.0], payload={"市区": "广州"}),
+        models.PointStruct(id=2, vector=[0.0, 1.0, 0.0], payload={"市区": "深圳"}),
+        models.PointStruct(id=3, vector=[0.0, 0.0, 1.0], payload={"市区": "佛山"}),
+    ])
+    return client
+
+
+def test_search_matches_qdrant(client):
+    """内存索引的 top-k 与 Qdrant 检索结果一致"""
+    index = VocabularyIndex(client, "cities_name", page_size=2)
+    index.load()
+    query = [0.2, 0.9, 0.4]
+
+    hits = index.search(query, k=2)
+    expected = client.query_points("cities_name", query=query, limit=2).points
+
+    assert [hit.id for hit in hits] == [point.id for point in expected]
+    assert np.allclose([hit.score for hit in hits], [point.score for point in expected], atol=1e-5)
+    assert hits[0].payload == {"市区": "深圳"}
+
+
+def test_search_batch_order(client):
+    """批量查询的结果与查询顺序一一对应"""
+    index = VocabularyIndex(client, "cities_name")
+    index.load()
+
+    results = index.search_batch([[0, 0, 1], [1, 0.1, 0]], k=1)
+
+    assert [hits[0].payload["市区"] for hits in results] == ["佛山", "广州"]
+
+
+def test_incremental_refresh(client):
+    """只拉取新增和 payload 变化的点，删除的点移出索引"""
+    index = VocabularyIndex(client, "cities_name")
+    index.load()
+    assert index.refresh() is False
+
+    client.upsert("cities_name", [
+        models.PointStruct(id=2, vector=[0.0, 1.0, 0.0], payload={"市区": "深圳市"}),
+        models.PointStruct(id=4, vector=[0.6, 0.8, 0.0], payload={"市区": "东莞"}),
+    ])
+    client.delete("cities_name", points_selector=models.PointIdsList(points=[3]))
+
+    retrieved = []
+    original = client.retrieve
+
+    def retrieve(collection_name, ids, **kwargs):
+        retrieved.extend(ids)
+        return original(collection_name=collection_name, ids=ids, **kwargs)
+
+    client.retrieve = retrieve
+    assert index.refresh() is True
+
+    assert sorted(retrieved) == [2, 4]
+    assert len(index) == 3
+    assert index.search([0, 1, 0])[0].payload == {"市区": "深圳市"}
+    assert index.search([0.6, 0.8, 0])[0].payload == {"市区": "东莞"}
+    assert index.search([0, 0, 1])[0].id != 3
+
+
+def test_service_skips_unloaded(client):
+    """加载失败的索引不可用，调用方回退到 Qdrant"""
+    service = VocabularyIndexService(refresh_interval=0)
+    service.register(VocabularyIndex(client, "cities_name"))
+    service.register(VocabularyIndex(client, "missing"))
+    service.start()
+
+    assert service.get("cities_name") is not None
+    assert service.get("missing") is None
+    assert service.get("welfare") is None
+
+
+def test_fill_table_fallback_uses_vocab_client():
+    """填表回退检索与内存索引使用同一个按 VOCAB_QDRANT_URL 创建的客户端"""
+    from app.api.v1.endpoints import table_fill_api
+    from app.services.normalization import get_vocab_qdrant_client
+
+    assert table_fill_api.client is get_vocab_qdrant_client()
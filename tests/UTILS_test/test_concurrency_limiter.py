@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils.concurrency import ConcurrencyLimiter
+
+
+def test_limit_caps_concurrent_threads():
+    """线程并发数不超过上限"""
+    limiter = ConcurrencyLimiter(2, name="test_threads")
+    peak = 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal peak
+        with limiter.hold():
+            with lock:
+                peak = max(peak, limiter.in_use)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 2
+    assert limiter.in_use == 0
+    assert limiter.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_threads_and_coroutines_share_slots():
+    """同步与异步调用共用同一额度"""
+    limiter = ConcurrencyLimiter(1, name="test_mixed")
+    limiter.acquire()
+
+    acquired = asyncio.Event()
+
+    async def waiter():
+        async with limiter.ahold():
+            acquired.set()
+
+    task = asyncio.create_task(waiter())
+    await asyncio.sleep(0.01)
+    assert not acquired.is_set()
+    assert limiter.waiting == 1
+
+    limiter.release()
+    await asyncio.wait_for(task, timeout=1)
+    assert acquired.is_set()
+    assert limiter.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot():
+    """排队中被取消的协程不占用额度"""
+    limiter = ConcurrencyLimiter(1, name="test_cancel")
+    await limiter.aacquire()
+
+    task = asyncio.create_task(limiter.aacquire())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    limiter.release()
+    assert limiter.in_use == 0
+    await asyncio.wait_for(limiter.aacquire(), timeout=1)
+    limiter.release()
+
+
+def test_waiters_are_served_in_order():
+    """先排队的请求先获得额度"""
+    limiter = ConcurrencyLimiter(1, name="test_fifo")
+    limiter.acquire()
+    order = []
+
+    def work(index):
+        with limiter.hold():
+            order.append(index)
+
+    threads = []
+    for index in range(4):
+        thread = threading.Thread(target=work, args=(index,))
+        thread.start()
+        threads.append(thread)
+        while limiter.waiting <= index:
+            time.sleep(0.001)
+
+    limiter.release()
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2, 3]
+
+
+def test_invalid_limit():
+    with pytest.raises(ValueError):
+        ConcurrencyLimiter(0)
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.utils.embedding_batcher import EmbeddingBatcher
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    """并发请求应被合并为一次批量嵌入"""
+    calls = []
+
+    async def embed_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_batch_size=16, max_wait_ms=20)
+    results = await asyncio.gather(*(batcher.submit(text) for text in ["a", "bb", "ccc", "bb"]))
+
+    assert results == [[1.0], [2.0], [3.0], [2.0]]
+    assert calls == [["a", "bb", "ccc"]], "同一批次内的重复文本只应嵌入一次"
+    await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_size_is_bounded():
+    """超过 max_batch_size 的请求应拆分为多个批次"""
+    calls = []
+
+    async def embed_batch(texts):
+        calls.append(len(texts))
+        return [[0.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_batch_size=2, max_wait_ms=20)
+    await asyncio.gather(*(batcher.submit(str(i)) for i in range(5)))
+
+    assert sum(calls) == 5
+    assert max(calls) <= 2
+    await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_errors_are_propagated_to_every_caller():
+    """批量嵌入失败时，批次内每个调用方都应收到异常"""
+
+    async def embed_batch(texts):
+        raise RuntimeError("xinference unavailable")
+
+    batcher = EmbeddingBatcher(embed_batch, max_batch_size=8, max_wait_ms=5)
+    results = await asyncio.gather(
+        batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    await batcher.close()
@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+
+from app.utils.embedding_cache import EmbeddingCache
+
+
+def test_key_is_normalized_and_model_scoped():
+    """等价文本共享缓存键，不同模型互不干扰"""
+    assert EmbeddingCache.make_key("bge-m3", " 电子商务 ") == EmbeddingCache.make_key("bge-m3", "电子商务")
+    assert EmbeddingCache.make_key("bge-m3", "电子商务") != EmbeddingCache.make_key("bge-small-zh-v1.5", "电子商务")
+
+
+def test_memory_lru_eviction():
+    """超出容量时淘汰最近最少使用的向量"""
+    cache = EmbeddingCache(memory_size=2)
+    cache.set("bge-m3", "a", [1.0])
+    cache.set("bge-m3", "b", [2.0])
+    assert cache.get("bge-m3", "a") is not None
+    cache.set("bge-m3", "c", [3.0])
+
+    assert cache.get("bge-m3", "b") is None
+    assert cache.get("bge-m3", "a").dtype == np.float32
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    """磁盘缓存在新实例中仍可命中"""
+    cache = EmbeddingCache(memory_size=10, directory=str(tmp_path))
+    cache.set("bge-m3", "计算机科学与技术", [0.5, 0.25])
+    cache.close()
+
+    restarted = EmbeddingCache(memory_size=10, directory=str(tmp_path))
+    vector = restarted.get("bge-m3", "计算机科学与技术")
+    assert vector.tolist() == [0.5, 0.25]
+    assert restarted.stats()["disk_hits"] == 1
+    restarted.close()
+
+
+async def test_async_disk_tier_runs_off_the_event_loop(tmp_path):
+    """async 接口只在事件循环中查内存层，磁盘层的读写在线程池中完成"""
+    cache = EmbeddingCache(memory_size=10, directory=str(tmp_path))
+    loop_thread = threading.current_thread()
+    disk_threads = []
+    disk_get, disk_set = cache._disk.get, cache._disk.set
+    cache._disk.get = lambda key: disk_threads.append(threading.current_thread()) or disk_get(key)
+    cache._disk.set = lambda key, value: disk_threads.append(threading.current_thread()) or disk_set(key, value)
+
+    assert await cache.aget_many([("bge-m3", "电子商务")]) == [None]
+    await cache.aset_many([("bge-m3", "电子商务")], [[0.5, 0.25]])
+    cache._memory.clear()
+    vectors = await cache.aget_many([("bge-m3", "电子商务"), ("bge-m3", "市场营销")])
+
+    assert vectors[0].tolist() == [0.5, 0.25] and vectors[1] is None
+    assert len(disk_threads) == 4
+    assert loop_thread not in disk_threads
+    cache.close()
@@ -0,0 +1,105 @@
+import pytest
+
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.embedding_router import EmbeddingBackend, EmbeddingRouter, NoHealthyBackendError
+
+
+class FakeClient:
+    def __init__(self, base_url, fail=False):
+        self.base_url = base_url
+        self.fail = fail
+        self.calls = 0
+
+    async def embed(self, texts, model, timeout=None):
+        return self.embed_sync(texts, model, timeout)
+
+    def embed_sync(self, texts, model, timeout=None):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.base_url} down")
+        return [[1.0] for _ in texts]
+
+
+def make_router(*clients, failure_threshold=1, recovery_timeout=60.0):
+    return EmbeddingRouter([
+        EmbeddingBackend(client, CircuitBreaker(failure_threshold, recovery_timeout))
+        for client in clients
+    ])
+
+
+def test_circuit_breaker_half_open_allows_single_probe():
+    """熔断冷却结束后只放行一个探测请求，探测成功后恢复"""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_routes_to_least_loaded_backend():
+    """请求发往在途请求数最少的节点"""
+    busy, idle = FakeClient("http://busy"), FakeClient("http://idle")
+    router = make_router(busy, idle)
+    router.backends[0].in_flight = 3
+
+    router.embed_sync(["电子商务"], "bge-m3")
+    assert (busy.calls, idle.calls) == (0, 1)
+
+
+def test_failover_and_ejection():
+    """失败节点被熔断摘除，请求切换到其他节点"""
+    down, up = FakeClient("http://down", fail=True), FakeClient("http://up")
+    router = make_router(down, up)
+
+    assert router.embed_sync(["a"], "bge-m3") == [[1.0]]
+    assert router.status()[0]["state"] == CircuitBreaker.OPEN
+
+    router.embed_sync(["b"], "bge-m3")
+    assert down.calls == 1, "熔断期间不应再向故障节点发送请求"
+
+
+@pytest.mark.asyncio
+async def test_all_backends_down():
+    router = make_router(FakeClient("http://a", fail=True), FakeClient("http://b", fail=True))
+    with pytest.raises(NoHealthyBackendError):
+        await router.embed(["a"], "bge-m3")
+
+
+def test_released_probe_can_be_retried():
+    """探测请求未得出结果时归还名额，下一个请求可以重新探测"""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+
+    assert breaker.allow_request() is True
+    breaker.release_probe()
+    assert breaker.allow_request() is True
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_does_not_eject_backend():
+    """半开节点上的探测请求被取消后，节点仍可被后续请求探测恢复"""
+    import asyncio
+
+    class SlowClient(FakeClient):
+        async def embed(self, texts, model, timeout=None):
+            self.calls += 1
+            await asyncio.sleep(10)
+
+    client = SlowClient("http://slow")
+    router = make_router(client, recovery_timeout=0)
+    router.backends[0].breaker.record_failure()
+
+    task = asyncio.create_task(router.embed(["a"], "bge-m3"))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert router.backends[0].in_flight == 0
+    client.embed = FakeClient.embed.__get__(client)
+    assert await router.embed(["b"], "bge-m3") == [[1.0]]
+    assert router.status()[0]["state"] == CircuitBreaker.CLOSED
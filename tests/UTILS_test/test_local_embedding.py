@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.utils import local_embedding
+from app.utils.EMBEDDING import BGEM3EmbeddingService, flag_device_kwargs
+from app.utils.local_embedding import LocalEmbeddingBackend
+from app.utils.sparse_embeddings import BGEM3SparseEncoder
+
+
+class FakeM3Model:
+    """与 BGEM3FlagModel.encode 的返回结构一致：三个键总是存在，未请求的值为 None"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences, return_dense=True, return_sparse=False, return_colbert_vecs=False, **kwargs):
+        self.calls.append((list(sentences), return_dense, return_sparse, return_colbert_vecs))
+        return {
+            "dense_vecs": np.array([[float(len(text)), 1.0] for text in sentences], dtype=np.float32)
+            if return_dense else None,
+            "lexical_weights": [{"42": np.float32(0.25), "7": np.float32(0.5), "9": 0.0} for _ in sentences]
+            if return_sparse else None,
+            "colbert_vecs": None,
+        }
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    service = BGEM3EmbeddingService.__new__(BGEM3EmbeddingService)
+    service.model = FakeM3Model()
+    service.batch_size = 2
+    service.executor = ThreadPoolExecutor(max_workers=1)
+    backend = LocalEmbeddingBackend()
+    backend._service = service
+    monkeypatch.setattr(local_embedding, "get_local_embedding_backend", lambda: backend)
+    yield backend
+    backend.close()
+
+
+def test_encode_dense_ignores_unrequested_outputs(backend):
+    """只请求稠密向量时 lexical_weights 为 None，不影响结果，跨批次保持顺序"""
+    assert backend.embed_sync(["Java", "CAD", "软件工程"]) == [[4.0, 1.0], [3.0, 1.0], [4.0, 1.0]]
+    assert [call[1:] for call in backend._service.model.calls] == [(True, False, False)] * 2
+
+
+async def test_async_encode_dense(backend):
+    assert await backend.embed(["Java"]) == [[4.0, 1.0]]
+
+
+def test_encode_sparse_ignores_unrequested_outputs(backend):
+    """只请求词法权重时 dense_vecs 为 None"""
+    assert backend.embed_sparse_sync(["Java"]) == [{"42": 0.25, "7": 0.5, "9": 0.0}]
+    assert backend._service.model.calls[-1][1:] == (False, True, False)
+
+
+def test_bge_m3_sparse_encoder(backend):
+    """bge-m3 稀疏编码器基于真实输出结构产出按 token id 排序、去掉零权重的稀疏向量"""
+    vectors = BGEM3SparseEncoder().encode_documents(["Java", "CAD"])
+
+    assert [vector.indices for vector in vectors] == [[7, 42], [7, 42]]
+    assert vectors[0].values == [0.5, 0.25]
+
+
+def test_device_kwarg_follows_flag_embedding_version():
+    """1.2.x 的构造参数为 device，1.3 起为 devices"""
+
+    class OldModel:
+        def __init__(self, model_name_or_path=None, use_fp16=True, device=None):
+            pass
+
+    class NewModel:
+        def __init__(self, model_name_or_path, use_fp16=True, devices=None, **kwargs):
+            pass
+
+    assert flag_device_kwargs(OldModel, "cpu") == {"device": "cpu"}
+    assert flag_device_kwargs(NewModel, "cpu") == {"devices": "cpu"}
+    assert flag_device_kwargs(NewModel, None) == {}
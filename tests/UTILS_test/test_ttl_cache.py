@@ -0,0 +1,32 @@
+from app.utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, timer=clock)
+    cache.set(("怎么写简历", 3), ("简历模板", "简历技巧"))
+
+    clock.now = 59
+    assert cache.get(("怎么写简历", 3)) == ("简历模板", "简历技巧")
+    clock.now = 61
+    assert cache.get(("怎么写简历", 3)) is None
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
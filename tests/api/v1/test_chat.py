@@ -0,0 +1,25 @@
+import json
+
+from app.api.v1.endpoints import chat
+from app.services.rag.deadline import Deadline
+
+
+class FakeLLM:
+    async def astream(self, **kwargs):
+        for token in ["你", "好"]:
+            yield {"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+
+
+async def test_deadline_metadata_is_a_comment(monkeypatch):
+    """每个 data 行都是增量或结束标记，时间预算元数据放在注释行中"""
+    monkeypatch.setattr(chat, "llm", FakeLLM())
+    query = chat.Query(query="介绍一下", collections=["zsk_1"])
+
+    frames = [frame async for frame in chat.create_chat_chunks(query, Deadline(budget=10))]
+
+    data = [frame[len("data: "):].strip() for frame in frames if frame.startswith("data: ")]
+    assert data[-1] == "[DONE]"
+    assert [json.loads(item)["choices"][0]["delta"]["content"] for item in data[:-1]] == ["你", "好"]
+    assert not any(frame.startswith("event:") for frame in frames)
+    progress = [frame for frame in frames if frame.startswith(": progress ")]
+    assert json.loads(progress[0][len(": progress "):])["deadline"] == 10
@@ -0,0 +1,48 @@
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from openai._streaming import SSEDecoder
+from openai.types.chat import ChatCompletionChunk
+
+from app.api.v1.endpoints import chat_v2
+
+
+def test_router_imports_and_mounts():
+    """流式对话路由可以导入并挂载"""
+    app = FastAPI()
+    app.include_router(chat_v2.router, prefix="/zsk")
+
+    assert "/zsk/chat/completions/stream" in {route.path for route in app.routes}
+
+
+class FakeInference:
+    def generate(self, query, collections, deadline):
+        return f"上下文\n{query}"
+
+
+class FakeCompletions:
+    async def create(self, **kwargs):
+        async def chunks():
+            for i, token in enumerate(["你", "好"]):
+                yield ChatCompletionChunk(
+                    id=str(i), object="chat.completion.chunk", created=0, model="qwen",
+                    choices=[{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                )
+        return chunks()
+
+
+async def test_stream_is_openai_compatible(monkeypatch):
+    """进度信息以注释行发送，OpenAI SDK 解析出的每个事件都是带 choices 的 chunk"""
+    monkeypatch.setattr(chat_v2, "InferenceOpenAI", FakeInference)
+    monkeypatch.setattr(chat_v2, "client", SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions())))
+    request = chat_v2.ChatRequest(messages=[{"role": "user", "content": "介绍一下"}], collections=["zsk_1"])
+
+    body = "".join([frame async for frame in chat_v2.rag_stream(request)])
+    events = list(SSEDecoder().iter_bytes(iter([body.encode("utf-8")])))
+
+    assert body.startswith(": progress ")
+    assert all(event.event is None for event in events)
+    assert events[-1].data == "[DONE]"
+    chunks = [ChatCompletionChunk(**json.loads(event.data)) for event in events[:-1]]
+    assert "".join(chunk.choices[0].delta.content for chunk in chunks) == "你好"
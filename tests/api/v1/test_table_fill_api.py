@@ -0,0 +1,60 @@
+import threading
+
+import httpx
+from fastapi import FastAPI
+from qdrant_client import models
+
+from app.api.v1.endpoints import table_fill_api
+
+
+async def fake_aembed_texts(texts, model=None, timeout=None):
+    return [[0.1, 0.2] for _ in texts]
+
+
+async def test_job_search_accepts_documented_body(monkeypatch):
+    """/job_search/ 按文档的请求体（is_vector/content/collection_name/top_k）检索"""
+    calls = []
+
+    async def ahybrid_query_points(client, collection_name, dense_vector, text, using, with_payload, limit):
+        calls.append((collection_name, dense_vector, text, limit))
+        return [models.ScoredPoint(id=1, version=0, score=0.9, payload={"job_name": "Java开发"})]
+
+    monkeypatch.setattr(table_fill_api, "ahybrid_query_points", ahybrid_query_points)
+    monkeypatch.setattr(table_fill_api, "aembed_texts", fake_aembed_texts)
+    app = FastAPI()
+    app.include_router(table_fill_api.router)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        response = await http.post(
+            "/job_search/",
+            json={"is_vector": True, "content": "Java开发", "collection_name": "jobs", "top_k": 5},
+        )
+
+    assert response.status_code == 200
+    assert response.json() == [{"score": 0.9, "job_name": "Java开发"}]
+    assert calls == [("jobs", [0.1, 0.2], "Java开发", 5)]
+
+
+async def test_job_recom_runs_chain_off_the_event_loop(monkeypatch):
+    """同步链在线程池中执行，模型并发上限处的排队不会阻塞事件循环"""
+    loop_thread = threading.current_thread()
+    threads = []
+
+    class FakeChain:
+        def invoke(self, inputs):
+            threads.append(threading.current_thread())
+            return [3, 1, 2]
+
+    monkeypatch.setattr(table_fill_api, "jobs_chain", FakeChain())
+    app = FastAPI()
+    app.include_router(table_fill_api.router)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        response = await http.post(
+            "/job_recom/",
+            json={"desire_industry": "互联网", "attribute": "全职", "second_category": "后端开发", "category": "技术",
+                  "cities": "深圳", "desire_salary": "10k-15k"},
+        )
+
+    assert response.json() == [3, 1, 2]
+    assert threads and loop_thread not in threads
@@ -0,0 +1,127 @@
+import pytest
+from qdrant_client import QdrantClient, models
+
+from app.api.v1.endpoints import table_fill_api
+from app.config import settings
+from app.services.normalization import VocabularyIndex, VocabularyIndexService
+from app.services.normalization import dictionary as dictionary_module
+
+DICTIONARIES = {
+    "job_name": ["Java开发", "产品经理"],
+    "cities_name": ["广州", "深圳"],
+    "education_levels": ["本科", "硕士"],
+    "attribute": ["全职", "实习"],
+    "welfare": ["五险一金", "年终奖"],
+    "majors_name": ["软件工程", "金融学", "计算机科学与技术"],
+}
+ALL_TERMS = [term for terms in DICTIONARIES.values() for term in terms]
+# 福利字典默认没有配置标准名字段，测试中补上，使整张表都能走快速路径
+NAME_FIELDS = {**settings.VOCAB_NAME_FIELDS, "welfare": "名称"}
+# 不在字典中的写法，嵌入后与对应的标准名向量相同
+SYNONYMS = {
+    "后端工程师": "Java开发", "鹏城": "深圳", "大学": "本科", "兼职": "实习",
+    "年底双薪": "年终奖", "会计": "金融学", "软件开发与测试": "软件工程",
+}
+
+
+def one_hot(text: str) -> list[float]:
+    return [1.0 if term == text else 0.0 for term in ALL_TERMS]
+
+
+def item(**overrides) -> dict:
+    dic = {
+        "职位名称": "产品经理", "工作城市": "深圳", "学历要求": "本科", "工作性质": "实习",
+        "薪酬福利": "年终奖", "需求专业": "金融学#软件工程",
+    }
+    dic.update(overrides)
+    return dic
+
+
+@pytest.fixture
+def dictionaries(monkeypatch):
+    client = QdrantClient(":memory:")
+    for collection, terms in DICTIONARIES.items():
+        client.create_collection(
+            collection, vectors_config=models.VectorParams(size=len(ALL_TERMS), distance=models.Distance.COSINE)
+        )
+        client.upsert(collection, [
+            models.PointStruct(id=i, vector=one_hot(term), payload={"名称": term, NAME_FIELDS[collection]: term})
+            for i, term in enumerate(terms)
+        ])
+
+    calls = {"embed": [], "batch": []}
+    original = client.query_batch_points
+
+    def query_batch_points(collection_name, requests, **kwargs):
+        calls["batch"].append((collection_name, len(requests)))
+        return original(collection_name=collection_name, requests=requests, **kwargs)
+
+    def embed_texts(texts, model=None, timeout=None):
+        calls["embed"].append(list(texts))
+        return [one_hot(SYNONYMS.get(text, text)) for text in texts]
+
+    client.query_batch_points = query_batch_points
+    service = VocabularyIndexService(refresh_interval=0)
+    monkeypatch.setattr(table_fill_api, "client", client)
+    monkeypatch.setattr(table_fill_api, "embed_texts", embed_texts)
+    monkeypatch.setattr(table_fill_api, "get_vocab_service", lambda: service)
+    monkeypatch.setattr(dictionary_module, "get_vocab_service", lambda: service)
+    monkeypatch.setattr(dictionary_module, "_dictionaries", {})
+    monkeypatch.setattr(settings, "VOCAB_NAME_FIELDS", NAME_FIELDS)
+    calls["client"], calls["service"] = client, service
+    return calls
+
+
+@pytest.fixture
+def vocab_index(dictionaries, monkeypatch):
+    """字典集合全部加载到内存索引，并开启字典快速路径"""
+    monkeypatch.setattr(settings, "VOCAB_INDEX_ENABLED", True)
+    monkeypatch.setattr(settings, "NORMALIZATION_FAST_PATH_ENABLED", True)
+    for collection in DICTIONARIES:
+        dictionaries["service"].register(VocabularyIndex(dictionaries["client"], collection))
+    dictionaries["service"].start()
+    return dictionaries
+
+
+def test_match_item_single_embedding_and_batch_per_collection(dictionaries):
+    """未加载内存索引时：一次嵌入，每个集合一次批量检索，结果按字段顺序对应"""
+    result = table_fill_api.match_item(item())
+
+    assert [hit["名称"] for hit in result[1:]] == ["产品经理", "深圳", "本科", "实习", "年终奖"]
+    assert result[0]["需求专业"] == "金融学#软件工程"
+    assert len(dictionaries["embed"]) == 1
+    assert sorted(dictionaries["batch"]) == sorted(
+        [(c, 1) for c in DICTIONARIES if c != "majors_name"] + [("majors_name", 2)]
+    )
+
+
+def test_all_hit_skips_embedding_and_qdrant(vocab_index):
+    """所有字段都命中字典时不嵌入，也不访问 Qdrant"""
+    result = table_fill_api.match_item(item(工作城市="深圳市", 需求专业="金融学#软件工程专业"))
+
+    assert [hit["名称"] for hit in result[1:]] == ["产品经理", "深圳", "本科", "实习", "年终奖"]
+    assert result[0]["需求专业"] == "金融学#软件工程"
+    assert vocab_index["embed"] == []
+    assert vocab_index["batch"] == []
+
+
+def test_mixed_only_embeds_misses(vocab_index):
+    """只有未命中字典的值被嵌入，并在内存索引中检索"""
+    result = table_fill_api.match_item(item(薪酬福利="年底双薪", 需求专业="金融学#软件开发与测试"))
+
+    assert [hit["名称"] for hit in result[1:]] == ["产品经理", "深圳", "本科", "实习", "年终奖"]
+    assert result[0]["需求专业"] == "金融学#软件工程"
+    assert vocab_index["embed"] == [["年底双薪", "软件开发与测试"]]
+    assert vocab_index["batch"] == []
+
+
+def test_all_miss_embeds_once(vocab_index):
+    """都未命中字典时全部值一次嵌入，在内存索引中检索"""
+    result = table_fill_api.match_item(item(
+        职位名称="后端工程师", 工作城市="鹏城", 学历要求="大学", 工作性质="兼职", 薪酬福利="年底双薪", 需求专业="会计"
+    ))
+
+    assert [hit["名称"] for hit in result[1:]] == ["Java开发", "深圳", "本科", "实习", "年终奖"]
+    assert result[0]["需求专业"] == "金融学"
+    assert vocab_index["embed"] == [["后端工程师", "鹏城", "大学", "兼职", "年底双薪", "会计"]]
+    assert vocab_index["batch"] == []